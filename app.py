@@ -1,13 +1,47 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, after_this_request, g, request, jsonify, send_file
 from flask_cors import CORS
 from PIL import Image, ImageDraw
 import base64
 import io
+import json
+import math
 import os
+import re
 import gc
+import hashlib
+import heapq
 import logging
+import multiprocessing
 import psutil
+import sqlite3
 import traceback
+import struct
+import tempfile
+import threading
+import time
+import uuid
+import zipfile
+import zlib
+from collections import OrderedDict, deque
+from contextlib import closing, contextmanager
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+from xml.sax.saxutils import escape as xml_escape
+
+# NumPy powers the vectorized panel fill engine (falls back to PIL drawing if missing)
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+
+# File locks coordinate identical renders across server processes (POSIX only; threads still coalesce without it)
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
 
 # Configure PIL for ultra-large images
 Image.MAX_IMAGE_PIXELS = None  # Remove PIL limits
@@ -42,8 +76,11 @@ def get_memory_info():
         # Fallback without psutil
         return {'rss_mb': 0, 'vms_mb': 0, 'percent': 0}
 
-def generate_pixel_map_optimized(width, height, pixel_pitch, led_panel_width, led_panel_height, canvas_scale=1.0, config=None):
-    """Generate pixel map with memory optimization for ultra-large images - ENHANCED FOR 200M PIXELS"""
+def generate_pixel_map_optimized(width, height, pixel_pitch, led_panel_width, led_panel_height, canvas_scale=1.0, config=None, progress=None):
+    """Generate pixel map with memory optimization for ultra-large images - ENHANCED FOR 200M PIXELS
+    
+    progress: optional callback(stage, done, total, bytes_written) for the fill/labels/overlays stages
+    """
     try:
         # Log initial memory state
         initial_memory = get_memory_info()
@@ -63,8 +100,8 @@ def generate_pixel_map_optimized(width, height, pixel_pitch, led_panel_width, le
         surface_name = config.get('surfaceName', 'Screen One')
         
         # Calculate scaled dimensions
-        canvas_width = int(width * canvas_scale)
-        canvas_height = int(height * canvas_scale)
+        canvas_width = max(1, int(width * canvas_scale))
+        canvas_height = max(1, int(height * canvas_scale))
         total_pixels = canvas_width * canvas_height
         
         logger.info(f"Canvas: {canvas_width}×{canvas_height}px ({total_pixels:,} pixels)")
@@ -72,14 +109,31 @@ def generate_pixel_map_optimized(width, height, pixel_pitch, led_panel_width, le
         # Force garbage collection before starting
         gc.collect()
         
-        # Always use RGB for consistency and compatibility
-        mode = 'RGB'
+        # RGB by default; opt-in indexed ('P') maps use a small fixed palette
+        color_mode = config.get('colorMode', 'rgb')
+        mode = 'P' if color_mode == 'indexed' else 'RGB'
+        
+        # PREVIEW: lay the map out directly at the reduced scale - never rasterize full size
+        if canvas_scale < 1:
+            logger.info(f"🔍 PREVIEW: {width}×{height}px map at scale {canvas_scale:.4f}")
+            spec = pixel_map_spec({
+                'panelsWidth': width // led_panel_width,
+                'fullPanelsHeight': height // led_panel_height,
+                'panelPixelWidth': led_panel_width,
+                'panelPixelHeight': led_panel_height,
+                'ledName': config.get('ledName', 'Absen')
+            }, config)
+            image = render_scaled_region(spec, canvas_scale, 0, 0, canvas_width, canvas_height)
+            if mode == 'P':
+                image = quantize_to_map_palette(image, spec['led_name'], map_border_factor(width, height))
+            return image
         
         # Enhanced chunking strategy for 200M pixels
         if total_pixels > 50_000_000:  # 50M+ pixels - use chunked processing
             logger.info(f"🔄 CHUNKED: Using enhanced chunked processing for {total_pixels:,} pixels")
             led_name = config.get('ledName', 'Absen')
-            return generate_chunked_pixel_map(canvas_width, canvas_height, pixel_pitch, led_panel_width, led_panel_height, mode, show_grid, show_panel_numbers, led_name, show_name, show_cross, show_circle, show_logo, surface_name)
+            return generate_chunked_pixel_map(canvas_width, canvas_height, pixel_pitch, led_panel_width, led_panel_height, mode, show_grid, show_panel_numbers, led_name, show_name, show_cross, show_circle, show_logo, surface_name,
+                                              progress=progress)
         
         # Standard generation for smaller images (< 50M pixels)
         logger.info(f"📊 STANDARD: Using standard processing for {total_pixels:,} pixels")
@@ -87,7 +141,8 @@ def generate_pixel_map_optimized(width, height, pixel_pitch, led_panel_width, le
         # For small images, use the full quality rendering with numbering
         led_name = config.get('ledName', 'Absen')
         return generate_full_quality_pixel_map(canvas_width, canvas_height, led_panel_width, led_panel_height, 
-                                             show_grid, show_panel_numbers, led_name, show_name, show_cross, show_circle, show_logo, surface_name)
+                                             show_grid, show_panel_numbers, led_name, show_name, show_cross, show_circle, show_logo, surface_name,
+                                             color_mode=color_mode, progress=progress)
         
         return image
         
@@ -96,8 +151,14 @@ def generate_pixel_map_optimized(width, height, pixel_pitch, led_panel_width, le
         logger.error(traceback.format_exc())
         raise
 
-def generate_full_quality_pixel_map(width, height, led_panel_width, led_panel_height, show_grid=True, show_panel_numbers=True, led_name='Absen', show_name=False, show_cross=False, show_circle=False, show_logo=False, surface_name='Screen One'):
-    """Generate full quality pixel map with numbering and grid for smaller images"""
+def generate_full_quality_pixel_map(width, height, led_panel_width, led_panel_height, show_grid=True, show_panel_numbers=True, led_name='Absen', show_name=False, show_cross=False, show_circle=False, show_logo=False, surface_name='Screen One', engine=None, color_mode='rgb', progress=None):
+    """Generate full quality pixel map with numbering and grid for smaller images
+    
+    engine: 'numpy' (vectorized fill), 'tiles' (cached panel tiles), 'pil' (per-panel drawing)
+            or None to pick the fastest available
+    color_mode: 'rgb' or 'indexed' ('P' image with the fixed palette from build_pixel_map_palette)
+    progress: optional callback(stage, done, total, bytes_written), called once per stage / label row
+    """
     try:
         # Calculate panel dimensions
         panels_width = int(width / led_panel_width)
@@ -109,59 +170,51 @@ def generate_full_quality_pixel_map(width, height, led_panel_width, led_panel_he
         
         logger.info(f"📐 Full quality: {panels_width}×{panels_height} panels, {display_width}×{display_height}px")
         
-        # Create high-fidelity RGB image for LED pixel mapping
-        image = Image.new('RGB', (display_width, display_height), 'white')
+        # Pick the fill engine: NumPy builds the whole canvas as one array, tiles stamps cached panels
+        if engine is None:
+            engine = 'numpy' if NUMPY_AVAILABLE else 'tiles'
         
-        # Use high-quality drawing context for precise rendering
-        draw = ImageDraw.Draw(image, 'RGB')
+        # Indexed maps draw RGB colors onto a 'P' canvas preloaded with the fixed palette
+        mode = 'P' if color_mode == 'indexed' else 'RGB'
+        palette = build_pixel_map_palette(led_name, border_factor=0.4) if mode == 'P' else None
         
-        # Memory check after image creation
-        after_create_memory = get_memory_info()
-        logger.info(f"After image creation: {after_create_memory['rss_mb']:.1f}MB")
+        if progress:
+            progress('fill', 0, 1, None)
+        if engine == 'numpy':
+            # Vectorized fill - cost scales with memory bandwidth, not panel count
+            canvas = fill_panels_numpy(display_width, display_height, led_panel_width, led_panel_height,
+                                       show_grid, led_name, border_factor=0.4, palette=palette, progress=progress)
+            image = Image.fromarray(canvas, mode)
+            del canvas
+            if palette:
+                image.putpalette(flatten_palette(palette))
+            draw = ImageDraw.Draw(image, mode)
+        elif engine == 'tiles':
+            # Render each unique panel tile once and stamp it across the canvas
+            image = new_pixel_map_image(mode, (display_width, display_height), palette, color=(255, 255, 255))
+            stamp_panel_tiles(image, 0, 0, led_panel_width, led_panel_height,
+                              show_grid, led_name, border_factor=0.4)
+            draw = ImageDraw.Draw(image, mode)
+        else:
+            # Create high-fidelity image for LED pixel mapping
+            image = new_pixel_map_image(mode, (display_width, display_height), palette, color=(255, 255, 255))
+            
+            # Use high-quality drawing context for precise rendering
+            draw = ImageDraw.Draw(image, mode)
+            fill_panels_pil(draw, panels_width, panels_height, led_panel_width, led_panel_height,
+                            show_grid, led_name, border_factor=0.4)
         
-        # Fill panels with colors and optionally add brighter grid borders
-        for row in range(panels_height):
-            for col in range(panels_width):
-                x = col * led_panel_width
-                y = row * led_panel_height
-                
-                # Generate color for this panel based on LED type
-                panel_color = generate_color(col, row, led_name)
-                
-                # Draw panel rectangle filled with color (no outline)
-                draw.rectangle([x, y, x + led_panel_width - 1, y + led_panel_height - 1], 
-                             fill=panel_color, outline=None)
-                
-                # Add brighter border if grid is enabled - WITHIN panel boundaries
-                if show_grid:
-                    # Create brighter border color (40% brighter for better visibility)
-                    border_color = brighten_color(panel_color, 0.4)
-                    
-                    # DEBUG: Log border drawing
-                    logger.info(f"🔧 DRAWING BORDER: Panel {panel_color} -> Border {border_color}")
-                    
-                    # Draw complete border frame around each panel
-                    # Using the outer edge of each panel to create complete frames
-                    
-                    # Top border - first row of panel (pixel 0)
-                    draw.line([(x, y), (x + led_panel_width - 1, y)], 
-                             fill=border_color, width=1)
-                    
-                    # Bottom border - last row of panel (pixel 199 for 200px panel)
-                    draw.line([(x, y + led_panel_height - 1), (x + led_panel_width - 1, y + led_panel_height - 1)], 
-                             fill=border_color, width=1)
-                    
-                    # Left border - first column of panel (pixel 0)
-                    draw.line([(x, y), (x, y + led_panel_height - 1)], 
-                             fill=border_color, width=1)
-                    
-                    # Right border - last column of panel (pixel 199 for 200px panel)
-                    draw.line([(x + led_panel_width - 1, y), (x + led_panel_width - 1, y + led_panel_height - 1)], 
-                             fill=border_color, width=1)
+        # Memory check after panel fill
+        after_fill_memory = get_memory_info()
+        logger.info(f"After panel fill ({engine}): {after_fill_memory['rss_mb']:.1f}MB")
+        if progress:
+            progress('fill', 1, 1, None)
         
         # Draw panel numbers with VECTOR-BASED numbering (pixel-perfect quality)
         if show_panel_numbers:
             for row in range(panels_height):
+                if progress:
+                    progress('labels', row, panels_height, None)
                 for col in range(panels_width):
                     x = col * led_panel_width
                     y = row * led_panel_height
@@ -179,13 +232,15 @@ def generate_full_quality_pixel_map(width, height, led_panel_width, led_panel_he
                     text_x = x + margin_x
                     text_y = y + margin_y
                     
-                    # Draw vector-based panel numbers (no font dependencies)
-                    draw_vector_panel_number(
+                    # Draw vector-based panel numbers from the cached glyph atlas
+                    draw_glyph_panel_number(
                         draw, panel_number, text_x, text_y, 
                         number_size, color=(255, 255, 255)  # WHITE numbers for better visibility
                     )
 
         # Add new visual elements based on config
+        if progress:
+            progress('overlays', 0, 1, None)
         add_visual_overlays(draw, display_width, display_height, surface_name, show_name, show_cross, show_circle, show_logo)
         
         # Final memory check
@@ -199,6 +254,150 @@ def generate_full_quality_pixel_map(width, height, led_panel_width, led_panel_he
         logger.error(traceback.format_exc())
         raise
 
+FALLBACK_FILL_COLOR = (128, 128, 128)  # Chunk fill when grid drawing fails
+
+def build_pixel_map_palette(led_name='Absen', border_factor=0.4):
+    """Fixed palette for indexed maps: both panel colors, their borders, label white, name amber, black and the fallback gray
+    
+    Every color drawn on an indexed canvas must be listed here: PIL appends unknown colors
+    to the image palette, and those indices fall outside the PLTE the streaming writer emits.
+    """
+    panel_colors = [generate_color(0, 0, led_name), generate_color(1, 0, led_name)]
+    colors = panel_colors + [brighten_color(color, border_factor) for color in panel_colors]
+    colors += [(255, 255, 255), (255, 191, 0), (0, 0, 0), FALLBACK_FILL_COLOR]
+    return list(dict.fromkeys(colors))  # Unique, in order
+
+def flatten_palette(palette):
+    """[(r, g, b), ...] -> [r, g, b, ...] for Image.putpalette / PLTE"""
+    return [component for color in palette for component in color]
+
+def new_pixel_map_image(mode, size, palette=None, color=(0, 0, 0)):
+    """New RGB canvas, or a 'P' canvas preloaded with the fixed palette
+    
+    RGB colors drawn on the 'P' canvas resolve to the existing palette entries,
+    so all drawing code works unchanged for indexed maps.
+    """
+    if mode == 'P':
+        image = Image.new('P', size, palette.index(color) if color in palette else 0)
+        image.putpalette(flatten_palette(palette))
+        return image
+    return Image.new(mode, size, color)
+
+def fill_panels_pil(draw, panels_width, panels_height, led_panel_width, led_panel_height, show_grid=True, led_name='Absen', border_factor=0.4):
+    """Fill panels one by one with PIL drawing calls (fallback engine when NumPy is unavailable)"""
+    for row in range(panels_height):
+        for col in range(panels_width):
+            x = col * led_panel_width
+            y = row * led_panel_height
+            
+            # Generate color for this panel based on LED type
+            panel_color = generate_color(col, row, led_name)
+            
+            # Draw panel rectangle filled with color (no outline)
+            draw.rectangle([x, y, x + led_panel_width - 1, y + led_panel_height - 1], 
+                         fill=panel_color, outline=None)
+            
+            # Add brighter border if grid is enabled - WITHIN panel boundaries
+            if show_grid:
+                border_color = brighten_color(panel_color, border_factor)
+                
+                # Top border - first row of panel (pixel 0)
+                draw.line([(x, y), (x + led_panel_width - 1, y)], 
+                         fill=border_color, width=1)
+                
+                # Bottom border - last row of panel (pixel 199 for 200px panel)
+                draw.line([(x, y + led_panel_height - 1), (x + led_panel_width - 1, y + led_panel_height - 1)], 
+                         fill=border_color, width=1)
+                
+                # Left border - first column of panel (pixel 0)
+                draw.line([(x, y), (x, y + led_panel_height - 1)], 
+                         fill=border_color, width=1)
+                
+                # Right border - last column of panel (pixel 199 for 200px panel)
+                draw.line([(x + led_panel_width - 1, y), (x + led_panel_width - 1, y + led_panel_height - 1)], 
+                         fill=border_color, width=1)
+
+def fill_panels_numpy(width, height, led_panel_width, led_panel_height, show_grid=True, led_name='Absen', border_factor=0.4, palette=None, progress=None):
+    """Build the whole panel canvas as one (height, width, 3) uint8 array - byte-identical to fill_panels_pil
+    
+    Panels are filled with a palette lookup on (col + row) % 2 and borders are written
+    with strided slice assignment, so the cost no longer depends on the panel count.
+    With a palette (indexed maps) the result is a (height, width) array of palette indices.
+    progress: optional callback(stage, done, total, bytes_written), called when the borders start
+    """
+    panel_colors = [generate_color(0, 0, led_name), generate_color(1, 0, led_name)]
+    border_colors = [brighten_color(color, border_factor) for color in panel_colors]
+    if palette:
+        panel_colors = [palette.index(color) for color in panel_colors]
+        border_colors = [palette.index(color) for color in border_colors]
+    
+    # Checkerboard palette: index 0 for even (col + row), index 1 for odd
+    panel_palette = np.array(panel_colors, dtype=np.uint8)
+    
+    # Panel parity of every pixel column and every pixel row
+    col_parity = (np.arange(width) // led_panel_width) % 2
+    row_parity = (np.arange(height) // led_panel_height) % 2
+    
+    # Two scanline templates (even / odd panel rows), then one gather builds the canvas
+    parity_lines = np.stack([col_parity, 1 - col_parity])
+    canvas = panel_palette[parity_lines][row_parity]
+    
+    if show_grid:
+        if progress:
+            progress('borders', 0, 1, None)
+        border_palette = np.array(border_colors, dtype=np.uint8)
+        border_lines = border_palette[parity_lines]
+        
+        # Top and bottom border rows of every panel row
+        canvas[0::led_panel_height] = border_lines[row_parity[0::led_panel_height]]
+        canvas[led_panel_height - 1::led_panel_height] = border_lines[row_parity[led_panel_height - 1::led_panel_height]]
+        
+        # Left and right border columns of every panel column
+        left_parity = col_parity[0::led_panel_width]
+        right_parity = col_parity[led_panel_width - 1::led_panel_width]
+        canvas[:, 0::led_panel_width] = border_palette[(row_parity[:, None] + left_parity[None, :]) % 2]
+        canvas[:, led_panel_width - 1::led_panel_width] = border_palette[(row_parity[:, None] + right_parity[None, :]) % 2]
+    
+    return canvas
+
+@lru_cache(maxsize=64)
+def get_panel_tile(panel_width, panel_height, fill_color, border_color, show_grid=True, mode='RGB'):
+    """Render one base panel tile (fill plus optional 1px brighter border) - cached per unique tile
+    
+    A map only ever contains a couple of unique tiles (checkerboard color A or B with its
+    border), so each is rendered once and stamped everywhere. Panels of another size,
+    e.g. half-height rows, simply get their own cache entry. 'P' tiles take palette indices.
+    """
+    tile = Image.new(mode, (panel_width, panel_height), fill_color)
+    if show_grid:
+        tile_draw = ImageDraw.Draw(tile)
+        tile_draw.rectangle([0, 0, panel_width - 1, panel_height - 1], outline=border_color, width=1)
+    return tile
+
+def stamp_panel_tiles(image, offset_x, offset_y, led_panel_width, led_panel_height, show_grid=True, led_name='Absen', border_factor=0.4):
+    """Paste cached panel tiles over an image covering the global region starting at (offset_x, offset_y)
+    
+    Panels cut by the image edges are clipped by Image.paste, which matches drawing
+    only the part of each panel (and its borders) that falls inside the region.
+    """
+    start_panel_x = offset_x // led_panel_width
+    start_panel_y = offset_y // led_panel_height
+    end_panel_x = (offset_x + image.width - 1) // led_panel_width
+    end_panel_y = (offset_y + image.height - 1) // led_panel_height
+    
+    # Indexed canvases get tiles of palette indices (pasting 'P' onto 'P' copies indices)
+    if image.mode == 'P':
+        ink = lambda color: image.palette.getcolor(color, image)
+    else:
+        ink = lambda color: color
+    
+    for panel_y in range(start_panel_y, end_panel_y + 1):
+        for panel_x in range(start_panel_x, end_panel_x + 1):
+            color = generate_color(panel_x, panel_y, led_name)
+            tile = get_panel_tile(led_panel_width, led_panel_height, ink(color),
+                                  ink(brighten_color(color, border_factor)), show_grid, image.mode)
+            image.paste(tile, (panel_x * led_panel_width - offset_x, panel_y * led_panel_height - offset_y))
+
 def generate_simple_grid(draw, canvas_width, canvas_height, led_panel_width, led_panel_height, mode):
     """Generate a simple grid pattern for ultra-large images"""
     try:
@@ -226,12 +425,16 @@ def generate_simple_grid(draw, canvas_width, canvas_height, led_panel_width, led
         logger.error(f"Error in simple grid generation: {str(e)}")
         raise
 
-def generate_chunked_pixel_map(width, height, pixel_pitch, led_panel_width, led_panel_height, mode, show_grid=True, show_panel_numbers=True, led_name='Absen', show_name=False, show_cross=False, show_circle=False, show_logo=False, surface_name='Screen One'):
-    """Generate ultra-large images in chunks to manage memory - ENHANCED FOR 200M PIXELS"""
+def generate_chunked_pixel_map(width, height, pixel_pitch, led_panel_width, led_panel_height, mode, show_grid=True, show_panel_numbers=True, led_name='Absen', show_name=False, show_cross=False, show_circle=False, show_logo=False, surface_name='Screen One', progress=None):
+    """Generate ultra-large images in chunks to manage memory - ENHANCED FOR 200M PIXELS
+    
+    progress: optional callback(stage, done, total, bytes_written), called after each chunk
+    """
     logger.info(f"🚀 ENHANCED: Generating {width}×{height}px image in optimized chunks")
     
-    # Create base image
-    image = Image.new(mode, (width, height), color=(0, 0, 0))
+    # Create base image ('P' maps share one fixed palette between image and chunks)
+    palette = build_pixel_map_palette(led_name, border_factor=0.3) if mode == 'P' else None
+    image = new_pixel_map_image(mode, (width, height), palette)
     
     # Enhanced chunking strategy for 200M+ pixels
     total_pixels = width * height
@@ -248,6 +451,8 @@ def generate_chunked_pixel_map(width, height, pixel_pitch, led_panel_width, led_
     
     chunks_processed = 0
     total_chunks = ((width + chunk_size - 1) // chunk_size) * ((height + chunk_size - 1) // chunk_size)
+    if progress:
+        progress('fill', 0, total_chunks, None)
     
     # Process in optimized chunks with memory management
     for y in range(0, height, chunk_size):
@@ -256,13 +461,14 @@ def generate_chunked_pixel_map(width, height, pixel_pitch, led_panel_width, led_
             chunk_height = min(chunk_size, height - y)
             
             # Create chunk with minimal memory footprint
-            chunk = Image.new(mode, (chunk_width, chunk_height), color=(0, 0, 0))
+            chunk = new_pixel_map_image(mode, (chunk_width, chunk_height), palette)
             chunk_draw = ImageDraw.Draw(chunk)
             
             # Generate optimized grid for this chunk
             generate_enhanced_grid_for_chunk(
                 chunk_draw, chunk_width, chunk_height, x, y, 
-                led_panel_width, led_panel_height, mode, show_grid, show_panel_numbers, led_name
+                led_panel_width, led_panel_height, mode, show_grid, show_panel_numbers, led_name,
+                image=chunk
             )
             
             # Paste chunk into main image
@@ -271,25 +477,45 @@ def generate_chunked_pixel_map(width, height, pixel_pitch, led_panel_width, led_
             # Aggressive cleanup for memory management
             del chunk, chunk_draw
             chunks_processed += 1
+            if progress:
+                progress('fill', chunks_processed, total_chunks, None)
             
             # Force garbage collection every 10 chunks
             if chunks_processed % 10 == 0:
                 gc.collect()
                 memory_info = get_memory_info()
-                progress = (chunks_processed / total_chunks) * 100
-                logger.info(f"Progress: {progress:.1f}% ({chunks_processed}/{total_chunks} chunks) - Memory: {memory_info['rss_mb']:.1f}MB")
+                percent = (chunks_processed / total_chunks) * 100
+                logger.info(f"Progress: {percent:.1f}% ({chunks_processed}/{total_chunks} chunks) - Memory: {memory_info['rss_mb']:.1f}MB")
     
     logger.info(f"✅ Completed chunked generation: {chunks_processed} chunks processed")
     
     # Add visual overlays after chunked generation is complete
+    if progress:
+        progress('overlays', 0, 1, None)
     draw = ImageDraw.Draw(image)
     add_visual_overlays(draw, width, height, surface_name, show_name, show_cross, show_circle, show_logo)
     
     return image
 
-def generate_enhanced_grid_for_chunk(draw, chunk_width, chunk_height, offset_x, offset_y, led_panel_width, led_panel_height, mode, show_grid=True, show_panel_numbers=True, led_name='Absen'):
-    """Enhanced grid generation optimized for 200M+ pixels"""
+def generate_enhanced_grid_for_chunk(draw, chunk_width, chunk_height, offset_x, offset_y, led_panel_width, led_panel_height, mode, show_grid=True, show_panel_numbers=True, led_name='Absen', image=None, border_factor=0.3, clip_labels=False):
+    """Enhanced grid generation optimized for 200M+ pixels
+    
+    When the chunk image is passed, panels are stamped from the cached tile templates
+    and only the labels are drawn per panel.
+    clip_labels draws every label that reaches into the chunk, clipped at its edges, so
+    tiles and regions cut anywhere match the full image (bands keep whole-label drawing).
+    """
     try:
+        # Fast path: stamp cached panel tiles, then only labels need per-panel drawing
+        if image is not None:
+            stamp_panel_tiles(image, offset_x, offset_y, led_panel_width, led_panel_height,
+                              show_grid, led_name, border_factor=border_factor)
+        
+        if clip_labels and show_panel_numbers:
+            draw_panel_labels_in_region(draw, chunk_width, chunk_height, offset_x, offset_y,
+                                        led_panel_width, led_panel_height)
+            show_panel_numbers = False
+        
         # Calculate panel positions within this chunk
         start_panel_x = offset_x // led_panel_width
         start_panel_y = offset_y // led_panel_height
@@ -318,36 +544,37 @@ def generate_enhanced_grid_for_chunk(draw, chunk_width, chunk_height, offset_x,
                 
                 # Only draw if there's a valid intersection
                 if chunk_right > chunk_left and chunk_bottom > chunk_top:
-                    # Generate color based on LED type and panel position
-                    color = generate_color(panel_global_x, panel_global_y, led_name)
+                    if image is None:
+                        # Generate color based on LED type and panel position
+                        color = generate_color(panel_global_x, panel_global_y, led_name)
                     
-                    # Draw panel portion in chunk coordinates
-                    draw.rectangle([
-                        chunk_left, chunk_top, 
-                        chunk_right - 1, chunk_bottom - 1
-                    ], fill=color, outline=None)
+                        # Draw panel portion in chunk coordinates
+                        draw.rectangle([
+                            chunk_left, chunk_top, 
+                            chunk_right - 1, chunk_bottom - 1
+                        ], fill=color, outline=None)
                     
-                    # Add brighter border if grid is enabled
-                    if show_grid:
-                        border_color = brighten_color(color, 0.3)
-                        # Draw brighter border around the panel portion in this chunk
-                        # Only draw borders that are within the chunk boundaries
+                        # Add brighter border if grid is enabled
+                        if show_grid:
+                            border_color = brighten_color(color, border_factor)
+                            # Draw brighter border around the panel portion in this chunk
+                            # Only draw borders that are within the chunk boundaries
                         
-                        # Top border (if panel top is in this chunk)
-                        if panel_top >= offset_y and chunk_top == panel_top - offset_y:
-                            draw.line([(chunk_left, chunk_top), (chunk_right - 1, chunk_top)], fill=border_color, width=1)
+                            # Top border (if panel top is in this chunk)
+                            if panel_top >= offset_y and chunk_top == panel_top - offset_y:
+                                draw.line([(chunk_left, chunk_top), (chunk_right - 1, chunk_top)], fill=border_color, width=1)
                         
-                        # Bottom border (if panel bottom is in this chunk)
-                        if panel_bottom <= offset_y + chunk_height and chunk_bottom == panel_bottom - offset_y:
-                            draw.line([(chunk_left, chunk_bottom - 1), (chunk_right - 1, chunk_bottom - 1)], fill=border_color, width=1)
+                            # Bottom border (if panel bottom is in this chunk)
+                            if panel_bottom <= offset_y + chunk_height and chunk_bottom == panel_bottom - offset_y:
+                                draw.line([(chunk_left, chunk_bottom - 1), (chunk_right - 1, chunk_bottom - 1)], fill=border_color, width=1)
                         
-                        # Left border (if panel left is in this chunk)
-                        if panel_left >= offset_x and chunk_left == panel_left - offset_x:
-                            draw.line([(chunk_left, chunk_top), (chunk_left, chunk_bottom - 1)], fill=border_color, width=1)
+                            # Left border (if panel left is in this chunk)
+                            if panel_left >= offset_x and chunk_left == panel_left - offset_x:
+                                draw.line([(chunk_left, chunk_top), (chunk_left, chunk_bottom - 1)], fill=border_color, width=1)
                         
-                        # Right border (if panel right is in this chunk)
-                        if panel_right <= offset_x + chunk_width and chunk_right == panel_right - offset_x:
-                            draw.line([(chunk_right - 1, chunk_top), (chunk_right - 1, chunk_bottom - 1)], fill=border_color, width=1)
+                            # Right border (if panel right is in this chunk)
+                            if panel_right <= offset_x + chunk_width and chunk_right == panel_right - offset_x:
+                                draw.line([(chunk_right - 1, chunk_top), (chunk_right - 1, chunk_bottom - 1)], fill=border_color, width=1)
                     
                     # Add panel numbering if enabled and the panel starts in this chunk
                     if show_panel_numbers and panel_left >= offset_x and panel_top >= offset_y:
@@ -368,7 +595,7 @@ def generate_enhanced_grid_for_chunk(draw, chunk_width, chunk_height, offset_x,
                         
                         # Only draw if the number fits within the chunk
                         if text_x + number_size <= chunk_width and text_y + number_size <= chunk_height:
-                            draw_vector_panel_number(
+                            draw_glyph_panel_number(
                                 draw, panel_number, text_x, text_y, 
                                 number_size, color=(255, 255, 255)  # WHITE numbers for better visibility
                             )
@@ -376,7 +603,1445 @@ def generate_enhanced_grid_for_chunk(draw, chunk_width, chunk_height, offset_x,
     except Exception as e:
         logger.error(f"Error in enhanced chunk grid generation: {str(e)}")
         # Fallback to simple fill
-        draw.rectangle([0, 0, chunk_width-1, chunk_height-1], fill=(128, 128, 128))
+        draw.rectangle([0, 0, chunk_width-1, chunk_height-1], fill=FALLBACK_FILL_COLOR)
+
+def draw_panel_labels_in_region(draw, region_width, region_height, offset_x, offset_y, led_panel_width, led_panel_height, scale=1.0, panels_x=None, panels_y=None):
+    """Draw the panel numbers that overlap a region of the map, clipped at the region edges
+    
+    Labels can reach past their own panel (small panels, long numbers), so panels up to
+    one label width to the left and above the region are included as well.
+    With scale < 1 the region is in scaled map coordinates and labels shrink with it;
+    panels_x/panels_y stop labels past the last panel when the region overhangs the map.
+    """
+    # Same sizing as the full-quality path: 15% of the panel, 3% margins
+    number_size = max(12, int(min(led_panel_width, led_panel_height) * 0.15))
+    margin_x = max(3, int(led_panel_width * 0.03))
+    margin_y = max(3, int(led_panel_height * 0.03))
+    label_reach_x = margin_x + 8 * (int(number_size * 0.8) + max(3, number_size // 12)) + number_size
+    label_reach_y = margin_y + 2 * number_size
+    
+    start_panel_x = max(0, int((offset_x / scale - label_reach_x) // led_panel_width))
+    start_panel_y = max(0, int((offset_y / scale - label_reach_y) // led_panel_height))
+    end_panel_x = int(((offset_x + region_width) / scale - 1) // led_panel_width)
+    end_panel_y = int(((offset_y + region_height) / scale - 1) // led_panel_height)
+    if panels_x is not None:
+        end_panel_x = min(end_panel_x, panels_x - 1)
+    if panels_y is not None:
+        end_panel_y = min(end_panel_y, panels_y - 1)
+    
+    scaled_size = int(number_size * scale)
+    for panel_y in range(start_panel_y, end_panel_y + 1):
+        for panel_x in range(start_panel_x, end_panel_x + 1):
+            draw_glyph_panel_number(
+                draw, f"{panel_y + 1}.{panel_x + 1}",
+                int((panel_x * led_panel_width + margin_x) * scale) - offset_x,
+                int((panel_y * led_panel_height + margin_y) * scale) - offset_y,
+                scaled_size, color=(255, 255, 255)
+            )
+
+# Streaming PNG output: bands of scanlines go straight into an incremental encoder
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+STREAMING_BAND_BYTES = 24 * 1024 * 1024  # Raw RGB bytes per band (bounds peak memory)
+PNG_IDAT_CHUNK_SIZE = 256 * 1024  # Flush compressed data as IDAT chunks of this size
+RENDER_MEMORY_LIMIT_MB = int(os.environ.get('RENDER_MEMORY_LIMIT_MB', 512))  # Instance RAM (Render free tier)
+RENDER_POOL_WORKER_MB = 50  # One band render process (spawned workers import this module)
+RENDER_POOL_SERVER_MB = 12  # The forkserver that starts them
+RENDER_POOL_MEMORY_SHARE = 0.25  # Share of the memory limit the default band pool may take
+
+def available_cpu_count():
+    """CPUs this process may run on: its affinity mask, capped by a cgroup CPU quota (containers)
+    
+    os.cpu_count() reports the host's CPUs, however few the container is allowed to use.
+    """
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:  # Not available outside Linux
+        cpus = os.cpu_count() or 1
+    try:
+        with open('/sys/fs/cgroup/cpu.max') as f:
+            quota, period = f.read().split()[:2]
+        if quota != 'max':
+            cpus = min(cpus, math.ceil(int(quota) / int(period)))
+    except (OSError, ValueError):
+        pass
+    return max(1, cpus)
+
+def default_render_workers():
+    """One band process per available CPU, no more than fit in RENDER_POOL_MEMORY_SHARE of the memory limit"""
+    memory_cap = int(RENDER_MEMORY_LIMIT_MB * RENDER_POOL_MEMORY_SHARE) // RENDER_POOL_WORKER_MB
+    return max(1, min(available_cpu_count(), memory_cap))
+
+RENDER_WORKERS = int(os.environ.get('RENDER_WORKERS', 0)) or default_render_workers()  # Band rendering processes (1 = no pool)
+# Workers must not be forked from this multithreaded server (a child can inherit a lock held by another thread)
+RENDER_POOL_START_METHOD = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+DEFLATE_THREADS = int(os.environ.get('DEFLATE_THREADS', 0)) or available_cpu_count()  # Parallel deflate threads
+PARALLEL_DEFLATE_MIN_BYTES = 1024 * 1024  # Smallest row range worth compressing on its own thread
+PNG_DEDUPE_ROWS = os.environ.get('PNG_DEDUPE_ROWS', '1') != '0'  # Encode repeated scanlines as cached Up rows
+UP_SPAN_MAX_ROWS = 1024  # Longest precompressed run of Up rows (longer runs reuse it several times)
+LITERAL_CACHE_ENTRIES = 256  # Compressed blocks of distinct rows kept for reuse within one row range
+
+def png_chunk(chunk_type, data):
+    """Build one PNG chunk: length, type, data and CRC"""
+    crc = zlib.crc32(chunk_type + data) & 0xffffffff
+    return struct.pack('>I', len(data)) + chunk_type + data + struct.pack('>I', crc)
+
+ZLIB_HEADER = b'\x78\x9c'  # zlib stream header (deflate, 32K window)
+ADLER_BASE = 65521
+
+def adler32_combine(adler1, adler2, len2):
+    """Adler-32 of A+B from adler32(A), adler32(B) and len(B) (same math as zlib's adler32_combine)"""
+    rem = len2 % ADLER_BASE
+    sum1 = adler1 & 0xffff
+    sum2 = (rem * sum1) % ADLER_BASE
+    sum1 += (adler2 & 0xffff) + ADLER_BASE - 1
+    sum2 += (adler1 >> 16) + (adler2 >> 16) + ADLER_BASE - rem
+    if sum1 >= ADLER_BASE:
+        sum1 -= ADLER_BASE
+    if sum1 >= ADLER_BASE:
+        sum1 -= ADLER_BASE
+    if sum2 >= ADLER_BASE << 1:
+        sum2 -= ADLER_BASE << 1
+    if sum2 >= ADLER_BASE:
+        sum2 -= ADLER_BASE
+    return sum1 | (sum2 << 16)
+
+def deflate_png_rows(raw, row_bytes, compress_level=6):
+    """Filter and deflate whole scanlines into an independent, byte-aligned deflate segment
+    
+    Returns (segment, adler32, filtered_length). Segments from consecutive row ranges can
+    be concatenated into one zlib stream, which lets bands be compressed anywhere.
+    """
+    view = memoryview(raw)
+    rows = len(view) // row_bytes
+    compressor = zlib.compressobj(compress_level, zlib.DEFLATED, -15)  # raw deflate, no header
+    pieces = []
+    adler = 1
+    for row in range(rows):
+        # Filter type 0 (None) in front of every scanline
+        line = b'\x00' + view[row * row_bytes:(row + 1) * row_bytes]
+        adler = zlib.adler32(line, adler)
+        pieces.append(compressor.compress(line))
+    # Sync flush ends the segment on a byte boundary without closing the stream
+    pieces.append(compressor.flush(zlib.Z_SYNC_FLUSH))
+    return b''.join(pieces), adler, rows * (row_bytes + 1)
+
+@lru_cache(maxsize=256)
+def get_up_rows_span(row_bytes, rows, compress_level=6):
+    """Deflate segment for `rows` scanlines that repeat the row above: filter type 2 (Up), all zero
+    
+    Cached per (row width, run length, level), so each span is compressed once per process.
+    Same return value as deflate_png_rows.
+    """
+    line = b'\x02' + bytes(row_bytes)
+    compressor = zlib.compressobj(compress_level, zlib.DEFLATED, -15)
+    pieces = []
+    adler = 1
+    for _ in range(rows):
+        adler = zlib.adler32(line, adler)
+        pieces.append(compressor.compress(line))
+    pieces.append(compressor.flush(zlib.Z_SYNC_FLUSH))
+    return b''.join(pieces), adler, rows * len(line)
+
+def deflate_png_rows_dedupe(raw, row_bytes, compress_level=6):
+    """deflate_png_rows that only compresses distinct scanlines
+    
+    Within a panel row every scanline that misses the labels repeats the one above it; those
+    runs are written as precompressed Up spans (power-of-two lengths from get_up_rows_span).
+    Blocks of distinct rows are compressed as their own segments and reused when the same
+    block comes back (the checkerboard repeats every two panel rows), so deflate work tracks
+    the number of distinct rows, not height × width. Same return value as deflate_png_rows.
+    """
+    data = raw if isinstance(raw, bytes) else bytes(raw)
+    rows = len(data) // row_bytes
+    literal_cache = {}
+    pieces = []
+    adler = 1
+    length = 0
+    
+    def append(segment, segment_adler, segment_length):
+        nonlocal adler, length
+        pieces.append(segment)
+        adler = adler32_combine(adler, segment_adler, segment_length)
+        length += segment_length
+    
+    row = 0
+    previous = None
+    while row < rows:
+        # Block of distinct rows, up to the first row that repeats the one above it
+        start = row
+        line = data[row * row_bytes:(row + 1) * row_bytes]
+        while True:
+            previous = line
+            row += 1
+            if row == rows:
+                break
+            line = data[row * row_bytes:(row + 1) * row_bytes]
+            if line == previous:
+                break
+        block = data[start * row_bytes:row * row_bytes]
+        key = hashlib.blake2b(block, digest_size=16).digest()
+        segment = literal_cache.get(key)
+        if segment is None:
+            segment = deflate_png_rows(block, row_bytes, compress_level)
+            if len(literal_cache) < LITERAL_CACHE_ENTRIES:
+                literal_cache[key] = segment
+        append(*segment)
+        
+        # Run of repeated rows, emitted as cached Up spans
+        start = row
+        while row < rows and data[row * row_bytes:(row + 1) * row_bytes] == previous:
+            row += 1
+        run = row - start
+        while run:
+            span = min(UP_SPAN_MAX_ROWS, 1 << (run.bit_length() - 1))
+            append(*get_up_rows_span(row_bytes, span, compress_level))
+            run -= span
+    
+    return b''.join(pieces), adler, length
+
+_deflate_pool = None
+_deflate_pool_lock = threading.Lock()
+
+def get_deflate_pool():
+    """Shared thread pool for parallel deflate (zlib releases the GIL while compressing)"""
+    global _deflate_pool
+    with _deflate_pool_lock:
+        if _deflate_pool is None:
+            _deflate_pool = ThreadPoolExecutor(max_workers=max(1, DEFLATE_THREADS), thread_name_prefix='deflate')
+        return _deflate_pool
+
+def deflate_png_rows_parallel(raw, row_bytes, compress_level=6, threads=None, dedupe_rows=False):
+    """pigz-style deflate: compress independent row ranges on the thread pool and join them
+    
+    Each range ends with a sync flush, so the concatenation is itself one valid segment;
+    the Adler-32 values are combined in order. Same return value as deflate_png_rows.
+    dedupe_rows compresses each range with deflate_png_rows_dedupe.
+    """
+    deflate = deflate_png_rows_dedupe if dedupe_rows else deflate_png_rows
+    if threads is None:
+        threads = DEFLATE_THREADS
+    rows = len(raw) // row_bytes
+    rows_per_part = max(1, -(-rows // max(1, threads)), PARALLEL_DEFLATE_MIN_BYTES // (row_bytes + 1))
+    if threads <= 1 or rows <= rows_per_part:
+        return deflate(raw, row_bytes, compress_level)
+    
+    view = memoryview(raw)
+    parts = [view[start * row_bytes:min(rows, start + rows_per_part) * row_bytes]
+             for start in range(0, rows, rows_per_part)]
+    results = list(get_deflate_pool().map(lambda part: deflate(part, row_bytes, compress_level), parts))
+    
+    adler = 1
+    length = 0
+    for _, part_adler, part_length in results:
+        adler = adler32_combine(adler, part_adler, part_length)
+        length += part_length
+    return b''.join(result[0] for result in results), adler, length
+
+def png_bit_depth(palette_size=None):
+    """Bits per pixel for PNG output: 8-bit channels for RGB, 4 or 8-bit indices for palette images"""
+    if palette_size is None:
+        return 8
+    return 4 if palette_size <= 16 else 8
+
+def png_row_bytes(width, palette_size=None):
+    """Bytes in one unfiltered PNG scanline"""
+    if palette_size is None:
+        return width * 3
+    return (width * png_bit_depth(palette_size) + 7) // 8
+
+def image_png_rows(image):
+    """Raw PNG scanline bytes of an RGB or 'P' image, plus the bytes per scanline"""
+    if image.mode == 'P':
+        palette_size = len(image.getpalette()) // 3
+        rawmode = 'P;4' if png_bit_depth(palette_size) == 4 else 'P'
+        return image.tobytes('raw', rawmode), png_row_bytes(image.width, palette_size)
+    return image.tobytes(), png_row_bytes(image.width)
+
+class StreamingPNGWriter:
+    """Incremental PNG encoder - scanlines in, PNG bytes out (IHDR, [PLTE], IDAT..., IEND)
+    
+    Scanlines arrive as independent deflate segments (compressed here or in a worker),
+    so only one segment and at most one pending IDAT chunk are held in memory.
+    With a palette the file is indexed color at 4 bits (<= 16 colors) or 8 bits per pixel.
+    dedupe_rows writes repeated scanlines as cached Up spans (see deflate_png_rows_dedupe).
+    """
+    
+    def __init__(self, width, height, compress_level=6, idat_size=PNG_IDAT_CHUNK_SIZE, threads=None, palette=None, dedupe_rows=None):
+        self.width = width
+        self.height = height
+        self.palette = palette
+        palette_size = len(palette) if palette else None
+        self.bit_depth = png_bit_depth(palette_size)
+        self.row_bytes = png_row_bytes(width, palette_size)
+        self.compress_level = compress_level
+        self.threads = threads
+        self.dedupe_rows = PNG_DEDUPE_ROWS if dedupe_rows is None else dedupe_rows
+        self.idat_size = idat_size
+        self.rows_written = 0
+        self.bytes_written = 0
+        self._adler = 1
+        self._pending = [ZLIB_HEADER]
+        self._pending_size = len(ZLIB_HEADER)
+    
+    def header(self):
+        """PNG signature plus IHDR (truecolor or indexed, no interlace) and PLTE for indexed output"""
+        color_type = 3 if self.palette else 2
+        ihdr = struct.pack('>IIBBBBB', self.width, self.height, self.bit_depth, color_type, 0, 0, 0)
+        data = PNG_SIGNATURE + png_chunk(b'IHDR', ihdr)
+        if self.palette:
+            data += png_chunk(b'PLTE', bytes(flatten_palette(self.palette)))
+        return self._emit(data)
+    
+    def write_rows(self, raw):
+        """Encode whole scanlines of raw bytes (see image_png_rows); returns the PNG bytes ready to send (may be empty)"""
+        segment, adler, length = deflate_png_rows_parallel(raw, self.row_bytes, self.compress_level, self.threads,
+                                                           self.dedupe_rows)
+        return self.write_segment(segment, adler, length)
+    
+    def write_segment(self, segment, adler, length):
+        """Append a deflate segment from deflate_png_rows; returns the PNG bytes ready to send"""
+        self._adler = adler32_combine(self._adler, adler, length)
+        self.rows_written += length // (self.row_bytes + 1)
+        self._pending.append(segment)
+        self._pending_size += len(segment)
+        return self._drain(final=False)
+    
+    def finish(self):
+        """Close the deflate stream (final block + Adler-32) and the file with IEND"""
+        if self.rows_written != self.height:
+            raise ValueError(f"PNG stream got {self.rows_written} rows, expected {self.height}")
+        final_block = zlib.compressobj(self.compress_level, zlib.DEFLATED, -15).flush()
+        self._pending.append(final_block + struct.pack('>I', self._adler))
+        self._pending_size += len(self._pending[-1])
+        return self._drain(final=True) + self._emit(png_chunk(b'IEND', b''))
+    
+    def _drain(self, final):
+        if not self._pending or (not final and self._pending_size < self.idat_size):
+            return b''
+        data = b''.join(self._pending)
+        self._pending = []
+        self._pending_size = 0
+        return self._emit(b''.join(png_chunk(b'IDAT', data[i:i + self.idat_size])
+                                   for i in range(0, len(data), self.idat_size)))
+    
+    def _emit(self, data):
+        self.bytes_written += len(data)
+        return data
+
+def get_streaming_band_height(width, led_panel_height, band_bytes=STREAMING_BAND_BYTES, bytes_per_pixel=3):
+    """Band height in rows: a whole number of panel rows (so labels never straddle bands) within the byte budget"""
+    panel_rows = max(1, band_bytes // max(1, width * bytes_per_pixel * led_panel_height))
+    return panel_rows * led_panel_height
+
+def render_pixel_map_band(width, height, band_top, band_height, led_panel_width, led_panel_height, show_grid=True, show_panel_numbers=True, led_name='Absen', show_name=False, show_cross=False, show_circle=False, show_logo=False, surface_name='Screen One', color_mode='rgb'):
+    """Render one full-width horizontal band of the map through the chunk/offset logic"""
+    mode = 'P' if color_mode == 'indexed' else 'RGB'
+    palette = build_pixel_map_palette(led_name, border_factor=0.3) if mode == 'P' else None
+    band = new_pixel_map_image(mode, (width, band_height), palette)
+    band_draw = ImageDraw.Draw(band)
+    
+    generate_enhanced_grid_for_chunk(
+        band_draw, width, band_height, 0, band_top,
+        led_panel_width, led_panel_height, mode, show_grid, show_panel_numbers, led_name,
+        image=band
+    )
+    
+    # Overlays are positioned on the full map and clipped to this band
+    if show_name or show_cross or show_circle or show_logo:
+        add_visual_overlays(band_draw, width, height, surface_name, show_name, show_cross, show_circle, show_logo,
+                            offset_x=0, offset_y=band_top)
+    
+    return band
+
+def render_band_segment(band_args, compress_level=6, dedupe_rows=False):
+    """Render one band and deflate it into a PNG stream segment - runs in-process or in a pool worker"""
+    raw, row_bytes = image_png_rows(render_pixel_map_band(*band_args))
+    if dedupe_rows:
+        return deflate_png_rows_dedupe(raw, row_bytes, compress_level)
+    return deflate_png_rows(raw, row_bytes, compress_level)
+
+_render_pool = None
+_render_pool_workers = 0
+_render_pool_lock = threading.Lock()
+
+def get_render_pool(workers):
+    """Shared process pool for band rendering (created on first use, resized if the worker count changes)"""
+    global _render_pool, _render_pool_workers
+    with _render_pool_lock:
+        if _render_pool is None or _render_pool_workers != workers:
+            if _render_pool is not None:
+                _render_pool.shutdown(wait=False, cancel_futures=True)
+            logger.info(f"🧵 Starting render pool with {workers} worker processes")
+            _render_pool = ProcessPoolExecutor(max_workers=workers,
+                                               mp_context=multiprocessing.get_context(RENDER_POOL_START_METHOD))
+            _render_pool_workers = workers
+        return _render_pool
+
+def reset_render_pool():
+    """Drop a broken pool (e.g. a worker was OOM-killed) so the next render starts a fresh one"""
+    global _render_pool, _render_pool_workers
+    with _render_pool_lock:
+        if _render_pool is not None:
+            _render_pool.shutdown(wait=False, cancel_futures=True)
+        _render_pool = None
+        _render_pool_workers = 0
+
+def iter_parallel_band_segments(band_args_list, workers, compress_level=6, dedupe_rows=False):
+    """Fan bands out to the process pool and yield their deflate segments in band order
+    
+    At most 2 × workers bands are in flight, so memory stays bounded while every core is busy.
+    """
+    pool = get_render_pool(workers)
+    pending = deque()
+    try:
+        for band_args in band_args_list:
+            pending.append(pool.submit(render_band_segment, band_args, compress_level, dedupe_rows))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    except BrokenProcessPool:
+        logger.error("❌ Render pool broke (worker died) - resetting pool")
+        reset_render_pool()
+        raise
+    finally:
+        for future in pending:
+            future.cancel()
+
+def iter_streaming_pixel_map_png(width, height, led_panel_width, led_panel_height, show_grid=True, show_panel_numbers=True, led_name='Absen', show_name=False, show_cross=False, show_circle=False, show_logo=False, surface_name='Screen One', compress_level=6, band_height=None, workers=None, color_mode='rgb', dedupe_rows=None, progress=None):
+    """Render the map band by band and yield PNG bytes as they are encoded
+    
+    Peak memory is bounded by band height × width × 3 (per worker), no matter how tall the wall is.
+    color_mode 'indexed' renders 'P' bands and writes a 4-bit palette PNG (a third of the band memory).
+    workers: band rendering processes (None = RENDER_WORKERS, 1 = render in this process
+             and deflate each band on the DEFLATE_THREADS thread pool)
+    dedupe_rows: encode repeated scanlines as cached Up spans (None = PNG_DEDUPE_ROWS)
+    progress: optional callback(stage, done, total, bytes_written), called with 'encode' after each band
+    """
+    if dedupe_rows is None:
+        dedupe_rows = PNG_DEDUPE_ROWS
+    if workers is None:
+        workers = RENDER_WORKERS
+    workers = max(1, workers)
+    palette = build_pixel_map_palette(led_name, border_factor=0.3) if color_mode == 'indexed' else None
+    if band_height is None:
+        # Split the band budget between workers so total memory stays the same
+        band_height = get_streaming_band_height(width, led_panel_height, STREAMING_BAND_BYTES // workers,
+                                                bytes_per_pixel=1 if palette else 3)
+    band_tops = range(0, height, band_height)
+    total_bands = len(band_tops)
+    workers = min(workers, total_bands)
+    logger.info(f"🌊 STREAMING: {width}×{height}px in {total_bands} bands of {band_height} rows ({workers} workers)")
+    
+    writer = StreamingPNGWriter(width, height, compress_level=compress_level, palette=palette, dedupe_rows=dedupe_rows)
+    yield writer.header()
+    if progress:
+        progress('encode', 0, total_bands, writer.bytes_written)
+    
+    band_args_list = (
+        (width, height, band_top, min(band_height, height - band_top), led_panel_width, led_panel_height,
+         show_grid, show_panel_numbers, led_name, show_name, show_cross, show_circle, show_logo, surface_name,
+         color_mode)
+        for band_top in band_tops
+    )
+    if workers > 1:
+        segments = iter_parallel_band_segments(band_args_list, workers, compress_level, dedupe_rows)
+    else:
+        # Render here, then compress each band's row ranges on the deflate thread pool
+        segments = (deflate_png_rows_parallel(*image_png_rows(render_pixel_map_band(*band_args)), compress_level,
+                                              dedupe_rows=dedupe_rows)
+                    for band_args in band_args_list)
+    
+    for band_index, (segment, adler, length) in enumerate(segments):
+        data = writer.write_segment(segment, adler, length)
+        if data:
+            yield data
+        if progress:
+            progress('encode', band_index + 1, total_bands, writer.bytes_written)
+        
+        if (band_index + 1) % 10 == 0:
+            memory_info = get_memory_info()
+            percent = ((band_index + 1) / total_bands) * 100
+            logger.info(f"Streaming progress: {percent:.1f}% ({band_index + 1}/{total_bands} bands) - Memory: {memory_info['rss_mb']:.1f}MB")
+    
+    yield writer.finish()
+    logger.info(f"✅ Streamed PNG: {writer.bytes_written / (1024 * 1024):.2f}MB")
+
+# Map specs: one normalized description of a map, shared by tiles, regions and previews
+def pixel_map_spec(surface, config):
+    """Normalize the request's surface/config dicts into the map description used by the renderers
+    
+    Raises ValueError for non-numeric or non-positive panel counts and sizes.
+    """
+    panels_width = int(surface.get('panelsWidth', 10))
+    panels_height = int(surface.get('fullPanelsHeight', 5))
+    panel_pixel_width = int(surface.get('panelPixelWidth', 200))
+    panel_pixel_height = int(surface.get('panelPixelHeight', 200))
+    if min(panels_width, panels_height, panel_pixel_width, panel_pixel_height) <= 0:
+        raise ValueError("Panel counts and panel sizes must be positive")
+    
+    return {
+        'width': panels_width * panel_pixel_width,
+        'height': panels_height * panel_pixel_height,
+        'panel_width': panel_pixel_width,
+        'panel_height': panel_pixel_height,
+        'led_name': str(surface.get('ledName', 'Unknown LED')),
+        'show_grid': bool(config.get('showGrid', True)),
+        'show_panel_numbers': bool(config.get('showPanelNumbers', True)),
+        'show_name': bool(config.get('showName', False)),
+        'show_cross': bool(config.get('showCross', False)),
+        'show_circle': bool(config.get('showCircle', False)),
+        'show_logo': bool(config.get('showLogo', False)),
+        'surface_name': str(config.get('surfaceName', 'Screen One')),
+    }
+
+def pixel_map_spec_from_args(args):
+    """Map spec from query parameters named like the JSON fields (for GET routes)"""
+    surface = {name: args[name] for name in ('panelsWidth', 'fullPanelsHeight', 'panelPixelWidth', 'panelPixelHeight', 'ledName')
+               if name in args}
+    config = {name: args[name].lower() in ('1', 'true', 'yes', 'on')
+              for name in ('showGrid', 'showPanelNumbers', 'showName', 'showCross', 'showCircle', 'showLogo')
+              if name in args}
+    if 'surfaceName' in args:
+        config['surfaceName'] = args['surfaceName']
+    return pixel_map_spec(surface, config)
+
+def pixel_map_spec_key(spec):
+    """Canonical hash of a spec - the same map always gets the same key, whatever the field order"""
+    return hashlib.sha256(json.dumps(spec, sort_keys=True, separators=(',', ':')).encode('utf-8')).hexdigest()
+
+def map_border_factor(width, height):
+    """Border brightening used by the full render of a map this size (streamed maps use 0.3)"""
+    return 0.3 if width * height > 50_000_000 else 0.4
+
+def render_map_region(spec, x, y, width, height):
+    """Render one rectangle of the map at full resolution, in global map coordinates
+    
+    Uses the chunk offset logic, so the cost is the region area and the result matches
+    the same pixels of the full map (labels and overlays are clipped at the edges).
+    """
+    image = Image.new('RGB', (width, height), (0, 0, 0))
+    draw = ImageDraw.Draw(image)
+    generate_enhanced_grid_for_chunk(
+        draw, width, height, x, y, spec['panel_width'], spec['panel_height'], 'RGB',
+        spec['show_grid'], spec['show_panel_numbers'], spec['led_name'], image=image,
+        border_factor=map_border_factor(spec['width'], spec['height']), clip_labels=True
+    )
+    if spec['show_name'] or spec['show_cross'] or spec['show_circle'] or spec['show_logo']:
+        add_visual_overlays(draw, spec['width'], spec['height'], spec['surface_name'], spec['show_name'],
+                            spec['show_cross'], spec['show_circle'], spec['show_logo'], offset_x=x, offset_y=y)
+    return image
+
+def parse_map_region(region, width, height):
+    """Validate a request region {x, y, width, height} and clip it to the map
+    
+    Returns (x, y, width, height); raises ValueError if it is malformed or misses the map.
+    """
+    if not isinstance(region, dict):
+        raise ValueError("region must be an object with x, y, width and height")
+    x, y = int(region.get('x', 0)), int(region.get('y', 0))
+    region_width, region_height = int(region['width']), int(region['height'])
+    if region_width <= 0 or region_height <= 0:
+        raise ValueError("region width and height must be positive")
+    
+    left, top = max(0, x), max(0, y)
+    right, bottom = min(width, x + region_width), min(height, y + region_height)
+    if right <= left or bottom <= top:
+        raise ValueError(f"region does not overlap the {width}×{height}px map")
+    return left, top, right - left, bottom - top
+
+def parse_preview_scale(preview, width, height):
+    """Scale that fits the map into a preview {maxWidth, maxHeight} (1.0 if it already fits)"""
+    if not isinstance(preview, dict):
+        raise ValueError("preview must be an object with maxWidth and maxHeight")
+    max_width = int(preview.get('maxWidth', width))
+    max_height = int(preview.get('maxHeight', height))
+    if max_width <= 0 or max_height <= 0:
+        raise ValueError("preview maxWidth and maxHeight must be positive")
+    return min(1.0, max_width / width, max_height / height)
+
+def quantize_to_map_palette(image, led_name, border_factor):
+    """Map an RGB render onto the fixed indexed palette (exact colors keep their entry, no dithering)"""
+    palette_image = new_pixel_map_image('P', (1, 1), build_pixel_map_palette(led_name, border_factor))
+    return image.quantize(palette=palette_image, dither=Image.Dither.NONE)
+
+def iter_map_region_png(spec, x, y, width, height, color_mode='rgb', compress_level=6, progress=None):
+    """Render a map region band by band into a streamed PNG (for regions too big to hold at once)"""
+    border_factor = map_border_factor(spec['width'], spec['height'])
+    palette = build_pixel_map_palette(spec['led_name'], border_factor) if color_mode == 'indexed' else None
+    band_height = max(1, STREAMING_BAND_BYTES // (width * 3))
+    band_tops = range(0, height, band_height)
+    writer = StreamingPNGWriter(width, height, compress_level=compress_level, palette=palette)
+    yield writer.header()
+    if progress:
+        progress('encode', 0, len(band_tops), writer.bytes_written)
+    for band_index, band_top in enumerate(band_tops):
+        band = render_map_region(spec, x, y + band_top, width, min(band_height, height - band_top))
+        if palette:
+            band = quantize_to_map_palette(band, spec['led_name'], border_factor)
+        data = writer.write_rows(image_png_rows(band)[0])
+        if data:
+            yield data
+        if progress:
+            progress('encode', band_index + 1, len(band_tops), writer.bytes_written)
+    yield writer.finish()
+
+SCALED_BORDER_MIN_PX = 4  # Scaled panels narrower than this are drawn without borders
+SCALED_LABEL_MIN_PX = 12  # Scaled panel numbers / surface names smaller than this are left out (vector digits need 12px)
+
+def scaled_panel_indices(offset, length, panel_size, scale, panel_count):
+    """Panel index under each output pixel along one axis, plus whether the pixel is a panel's first or last
+    
+    Output pixel p samples map position (p + 0.5) / scale, so no full-size pixels are touched.
+    """
+    indices = [math.floor((position + 0.5) / scale / panel_size) for position in range(offset - 1, offset + length + 1)]
+    edges = [indices[i] != indices[i - 1] or indices[i] != indices[i + 1] for i in range(1, length + 1)]
+    return [min(index, panel_count - 1) for index in indices[1:-1]], edges
+
+def render_scaled_region(spec, scale, x, y, width, height):
+    """Render one rectangle of the map at scale < 1 directly from the layout (never at full size)
+    
+    x, y, width, height are in scaled coordinates. Borders collapse to one output pixel per
+    panel edge and are dropped once panels are narrower than SCALED_BORDER_MIN_PX; panels
+    under two output pixels blend into the average checkerboard color; panel numbers and
+    the surface name are left out below SCALED_LABEL_MIN_PX.
+    """
+    led_panel_width, led_panel_height = spec['panel_width'], spec['panel_height']
+    panels_x = spec['width'] // led_panel_width
+    panels_y = spec['height'] // led_panel_height
+    border_factor = map_border_factor(spec['width'], spec['height'])
+    panel_colors = [generate_color(0, 0, spec['led_name']), generate_color(1, 0, spec['led_name'])]
+    border_colors = [brighten_color(color, border_factor) for color in panel_colors]
+    scaled_panel = min(led_panel_width, led_panel_height) * scale
+    
+    if scaled_panel < 2:
+        # Sub-pixel panels: the checkerboard averages out
+        blended = tuple(sum(channel) // 2 for channel in zip(*panel_colors))
+        image = Image.new('RGB', (width, height), blended)
+    else:
+        cols, col_edges = scaled_panel_indices(x, width, led_panel_width, scale, panels_x)
+        rows, row_edges = scaled_panel_indices(y, height, led_panel_height, scale, panels_y)
+        show_borders = spec['show_grid'] and scaled_panel >= SCALED_BORDER_MIN_PX
+        
+        if NUMPY_AVAILABLE:
+            parity = (np.array(rows)[:, None] + np.array(cols)[None, :]) % 2
+            canvas = np.array(panel_colors, dtype=np.uint8)[parity]
+            if show_borders:
+                edge = np.array(row_edges)[:, None] | np.array(col_edges)[None, :]
+                canvas[edge] = np.array(border_colors, dtype=np.uint8)[parity[edge]]
+            image = Image.fromarray(canvas, 'RGB')
+        else:
+            image = Image.new('RGB', (width, height))
+            draw = ImageDraw.Draw(image)
+            for row_index, (row, row_edge) in enumerate(zip(rows, row_edges)):
+                for col_index, (col, col_edge) in enumerate(zip(cols, col_edges)):
+                    color_index = (row + col) % 2
+                    color = border_colors[color_index] if show_borders and (row_edge or col_edge) else panel_colors[color_index]
+                    draw.point((col_index, row_index), fill=color)
+    
+    draw = ImageDraw.Draw(image)
+    number_size = max(12, int(min(led_panel_width, led_panel_height) * 0.15))
+    if spec['show_panel_numbers'] and int(number_size * scale) >= SCALED_LABEL_MIN_PX:
+        draw_panel_labels_in_region(draw, width, height, x, y, led_panel_width, led_panel_height,
+                                    scale=scale, panels_x=panels_x, panels_y=panels_y)
+    
+    add_scaled_visual_overlays(draw, spec['width'], spec['height'], scale, spec['surface_name'],
+                               spec['show_name'], spec['show_cross'], spec['show_circle'], offset_x=x, offset_y=y)
+    return image
+
+def add_scaled_visual_overlays(draw, width, height, scale, surface_name, show_name=False, show_cross=False, show_circle=False, offset_x=0, offset_y=0):
+    """add_visual_overlays for a map drawn at scale < 1: same geometry, scaled coordinates"""
+    if show_name and surface_name:
+        font, font_size, text_x, text_y, text_width, text_height, target_text_width = fit_surface_name_font(width, height, surface_name)
+        scaled_font_size = int(font_size * scale)
+        if scaled_font_size >= SCALED_LABEL_MIN_PX and hasattr(font, 'font_variant'):
+            draw.text((int(text_x * scale) - offset_x, int(text_y * scale) - offset_y), surface_name,
+                      font=font.font_variant(size=scaled_font_size), fill=(255, 191, 0))
+    
+    if show_circle:
+        center_x = width // 2
+        center_y = height // 2
+        radius = height // 2
+        draw.ellipse([(center_x - radius) * scale - offset_x, (center_y - radius) * scale - offset_y,
+                      (center_x + radius) * scale - offset_x, (center_y + radius) * scale - offset_y],
+                     outline=(255, 255, 255), width=1)
+    
+    if show_cross:
+        right = (width - 1) * scale - offset_x
+        bottom = (height - 1) * scale - offset_y
+        draw.line([(-offset_x, -offset_y), (right, bottom)], fill=(255, 255, 255), width=1)
+        draw.line([(right, -offset_y), (-offset_x, bottom)], fill=(255, 255, 255), width=1)
+
+class BytesLRUCache:
+    """Thread-safe LRU cache of bytes values bounded by their total size
+    
+    Values bigger than max_item_bytes are not stored; hits, misses and evictions are counted.
+    """
+    
+    def __init__(self, max_bytes, max_item_bytes=None):
+        self.max_bytes = max_bytes
+        self.max_item_bytes = max_item_bytes or max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+    
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+    
+    def put(self, key, value, size=None):
+        """Store a value; returns False when it is too big to cache
+        
+        size: bytes charged for the value (defaults to len(value), for values that are not bytes)
+        """
+        if size is None:
+            size = len(value)
+        if size > self.max_item_bytes:
+            return False
+        with self._lock:
+            if key in self._entries:
+                self._size -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size)
+            self._size += size
+            while self._size > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._size -= evicted_size
+                self.evictions += 1
+        return True
+    
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._size,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+class RenderDiskCache:
+    """Content-addressed disk cache of finished renders, bounded by total size (LRU eviction)
+    
+    Files are named by the request hash; a small SQLite index holds sizes, metadata and last
+    access times, so every server process shares one cache. A max_bytes of 0 disables it.
+    """
+    
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._ready = False
+    
+    def _connect(self):
+        os.makedirs(self.directory, exist_ok=True)
+        connection = sqlite3.connect(os.path.join(self.directory, 'index.sqlite3'), timeout=30)
+        with self._lock:
+            if not self._ready:
+                connection.execute('PRAGMA journal_mode=WAL')
+                connection.execute('CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, size INTEGER NOT NULL, '
+                                   'mime_type TEXT NOT NULL, meta TEXT NOT NULL, last_access REAL NOT NULL)')
+                connection.execute('CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access)')
+                self._ready = True
+        return connection
+    
+    def entry_path(self, key, mime_type):
+        extension = 'svg' if mime_type == 'image/svg+xml' else 'png'
+        return os.path.join(self.directory, key[:2], f'{key}.{extension}')
+    
+    def get(self, key):
+        """{'path', 'size', 'mime_type', 'meta'} for a cached render, or None"""
+        if self.max_bytes <= 0:
+            return None
+        with closing(self._connect()) as connection, connection:
+            row = connection.execute('SELECT size, mime_type, meta FROM entries WHERE key = ?', (key,)).fetchone()
+            if row is not None:
+                path = self.entry_path(key, row[1])
+                if os.path.exists(path):
+                    connection.execute('UPDATE entries SET last_access = ? WHERE key = ?', (time.time(), key))
+                    self.hits += 1
+                    return {'path': path, 'size': row[0], 'mime_type': row[1], 'meta': json.loads(row[2])}
+                connection.execute('DELETE FROM entries WHERE key = ?', (key,))  # File removed behind our back
+        self.misses += 1
+        return None
+    
+    def open_temp(self):
+        """Binary temp file inside the cache directory, for renders written as they stream"""
+        os.makedirs(self.directory, exist_ok=True)
+        return tempfile.NamedTemporaryFile(dir=self.directory, suffix='.tmp', delete=False)
+    
+    def put(self, key, data, mime_type, meta):
+        """Store rendered bytes; returns False when caching is off or the file is too big"""
+        if self.max_bytes <= 0 or len(data) > self.max_bytes:
+            return False
+        with self.open_temp() as f:
+            f.write(data)
+        return self.put_file(key, f.name, mime_type, meta)
+    
+    def put_file(self, key, temp_path, mime_type, meta):
+        """Move a finished temp file into the cache (the temp file is always consumed)"""
+        size = os.path.getsize(temp_path)
+        if self.max_bytes <= 0 or size > self.max_bytes:
+            os.remove(temp_path)
+            return False
+        path = self.entry_path(key, mime_type)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(temp_path, path)
+        with closing(self._connect()) as connection, connection:
+            connection.execute('INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)',
+                               (key, size, mime_type, json.dumps(meta), time.time()))
+            self._evict(connection)
+        return True
+    
+    def _evict(self, connection):
+        total = connection.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size, mime_type in connection.execute('SELECT key, size, mime_type FROM entries ORDER BY last_access').fetchall():
+            try:
+                os.remove(self.entry_path(key, mime_type))
+            except FileNotFoundError:
+                pass
+            connection.execute('DELETE FROM entries WHERE key = ?', (key,))
+            self.evictions += 1
+            logger.info(f"🧹 Render cache evicted {key[:12]} ({size / (1024 * 1024):.2f}MB)")
+            total -= size
+            if total <= self.max_bytes:
+                break
+    
+    def stats(self):
+        entries, size = 0, 0
+        if self.max_bytes > 0:
+            with closing(self._connect()) as connection:
+                entries, size = connection.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries').fetchone()
+        lookups = self.hits + self.misses
+        return {
+            'entries': entries,
+            'bytes': size,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+# Finished /generate-pixel-map renders, keyed by the normalized request (bump the version when output changes)
+RENDER_CACHE_DIR = os.environ.get('RENDER_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'led-pixel-map-cache'))
+RENDER_CACHE_BYTES = int(os.environ.get('RENDER_CACHE_MB', 2048)) * 1024 * 1024
+RENDER_CACHE_VERSION = 3
+render_cache = RenderDiskCache(RENDER_CACHE_DIR, RENDER_CACHE_BYTES)
+
+# Small and medium renders are also kept in memory, ahead of the disk cache
+RESULT_CACHE_BYTES = int(os.environ.get('RESULT_CACHE_MB', 128)) * 1024 * 1024
+RESULT_CACHE_MAX_ITEM_BYTES = int(os.environ.get('RESULT_CACHE_ITEM_MB', 16)) * 1024 * 1024  # Bigger files skip memory
+result_cache = BytesLRUCache(RESULT_CACHE_BYTES, RESULT_CACHE_MAX_ITEM_BYTES)
+TILE_CACHE_BYTES = int(os.environ.get('TILE_CACHE_MB', 64)) * 1024 * 1024  # Deep-zoom tiles (cache created with the tile routes)
+
+# Metrics: counters and histograms for /metrics (Prometheus text format, per server process)
+METRIC_SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+METRIC_BYTES_BUCKETS = (1e4, 1e5, 1e6, 1e7, 1e8, 1e9)
+METRIC_RSS_BUCKETS = tuple(mb * 1024 * 1024 for mb in (8, 16, 32, 64, 128, 256, 512, 1024, 2048))
+METRICS = {
+    # name: (type, help, histogram buckets)
+    'pixelmap_http_requests_total': ('counter', 'HTTP requests by endpoint and status', None),
+    'pixelmap_renders_total': ('counter', 'Renders that ran (cache misses) by engine and color mode', None),
+    'pixelmap_render_cache_responses_total': ('counter', 'Pixel map responses served from the render cache by tier', None),
+    'pixelmap_render_stage_seconds': ('histogram', 'Render time per stage', METRIC_SECONDS_BUCKETS),
+    'pixelmap_render_output_bytes': ('histogram', 'Size of rendered PNG/SVG output', METRIC_BYTES_BUCKETS),
+    'pixelmap_render_peak_rss_bytes': ('histogram', 'Peak resident memory of the process during a render', METRIC_RSS_BUCKETS),
+    'pixelmap_queue_wait_seconds': ('histogram', 'Time renders waited in the scheduler queue', METRIC_SECONDS_BUCKETS),
+}
+
+class RenderMetrics:
+    """Thread-safe counters and histograms, keyed by metric name and label values"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}  # (name, labels) -> value
+        self._histograms = {}  # (name, labels) -> [bucket counts..., sum, count]
+    
+    def inc(self, name, labels, value=1):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+    
+    def observe(self, name, labels, value):
+        buckets = METRICS[name][2]
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [0] * (len(buckets) + 2)
+            for index, bound in enumerate(buckets):
+                if value <= bound:
+                    histogram[index] += 1
+            histogram[-2] += value
+            histogram[-1] += 1
+    
+    def lines(self):
+        """Exposition lines for every recorded series, grouped by metric"""
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {key: list(values) for key, values in self._histograms.items()}
+        lines = []
+        for name, (metric_type, help_text, buckets) in METRICS.items():
+            series = sorted(key for key in (counters if metric_type == 'counter' else histograms) if key[0] == name)
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {metric_type}')
+            for key in series:
+                labels = key[1]
+                if metric_type == 'counter':
+                    lines.append(f'{name}{metric_labels(labels)} {format_metric_value(counters[key])}')
+                    continue
+                values = histograms[key]
+                for bound, count in zip(buckets, values):
+                    lines.append(f'{name}_bucket{metric_labels(labels + (("le", format_metric_value(bound)),))} {count}')
+                lines.append(f'{name}_bucket{metric_labels(labels + (("le", "+Inf"),))} {values[-1]}')
+                lines.append(f'{name}_sum{metric_labels(labels)} {format_metric_value(values[-2])}')
+                lines.append(f'{name}_count{metric_labels(labels)} {values[-1]}')
+        return lines
+
+def metric_labels(labels):
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in labels)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(labels, escaped)) + '}'
+
+def format_metric_value(value):
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+render_metrics = RenderMetrics()
+
+# Cost model: per-unit costs of each render path, calibrated from recorded renders
+RENDER_STATS_DB = os.environ.get('RENDER_STATS_DB', os.path.join(RENDER_CACHE_DIR, 'render_stats.sqlite3'))
+RENDER_STATS_SAMPLES = 50  # Recent renders kept per model
+COST_PRIOR_SAMPLES = 2  # Weight of the built-in costs, in renders, once real renders are recorded
+RENDER_COST_PRIORS = {
+    # Per unit of work: seconds, output bytes and memory bytes (plus a fixed memory floor)
+    'legacy': {'units': 'pixels', 'render_seconds': 8e-9, 'encode_seconds': 7e-9, 'output_bytes': 3.0, 'memory_bytes': 7.0, 'memory_fixed': 0},
+    'optimized': {'units': 'pixels', 'render_seconds': 1.2e-8, 'encode_seconds': 3e-8, 'output_bytes': 0.006, 'memory_bytes': 4.0, 'memory_fixed': 0},
+    'streaming': {'units': 'pixels', 'render_seconds': 1.2e-8, 'encode_seconds': 0.0, 'output_bytes': 0.009, 'memory_bytes': 0.0, 'memory_fixed': STREAMING_BAND_BYTES * 3},
+    'region': {'units': 'pixels', 'render_seconds': 2.5e-8, 'encode_seconds': 1.5e-8, 'output_bytes': 0.007, 'memory_bytes': 4.0, 'memory_fixed': 0},
+    'region_streaming': {'units': 'pixels', 'render_seconds': 4e-8, 'encode_seconds': 0.0, 'output_bytes': 0.009, 'memory_bytes': 0.0, 'memory_fixed': STREAMING_BAND_BYTES * 3},
+    'preview': {'units': 'output pixels', 'render_seconds': 5e-8, 'encode_seconds': 1e-8, 'output_bytes': 0.006, 'memory_bytes': 4.0, 'memory_fixed': 0},
+    'svg': {'units': 'panels', 'render_seconds': 2e-6, 'encode_seconds': 1e-7, 'output_bytes': 90.0, 'memory_bytes': 300.0, 'memory_fixed': 0},
+}
+INDEXED_COST_FACTORS = {'render_seconds': 0.4, 'encode_seconds': 0.4, 'output_bytes': 0.7, 'memory_bytes': 0.4}
+JSON_RESPONSE_MEMORY_FACTOR = 4.0  # Extra memory per output byte for base64 + JSON text (twice that with the data URL)
+REQUEST_TIMEOUT_SECONDS = int(os.environ.get('REQUEST_TIMEOUT_SECONDS', 120))  # gunicorn --timeout in the Procfile
+COST_METRICS = ('render_seconds', 'encode_seconds', 'output_bytes', 'memory_bytes')
+
+def select_render_path(total_pixels, color_mode='rgb', output_format='png', region=None, preview_scale=1.0):
+    """Which /generate-pixel-map path renders a request (mirrors the endpoint's branches)"""
+    if output_format == 'svg':
+        return 'svg'
+    if preview_scale < 1:
+        return 'preview'
+    if region is not None:
+        return 'region_streaming' if region[2] * region[3] > 50_000_000 else 'region'
+    if total_pixels > 5_000_000 or color_mode == 'indexed':
+        return 'streaming' if total_pixels > 50_000_000 else 'optimized'
+    return 'legacy'
+
+def render_cost_units(path, width, height, panel_width, panel_height, region=None, preview_scale=1.0):
+    """(units of work, output width, output height) for a render path"""
+    if path == 'svg':
+        output_width, output_height = (region[2], region[3]) if region else (width, height)
+        return (width // panel_width) * (height // panel_height), output_width, output_height
+    if path == 'preview':
+        output_width, output_height = max(1, int(width * preview_scale)), max(1, int(height * preview_scale))
+        return output_width * output_height, output_width, output_height
+    if region is not None:
+        return region[2] * region[3], region[2], region[3]
+    return width * height, width, height
+
+def render_cost_model_key(path, color_mode):
+    return path if path == 'svg' else f'{path}:{color_mode}'
+
+class RenderStatsLog:
+    """Recent render measurements per cost model, in a small SQLite file shared by all processes"""
+    
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._ready = False
+    
+    def _connect(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=30)
+        with self._lock:
+            if not self._ready:
+                connection.execute('CREATE TABLE IF NOT EXISTS renders (id INTEGER PRIMARY KEY AUTOINCREMENT, model TEXT NOT NULL, '
+                                   'units INTEGER NOT NULL, render_seconds REAL NOT NULL, encode_seconds REAL NOT NULL, '
+                                   'output_bytes INTEGER NOT NULL, memory_bytes INTEGER NOT NULL, recorded_at REAL NOT NULL)')
+                connection.execute('CREATE INDEX IF NOT EXISTS renders_model ON renders (model, id)')
+                self._ready = True
+        return connection
+    
+    def record(self, model, units, render_seconds, encode_seconds, output_bytes, memory_bytes):
+        with closing(self._connect()) as connection, connection:
+            connection.execute('INSERT INTO renders (model, units, render_seconds, encode_seconds, output_bytes, memory_bytes, recorded_at) '
+                               'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                               (model, units, render_seconds, encode_seconds, output_bytes, memory_bytes, time.time()))
+            connection.execute('DELETE FROM renders WHERE model = ? AND id NOT IN '
+                               '(SELECT id FROM renders WHERE model = ? ORDER BY id DESC LIMIT ?)',
+                               (model, model, RENDER_STATS_SAMPLES))
+    
+    def recent(self, model):
+        """[{units, render_seconds, encode_seconds, output_bytes, memory_bytes}] newest first"""
+        with closing(self._connect()) as connection:
+            rows = connection.execute('SELECT units, render_seconds, encode_seconds, output_bytes, memory_bytes FROM renders '
+                                      'WHERE model = ? ORDER BY id DESC', (model,)).fetchall()
+        return [dict(zip(('units',) + COST_METRICS, row)) for row in rows]
+
+render_stats = RenderStatsLog(RENDER_STATS_DB)
+
+def render_cost_coefficients(path, color_mode):
+    """Per-unit costs for a path: built-in priors, pulled toward the recorded renders
+    
+    Each metric is (sum of measured + prior × prior weight) / (sum of units + prior weight),
+    with the prior worth COST_PRIOR_SAMPLES average renders. Returns (costs, samples).
+    """
+    prior = dict(RENDER_COST_PRIORS[path])
+    if color_mode == 'indexed' and path != 'svg':
+        for metric, factor in INDEXED_COST_FACTORS.items():
+            prior[metric] *= factor
+    try:
+        samples = render_stats.recent(render_cost_model_key(path, color_mode))
+    except sqlite3.Error as e:
+        logger.warning(f"⚠️ Render stats unavailable: {e}")
+        samples = []
+    if not samples:
+        return prior, 0
+    
+    total_units = sum(sample['units'] for sample in samples)
+    prior_units = COST_PRIOR_SAMPLES * total_units / len(samples)
+    costs = dict(prior)
+    for metric in COST_METRICS:
+        measured = sum(sample[metric] for sample in samples)
+        if metric == 'memory_bytes':
+            measured = sum(max(0, sample[metric] - prior['memory_fixed']) for sample in samples)
+        costs[metric] = (measured + prior[metric] * prior_units) / (total_units + prior_units)
+    return costs, len(samples)
+
+def estimate_render_cost(path, color_mode, width, height, panel_width, panel_height, region=None, preview_scale=1.0):
+    """Predicted seconds, output bytes and memory for a render - nothing is drawn"""
+    units, output_width, output_height = render_cost_units(path, width, height, panel_width, panel_height,
+                                                           region, preview_scale)
+    costs, samples = render_cost_coefficients(path, color_mode)
+    render_seconds = costs['render_seconds'] * units
+    encode_seconds = costs['encode_seconds'] * units
+    output_bytes = int(costs['output_bytes'] * units)
+    memory_bytes = costs['memory_fixed'] + costs['memory_bytes'] * units
+    json_factor = JSON_RESPONSE_MEMORY_FACTOR * (2 if path == 'legacy' else 1)
+    return {
+        'path': path,
+        'units': units,
+        'unit': RENDER_COST_PRIORS[path]['units'],
+        'output_width': output_width,
+        'output_height': output_height,
+        'render_seconds': render_seconds,
+        'encode_seconds': encode_seconds,
+        'total_seconds': render_seconds + encode_seconds,
+        'output_bytes': output_bytes,
+        'memory_mb': memory_bytes / (1024 * 1024),
+        'memory_mb_json': (memory_bytes + output_bytes * json_factor) / (1024 * 1024),
+        'model': render_cost_model_key(path, color_mode),
+        'samples': samples
+    }
+
+def start_render_stats(path, color_mode, units):
+    """Measurement state for one render, filled in by report_render_progress"""
+    rss_mb = get_memory_info()['rss_mb']
+    return {'model': render_cost_model_key(path, color_mode), 'path': path, 'color_mode': color_mode,
+            'units': units, 'started': time.time(), 'encode_started': None,
+            'rss_start_mb': rss_mb, 'rss_peak_mb': rss_mb, 'finished': False}
+
+def note_render_stats(stats):
+    stats['rss_peak_mb'] = max(stats['rss_peak_mb'], get_memory_info()['rss_mb'])
+
+def finish_render_stats(stats, output_bytes):
+    """Record a finished render for calibration and /metrics (never fails the render itself)"""
+    if stats['finished']:
+        return
+    stats['finished'] = True
+    note_render_stats(stats)
+    now = time.time()
+    encode_started = stats['encode_started'] or now
+    
+    engine = {'engine': stats['path']}
+    render_metrics.inc('pixelmap_renders_total', dict(engine, color_mode=stats['color_mode']))
+    render_metrics.observe('pixelmap_render_output_bytes', engine, output_bytes)
+    if not stats['rss_start_mb']:
+        return  # No psutil: memory can't be measured, so the sample would skew the model
+    render_metrics.observe('pixelmap_render_peak_rss_bytes', engine, stats['rss_peak_mb'] * 1024 * 1024)
+    try:
+        render_stats.record(stats['model'], stats['units'], encode_started - stats['started'], now - encode_started,
+                            output_bytes, int(max(0, stats['rss_peak_mb'] - stats['rss_start_mb']) * 1024 * 1024))
+    except sqlite3.Error as e:
+        logger.warning(f"⚠️ Could not record render stats: {e}")
+
+# Render scheduler: renders wait for a worker slot and their predicted memory, shortest job first
+# The render budget is what the memory limit leaves after the interpreter, the in-memory caches and band processes
+RENDER_BASE_MEMORY_MB = 80  # Interpreter with Flask, PIL and NumPy loaded, before any render
+RENDER_MIN_BUDGET_MB = 64  # Floor when little is left: larger renders then run one at a time
+
+def default_render_memory_budget_mb():
+    """RENDER_MEMORY_LIMIT_MB minus everything resident that is not a render"""
+    # The pool only starts with more than one worker; it then holds RENDER_WORKERS processes and the forkserver
+    pool_mb = RENDER_POOL_SERVER_MB + RENDER_POOL_WORKER_MB * RENDER_WORKERS if RENDER_WORKERS > 1 else 0
+    cache_mb = (RESULT_CACHE_BYTES + TILE_CACHE_BYTES) // (1024 * 1024)
+    budget_mb = RENDER_MEMORY_LIMIT_MB - RENDER_BASE_MEMORY_MB - cache_mb - pool_mb
+    if budget_mb < RENDER_MIN_BUDGET_MB:
+        logger.warning(f"⚠️ {RENDER_MEMORY_LIMIT_MB}MB limit leaves {budget_mb}MB for renders after caches ({cache_mb}MB) "
+                       f"and {RENDER_WORKERS} band processes ({pool_mb}MB) - using {RENDER_MIN_BUDGET_MB}MB")
+        return RENDER_MIN_BUDGET_MB
+    return budget_mb
+
+if 'RENDER_MEMORY_BUDGET_MB' in os.environ:
+    RENDER_MEMORY_BUDGET_MB = int(os.environ['RENDER_MEMORY_BUDGET_MB'])
+else:
+    RENDER_MEMORY_BUDGET_MB = default_render_memory_budget_mb()
+RENDER_SLOTS = int(os.environ.get('RENDER_SLOTS', 2))  # Renders running at once per server process
+RENDER_AGING_RATE = float(os.environ.get('RENDER_AGING_RATE', 4.0))  # Predicted seconds forgiven per second queued
+ADMISSION_WAIT_SECONDS = float(os.environ.get('ADMISSION_WAIT_SECONDS', 30))  # Longest queue wait before 503
+ADMISSION_MIN_MB = 1
+SCHEDULER_WAIT_SAMPLES = 500  # Recent queue waits kept for the percentiles
+
+class MemoryReservation:
+    """Worker slot and memory held by one render, returned to the scheduler on release (idempotent)"""
+    
+    def __init__(self, scheduler, ticket, mb, waited_seconds):
+        self.mb = mb
+        self.waited_seconds = waited_seconds
+        self._scheduler = scheduler
+        self._ticket = ticket
+        self._released = False
+    
+    def release(self):
+        if self._released:
+            return
+        self._released = True
+        self._scheduler._release(self._ticket)
+
+class RenderScheduler:
+    """Bounded pool of render slots with a memory budget, handed out shortest job first
+    
+    Waiting renders are ordered by predicted seconds minus RENDER_AGING_RATE × seconds queued,
+    so small maps overtake bulk renders but a bulk render is never starved. Only the head of the
+    queue may start. A render larger than the whole memory budget starts only when nothing else
+    is rendering, so it can fail on its own without taking other renders down with it.
+    """
+    
+    def __init__(self, capacity_mb, workers=None, aging_rate=None):
+        self.capacity_mb = capacity_mb
+        self.workers = max(1, workers if workers is not None else RENDER_SLOTS)
+        self.aging_rate = aging_rate if aging_rate is not None else RENDER_AGING_RATE
+        self._condition = threading.Condition()
+        self._reservations = {}  # ticket -> (mb, expected finish time, pixels)
+        self._waiting = []  # heap of (priority, ticket)
+        self._queued = {}  # ticket -> time it was queued
+        self._tickets = 0
+        self._waits = deque(maxlen=SCHEDULER_WAIT_SAMPLES)
+        self.admitted = 0
+        self.rejected = 0
+    
+    @property
+    def reserved_mb(self):
+        return sum(reservation[0] for reservation in self._reservations.values())
+    
+    def _fits(self, mb):
+        if not self._reservations:
+            return True
+        return len(self._reservations) < self.workers and self.reserved_mb + mb <= self.capacity_mb
+    
+    def acquire(self, mb, expected_seconds=0.0, timeout=None, pixels=0):
+        """Wait up to timeout seconds for a slot and mb of memory; returns a MemoryReservation or None"""
+        mb = max(ADMISSION_MIN_MB, mb)
+        if timeout is None:
+            timeout = ADMISSION_WAIT_SECONDS
+        start = time.time()
+        deadline = start + timeout
+        with self._condition:
+            self._tickets += 1
+            ticket = self._tickets
+            # Aging lowers every waiter's priority at the same rate, so the key never changes
+            entry = (expected_seconds + self.aging_rate * start, ticket)
+            heapq.heappush(self._waiting, entry)
+            self._queued[ticket] = start
+            try:
+                while self._waiting[0] != entry or not self._fits(mb):
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        self.rejected += 1
+                        return None
+                    self._condition.wait(remaining)
+            finally:
+                self._waiting.remove(entry)
+                heapq.heapify(self._waiting)
+                del self._queued[ticket]
+                self._condition.notify_all()  # The next in line may fit now
+            waited_seconds = time.time() - start
+            self._reservations[ticket] = (mb, time.time() + expected_seconds, pixels)
+            self._waits.append(waited_seconds)
+            self.admitted += 1
+        return MemoryReservation(self, ticket, mb, waited_seconds)
+    
+    def _release(self, ticket):
+        with self._condition:
+            self._reservations.pop(ticket, None)
+            self._condition.notify_all()
+    
+    def retry_after(self, mb):
+        """Seconds until enough running renders are expected to finish for mb to fit"""
+        now = time.time()
+        with self._condition:
+            reservations = sorted(self._reservations.values(), key=lambda reservation: reservation[1])
+        free_mb = self.capacity_mb - sum(reservation[0] for reservation in reservations)
+        running = len(reservations)
+        finish = now
+        for reserved, expected_finish, _ in reservations:
+            if free_mb >= mb and running < self.workers:
+                break
+            free_mb += reserved
+            running -= 1
+            finish = max(finish, expected_finish)
+        return max(1, math.ceil(finish - now))
+    
+    def stats(self):
+        with self._condition:
+            waits = sorted(self._waits)
+            oldest = min(self._queued.values(), default=None)
+            return {
+                'workers': self.workers,
+                'capacity_mb': self.capacity_mb,
+                'reserved_mb': round(self.reserved_mb, 1),
+                'running': len(self._reservations),
+                'pixels_in_flight': sum(reservation[2] for reservation in self._reservations.values()),
+                'waiting': len(self._waiting),
+                'oldest_wait_seconds': round(time.time() - oldest, 3) if oldest is not None else 0.0,
+                'admitted': self.admitted,
+                'rejected': self.rejected,
+                'wait_seconds': {
+                    'p50': round(waits[len(waits) // 2], 3) if waits else 0.0,
+                    'p95': round(waits[min(len(waits) - 1, int(len(waits) * 0.95))], 3) if waits else 0.0,
+                    'max': round(waits[-1], 3) if waits else 0.0
+                }
+            }
+
+render_scheduler = RenderScheduler(RENDER_MEMORY_BUDGET_MB)
+
+# Single-flight: identical concurrent renders wait for the first one instead of rendering again
+RENDER_FLIGHT_TIMEOUT = int(os.environ.get('RENDER_FLIGHT_TIMEOUT', 900))  # Longest wait before rendering anyway
+RENDER_FLIGHT_POLL_SECONDS = 0.1
+_render_flights = {}
+_render_flights_lock = threading.Lock()
+
+class RenderFlight:
+    """One cache key's renders in this process: the lock, the requests holding or waiting for it
+    and the last finished render, kept for those waiters until the last one is done"""
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.result = None
+        self.handoff_path = None
+    
+    def discard_handoff(self):
+        if self.handoff_path:
+            try:
+                os.remove(self.handoff_path)
+            except FileNotFoundError:
+                pass
+            self.handoff_path = None
+
+class RenderLease:
+    """Exclusive right to render one cache key, held until the response is finished
+    
+    waited is True when an identical render ran while this lease was being acquired. Renders
+    from this process are handed over in result - bytes as (image_bytes, mime_type, meta), files
+    as {'path', 'size', 'mime_type', 'meta'} - even when too big for the caches; renders from
+    other processes are only in the caches, so look there before rendering.
+    """
+    
+    def __init__(self, key, flight, thread_lock, lock_file, waited):
+        self.key = key
+        self.waited = waited
+        self.result = flight.result
+        self._flight = flight
+        self._thread_lock = thread_lock
+        self._lock_file = lock_file
+        self._released = False
+    
+    def publish(self, image_bytes, mime_type, meta):
+        """Hand a finished in-memory render to the identical requests waiting in this process"""
+        with _render_flights_lock:
+            if self._flight.requests > 1:
+                self._flight.discard_handoff()
+                self._flight.result = (image_bytes, mime_type, meta)
+    
+    def publish_file(self, path, mime_type, meta):
+        """Hand a finished render file to the waiting requests: a hard link keeps it readable
+        after the original is moved into the cache or, when it does not fit, removed"""
+        with _render_flights_lock:
+            if self._flight.requests <= 1:
+                return
+            self._flight.discard_handoff()
+            handoff_path = f'{path}.flight'
+            os.link(path, handoff_path)
+            self._flight.handoff_path = handoff_path
+            self._flight.result = {'path': handoff_path, 'size': os.path.getsize(handoff_path), 'mime_type': mime_type, 'meta': meta}
+    
+    def release(self):
+        if self._released:
+            return
+        self._released = True
+        if self._lock_file is not None:
+            # Remove the file while still holding it; waiters that locked the old file notice and retry
+            try:
+                os.unlink(self._lock_file.name)
+            except FileNotFoundError:
+                pass
+            fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+            self._lock_file.close()
+        if self._thread_lock is not None:
+            self._thread_lock.release()
+        with _render_flights_lock:
+            self._flight.requests -= 1
+            if self._flight.requests == 0:
+                self._flight.discard_handoff()
+                del _render_flights[self.key]
+
+def acquire_render_lease(key, timeout=None):
+    """Wait until no identical render runs in this process (thread lock) or another one
+    (flock on a lock file in the render cache directory), then take the lease
+    
+    After the timeout the lease is granted without the lock, so a stuck render only delays others.
+    """
+    if timeout is None:
+        timeout = RENDER_FLIGHT_TIMEOUT
+    deadline = time.time() + timeout
+    with _render_flights_lock:
+        flight = _render_flights.setdefault(key, RenderFlight())
+        flight.requests += 1
+    thread_lock = flight.lock
+    waited = not thread_lock.acquire(blocking=False)
+    if waited:
+        logger.info(f"⏳ Waiting for identical render {key[:12]} in this process")
+        if not thread_lock.acquire(timeout=timeout):
+            logger.warning(f"⚠️ Render {key[:12]} still running after {timeout}s - rendering anyway")
+            thread_lock = None
+    
+    lock_file = None
+    if fcntl is not None:
+        lock_dir = os.path.join(render_cache.directory, 'locks')
+        os.makedirs(lock_dir, exist_ok=True)
+        lock_path = os.path.join(lock_dir, f'{key}.lock')
+        while True:
+            if lock_file is None:
+                lock_file = open(lock_path, 'a')
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                if not waited:
+                    waited = True
+                    logger.info(f"⏳ Waiting for identical render {key[:12]} in another process")
+                if time.time() >= deadline:
+                    logger.warning(f"⚠️ Render {key[:12]} still locked after {timeout}s - rendering anyway")
+                    lock_file.close()
+                    lock_file = None
+                    break
+                time.sleep(RENDER_FLIGHT_POLL_SECONDS)
+                continue
+            if lock_file_is_current(lock_file, lock_path):
+                break
+            # The previous holder unlinked this file on release: lock the path's current file instead
+            lock_file.close()
+            lock_file = None
+    return RenderLease(key, flight, thread_lock, lock_file, waited)
+
+def lock_file_is_current(lock_file, lock_path):
+    """True when the open lock file is still the one at lock_path (not unlinked by a releasing holder)"""
+    try:
+        return os.path.samestat(os.fstat(lock_file.fileno()), os.stat(lock_path))
+    except FileNotFoundError:
+        return False
+
+def render_cache_key(spec, options):
+    """Canonical hash of everything that shapes a render: the map spec plus output options"""
+    return pixel_map_spec_key(dict(spec, render_options=options, render_cache_version=RENDER_CACHE_VERSION))
+
+# Deep-zoom tiles: level max_zoom is full resolution, each level below halves the scale
+TILE_SIZES = (256, 512)
+tile_cache = BytesLRUCache(TILE_CACHE_BYTES)
+
+def tile_max_zoom(width, height, tile_size):
+    """Zoom level of the full-resolution tiles (zoom 0 fits the whole map in one tile)"""
+    return max(0, math.ceil(math.log2(max(width, height) / tile_size)))
+
+def dzi_max_level(width, height):
+    """Deep Zoom full-resolution level (DZI level 0 is a single pixel)"""
+    return max(0, math.ceil(math.log2(max(width, height))))
+
+def render_map_tile(spec, scale, col, row, tile_size, pad=False):
+    """Render one tile of the map scaled by `scale` (1, 1/2, 1/4...), or None outside the map
+    
+    Edge tiles are cropped to the map (Deep Zoom) or padded with black to a full tile (XYZ).
+    """
+    level_width = math.ceil(spec['width'] * scale)
+    level_height = math.ceil(spec['height'] * scale)
+    x = col * tile_size
+    y = row * tile_size
+    if col < 0 or row < 0 or x >= level_width or y >= level_height:
+        return None
+    
+    width = min(tile_size, level_width - x)
+    height = min(tile_size, level_height - y)
+    if scale >= 1:
+        tile = render_map_region(spec, x, y, width, height)
+    else:
+        tile = render_scaled_region(spec, scale, x, y, width, height)
+    
+    if pad and (width, height) != (tile_size, tile_size):
+        padded = Image.new('RGB', (tile_size, tile_size), (0, 0, 0))
+        padded.paste(tile, (0, 0))
+        tile = padded
+    return tile
+
+def get_map_tile_png(spec, scale, col, row, tile_size, pad=False):
+    """PNG bytes of one tile from the LRU tile cache, rendering it on a miss
+    
+    Returns (png_bytes, cache_hit); png_bytes is None outside the map.
+    """
+    key = (pixel_map_spec_key(spec), scale, col, row, tile_size, pad)
+    png_bytes = tile_cache.get(key)
+    if png_bytes is not None:
+        return png_bytes, True
+    
+    tile = render_map_tile(spec, scale, col, row, tile_size, pad)
+    if tile is None:
+        return None, False
+    buffer = io.BytesIO()
+    tile.save(buffer, format='PNG', compress_level=6)
+    png_bytes = buffer.getvalue()
+    tile_cache.put(key, png_bytes)
+    return png_bytes, False
 
 def generate_pixel_grid_optimized(draw, canvas_width, canvas_height, pixel_pitch, led_panel_width, led_panel_height, canvas_scale, mode):
     """Optimized pixel grid generation"""
@@ -611,137 +2276,214 @@ def draw_vector_panel_number(draw, panel_number, x, y, size, color=(0, 0, 0)):
             # Skip other characters but leave small space
             current_x += digit_width // 4
 
-def add_visual_overlays(draw, width, height, surface_name, show_name=False, show_cross=False, show_circle=False, show_logo=False):
-    """Add visual overlays like name, cross, circle and logo to the pixel map"""
+@lru_cache(maxsize=32)
+def get_glyph_atlas(size):
+    """Rasterize digits 0-9 and the decimal dot once per number size into 'L' masks
     
-    logger.info(f"🎨 add_visual_overlays called: w={width}, h={height}, name='{surface_name}'")
-    logger.info(f"🎨 Overlay flags: name={show_name}, cross={show_cross}, circle={show_circle}, logo={show_logo}")
+    Returns {char: (mask, dx, dy)} where (dx, dy) is the mask offset from the glyph origin.
+    The masks are drawn with the same vector routines, so labels keep the exact vector look.
+    """
+    pad = size  # strokes and smoothing circles can reach slightly outside the glyph box
+    atlas = {}
+    for char in '0123456789.':
+        mask = Image.new('L', (size * 3, size * 3), 0)
+        mask_draw = ImageDraw.Draw(mask)
+        if char == '.':
+            draw_vector_dot(mask_draw, pad, pad, size, color=255)
+        else:
+            draw_vector_digit(mask_draw, char, pad, pad, size, color=255)
+        
+        bbox = mask.getbbox()
+        if bbox is None:
+            atlas[char] = None
+            continue
+        atlas[char] = (mask.crop(bbox), bbox[0] - pad, bbox[1] - pad)
+    return atlas
+
+def iter_panel_number_glyphs(panel_number, x, y, size):
+    """Yield (glyph, glyph_x, glyph_y) for each character of a panel number - layout of draw_vector_panel_number"""
+    current_x = x
+    digit_width = int(size * 0.8)
+    digit_spacing = max(3, size // 12)
+    
+    for char in panel_number:
+        if char in '.,':
+            # Comma is a dot positioned lower
+            yield '.', current_x, y + size // 6 if char == ',' else y
+            current_x += digit_width // 3  # Dots take minimal space
+        elif char in '0123456789':
+            yield char, current_x, y
+            current_x += digit_width + digit_spacing
+        else:
+            # Skip other characters but leave small space
+            current_x += digit_width // 4
+
+def draw_glyph_panel_number(draw, panel_number, x, y, size, color=(0, 0, 0)):
+    """Draw panel number by compositing pre-rasterized glyph masks - same layout as draw_vector_panel_number"""
+    atlas = get_glyph_atlas(size)
+    for char, glyph_x, glyph_y in iter_panel_number_glyphs(panel_number, x, y, size):
+        glyph = atlas[char]
+        if glyph:
+            mask, dx, dy = glyph
+            draw.bitmap((glyph_x + dx, glyph_y + dy), mask, fill=color)
+
+def surface_name_font_bounds(width):
+    """Return (min_font_size, max_font_size, target_text_width) for the surface name on a canvas this wide"""
+    # ULTRA-AGGRESSIVE FONT SIZING FOR SMALL SURFACE VISIBILITY (V20.0)
+    # User reports surfaces under 10m wide (~4000px) still don't show names
+    if width <= 2000:  # Very small to medium surfaces (up to ~5m wide)
+        min_font_size = max(20, int(width * 0.05))  # 5% of width, minimum 20px (was 2%)
+        max_font_size = int(width * 0.3)   # 30% of width (was 15%)
+        target_text_width = int(width * 0.6)  # Use 60% of width for text (was 30%)
+        logger.info(f"🔧 ULTRA-SMALL SURFACE: Aggressive sizing min={min_font_size}px max={max_font_size}px target={target_text_width}px")
+    elif width <= 4000:  # Medium surfaces (5-10m wide) - the problematic range
+        min_font_size = max(32, int(width * 0.04))  # 4% of width, minimum 32px (was 2.5%)
+        max_font_size = int(width * 0.25)  # 25% of width (was 20%)
+        target_text_width = int(width * 0.5)  # Use 50% of width for text (was 30%)
+        logger.info(f"🔧 MEDIUM SURFACE: Aggressive sizing min={min_font_size}px max={max_font_size}px target={target_text_width}px")
+    else:  # Large surfaces (over 10m wide) - these work fine
+        min_font_size = max(40, int(width * 0.03))   # 3% of width, minimum 40px
+        max_font_size = min(400, int(width * 0.2))   # 20% of width, cap at 400px
+        target_text_width = int(width * 0.3)   # Use 30% of width (original)
+        logger.info(f"🔧 LARGE SURFACE: Standard sizing min={min_font_size}px max={max_font_size}px target={target_text_width}px")
+    
+    return min_font_size, max_font_size, target_text_width
+
+@lru_cache(maxsize=16)
+def fit_surface_name_font(width, height, surface_name):
+    """Fit the surface name font to the canvas and center it - cached per canvas size and name
+    
+    Returns (font, font_size, text_x, text_y, text_width, text_height, target_text_width).
+    Band and tile renderers call this once per band, so the font fitting runs only once.
+    """
+    from PIL import ImageFont
     
+    # textbbox only needs a drawing context, not the real canvas
+    draw = ImageDraw.Draw(Image.new('RGB', (1, 1)))
     center_x = width // 2
     center_y = height // 2
     
-    # 1. Add CENTER NAME (30% of canvas dimensions, amber color)
-    if show_name and surface_name:
-        # Amber color as requested
-        amber_color = (255, 191, 0)  # Pure amber
-        
+    min_font_size, max_font_size, target_text_width = surface_name_font_bounds(width)
+    
+    logger.info(f"🎯 V20.0 Ultra-aggressive sizing: canvas={width}x{height}, target_width={target_text_width}")
+    
+    # Start with estimated font size using adaptive bounds
+    estimated_chars_per_pixel = 1.8  # Character density estimate
+    font_size = int(target_text_width / len(surface_name) * estimated_chars_per_pixel)
+    font_size = max(min_font_size, min(font_size, max_font_size))
+    
+    logger.info(f"🔤 Adaptive font size: {font_size}px for '{surface_name}' (bounds: {min_font_size}-{max_font_size})")
+    
+    try:
+        # Try Linux system fonts first (for cloud deployment)
+        font = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", font_size)
+    except:
         try:
-            # Try to load a default system font
-            from PIL import ImageFont
-            
-            # ULTRA-AGGRESSIVE FONT SIZING FOR SMALL SURFACE VISIBILITY (V20.0)
-            # User reports surfaces under 10m wide (~4000px) still don't show names
-            if width <= 2000:  # Very small to medium surfaces (up to ~5m wide)
-                min_font_size = max(20, int(width * 0.05))  # 5% of width, minimum 20px (was 2%)
-                max_font_size = int(width * 0.3)   # 30% of width (was 15%)
-                target_text_width = int(width * 0.6)  # Use 60% of width for text (was 30%)
-                logger.info(f"🔧 ULTRA-SMALL SURFACE: Aggressive sizing min={min_font_size}px max={max_font_size}px target={target_text_width}px")
-            elif width <= 4000:  # Medium surfaces (5-10m wide) - the problematic range
-                min_font_size = max(32, int(width * 0.04))  # 4% of width, minimum 32px (was 2.5%)
-                max_font_size = int(width * 0.25)  # 25% of width (was 20%)
-                target_text_width = int(width * 0.5)  # Use 50% of width for text (was 30%)
-                logger.info(f"🔧 MEDIUM SURFACE: Aggressive sizing min={min_font_size}px max={max_font_size}px target={target_text_width}px")
-            else:  # Large surfaces (over 10m wide) - these work fine
-                min_font_size = max(40, int(width * 0.03))   # 3% of width, minimum 40px
-                max_font_size = min(400, int(width * 0.2))   # 20% of width, cap at 400px
-                target_text_width = int(width * 0.3)   # Use 30% of width (original)
-                logger.info(f"🔧 LARGE SURFACE: Standard sizing min={min_font_size}px max={max_font_size}px target={target_text_width}px")
-        
-            logger.info(f"🎯 V20.0 Ultra-aggressive sizing: canvas={width}x{height}, target_width={target_text_width}")
-            
-            # Start with estimated font size using adaptive bounds
-            estimated_chars_per_pixel = 1.8  # Character density estimate
-            font_size = int(target_text_width / len(surface_name) * estimated_chars_per_pixel)
-            font_size = max(min_font_size, min(font_size, max_font_size))
-            
-            logger.info(f"🔤 Adaptive font size: {font_size}px for '{surface_name}' (bounds: {min_font_size}-{max_font_size})")
-            
+            # Try another Linux font
+            font = ImageFont.truetype("/usr/share/fonts/truetype/liberation/LiberationSans-Bold.ttf", font_size)
+        except:
             try:
-                # Try Linux system fonts first (for cloud deployment)
-                font = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", font_size)
+                # Try macOS fonts (for local development)
+                font = ImageFont.truetype("/System/Library/Fonts/Arial.ttc", font_size)
             except:
                 try:
-                    # Try another Linux font
-                    font = ImageFont.truetype("/usr/share/fonts/truetype/liberation/LiberationSans-Bold.ttf", font_size)
+                    # Another macOS fallback
+                    font = ImageFont.truetype("/System/Library/Fonts/Helvetica.ttc", font_size)
                 except:
                     try:
-                        # Try macOS fonts (for local development)
-                        font = ImageFont.truetype("/System/Library/Fonts/Arial.ttc", font_size)
+                        # Generic fallback
+                        font = ImageFont.truetype("arial.ttf", font_size)
                     except:
-                        try:
-                            # Another macOS fallback
-                            font = ImageFont.truetype("/System/Library/Fonts/Helvetica.ttc", font_size)
-                        except:
-                            try:
-                                # Generic fallback
-                                font = ImageFont.truetype("arial.ttf", font_size)
-                            except:
-                                # Use default PIL font if no system fonts available
-                                font = ImageFont.load_default()
-            
-            # Adjust font size to achieve target text width with adaptive bounds
-            for attempt in range(15):  # More iterations for precision on small surfaces
-                bbox = draw.textbbox((0, 0), surface_name, font=font)
-                actual_width = bbox[2] - bbox[0]
-                actual_height = bbox[3] - bbox[1]
-                
-                # Check if we're close enough to target
-                if abs(actual_width - target_text_width) < target_text_width * 0.05:  # Within 5% for better precision
-                    break
-                
-                # Also ensure text doesn't exceed canvas bounds
-                if actual_width > width * 0.9 or actual_height > height * 0.4:
-                    font_size = int(font_size * 0.8)  # Reduce more aggressively if overflowing
-                else:
-                    # Adjust font size more gradually
-                    if actual_width > target_text_width:
-                        font_size = int(font_size * 0.95)
-                    else:
-                        font_size = int(font_size * 1.05)
-                
-                # Use adaptive bounds instead of fixed bounds
-                font_size = max(min_font_size, min(font_size, max_font_size))
-                
+                        # Use default PIL font if no system fonts available
+                        font = ImageFont.load_default()
+    
+    # Adjust font size to achieve target text width with adaptive bounds
+    for attempt in range(15):  # More iterations for precision on small surfaces
+        bbox = draw.textbbox((0, 0), surface_name, font=font)
+        actual_width = bbox[2] - bbox[0]
+        actual_height = bbox[3] - bbox[1]
+        
+        # Check if we're close enough to target
+        if abs(actual_width - target_text_width) < target_text_width * 0.05:  # Within 5% for better precision
+            break
+        
+        # Also ensure text doesn't exceed canvas bounds
+        if actual_width > width * 0.9 or actual_height > height * 0.4:
+            font_size = int(font_size * 0.8)  # Reduce more aggressively if overflowing
+        else:
+            # Adjust font size more gradually
+            if actual_width > target_text_width:
+                font_size = int(font_size * 0.95)
+            else:
+                font_size = int(font_size * 1.05)
+        
+        # Use adaptive bounds instead of fixed bounds
+        font_size = max(min_font_size, min(font_size, max_font_size))
+        
+        try:
+            # Try Linux fonts first
+            font = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", font_size)
+        except:
+            try:
+                # Try another Linux font
+                font = ImageFont.truetype("/usr/share/fonts/truetype/liberation/LiberationSans-Bold.ttf", font_size)
+            except:
                 try:
-                    # Try Linux fonts first
-                    font = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", font_size)
+                    # Try macOS fonts (for local development)
+                    font = ImageFont.truetype("/System/Library/Fonts/Arial.ttc", font_size)
                 except:
                     try:
-                        # Try another Linux font
-                        font = ImageFont.truetype("/usr/share/fonts/truetype/liberation/LiberationSans-Bold.ttf", font_size)
+                        # Another macOS fallback
+                        font = ImageFont.truetype("/System/Library/Fonts/Helvetica.ttc", font_size)
                     except:
-                        try:
-                            # Try macOS fonts (for local development)
-                            font = ImageFont.truetype("/System/Library/Fonts/Arial.ttc", font_size)
-                        except:
-                            try:
-                                # Another macOS fallback
-                                font = ImageFont.truetype("/System/Library/Fonts/Helvetica.ttc", font_size)
-                            except:
-                                # Use default font
-                                font = ImageFont.load_default()
-            
-            # Get final text dimensions
-            bbox = draw.textbbox((0, 0), surface_name, font=font)
-            text_width = bbox[2] - bbox[0]
-            text_height = bbox[3] - bbox[1]
-            
-            # Center the text precisely with bounds checking for small surfaces
-            text_x = center_x - text_width // 2
-            text_y = center_y - text_height // 2
-            
-            # Ensure text stays within bounds (especially important for small surfaces)
-            margin = 5  # 5px margin from edges
-            text_x = max(margin, min(text_x, width - text_width - margin))
-            text_y = max(margin, min(text_y, height - text_height - margin))
+                        # Use default font
+                        font = ImageFont.load_default()
+    
+    # Get final text dimensions
+    bbox = draw.textbbox((0, 0), surface_name, font=font)
+    text_width = bbox[2] - bbox[0]
+    text_height = bbox[3] - bbox[1]
+    
+    # Center the text precisely with bounds checking for small surfaces
+    text_x = center_x - text_width // 2
+    text_y = center_y - text_height // 2
+    
+    # Ensure text stays within bounds (especially important for small surfaces)
+    margin = 5  # 5px margin from edges
+    text_x = max(margin, min(text_x, width - text_width - margin))
+    text_y = max(margin, min(text_y, height - text_height - margin))
+    
+    return font, font_size, text_x, text_y, text_width, text_height, target_text_width
+
+def add_visual_overlays(draw, width, height, surface_name, show_name=False, show_cross=False, show_circle=False, show_logo=False, offset_x=0, offset_y=0):
+    """Add visual overlays like name, cross, circle and logo to the pixel map
+    
+    width/height are the full map size; offset_x/offset_y place the draw context inside
+    the map (bands, tiles, regions) so overlays are clipped exactly like on the full image.
+    """
+    
+    logger.info(f"🎨 add_visual_overlays called: w={width}, h={height}, name='{surface_name}'")
+    logger.info(f"🎨 Overlay flags: name={show_name}, cross={show_cross}, circle={show_circle}, logo={show_logo}")
+    
+    center_x = width // 2
+    center_y = height // 2
+    
+    # 1. Add CENTER NAME (30% of canvas dimensions, amber color)
+    if show_name and surface_name:
+        # Amber color as requested
+        amber_color = (255, 191, 0)  # Pure amber
+        
+        try:
+            font, font_size, text_x, text_y, text_width, text_height, target_text_width = fit_surface_name_font(width, height, surface_name)
             
             # Draw the surface name with normal font
-            draw.text((text_x, text_y), surface_name, font=font, fill=amber_color)
+            draw.text((text_x - offset_x, text_y - offset_y), surface_name, font=font, fill=amber_color)
             
             logger.info(f"✅ FIXED surface name: '{surface_name}' at ({text_x},{text_y}) font={font_size}px size={text_width}x{text_height} (target: {target_text_width}) canvas={width}x{height}")
             
         except Exception as e:
             logger.error(f"❌ Font loading failed: {e}, falling back to vector text")
+            target_text_width = surface_name_font_bounds(width)[2]
             # Adaptive fallback for small surfaces
             if width <= 500:
                 fallback_font_size = max(8, int(width * 0.03))  # Smaller fallback for small surfaces
@@ -757,7 +2499,7 @@ def add_visual_overlays(draw, width, height, surface_name, show_name=False, show
             text_x = max(margin, min(text_x, width - int(text_width_estimate) - margin))
             text_y = max(margin, min(text_y, height - fallback_font_size - margin))
             logger.info(f"🔤 Vector text fallback: size={fallback_font_size}, position=({text_x},{text_y})")
-            draw_vector_text(draw, surface_name, text_x, text_y, fallback_font_size, amber_color)
+            draw_vector_text(draw, surface_name, text_x - offset_x, text_y - offset_y, fallback_font_size, amber_color)
     
     # 2. Add CIRCLE (white line 1px thick, center to full height)
     if show_circle:
@@ -766,7 +2508,8 @@ def add_visual_overlays(draw, width, height, surface_name, show_name=False, show
         radius = height // 2
         
         # Draw circle outline with 1px thickness
-        bbox = [center_x - radius, center_y - radius, center_x + radius, center_y + radius]
+        bbox = [center_x - radius - offset_x, center_y - radius - offset_y,
+                center_x + radius - offset_x, center_y + radius - offset_y]
         try:
             # PIL doesn't have a direct circle outline, so we'll use ellipse
             draw.ellipse(bbox, outline=circle_color, width=1)
@@ -781,9 +2524,9 @@ def add_visual_overlays(draw, width, height, surface_name, show_name=False, show
         
         # Draw diagonal lines from corners
         # Top-left to bottom-right
-        draw.line([(0, 0), (width-1, height-1)], fill=cross_color, width=1)
+        draw.line([(-offset_x, -offset_y), (width-1 - offset_x, height-1 - offset_y)], fill=cross_color, width=1)
         # Top-right to bottom-left  
-        draw.line([(width-1, 0), (0, height-1)], fill=cross_color, width=1)
+        draw.line([(width-1 - offset_x, -offset_y), (-offset_x, height-1 - offset_y)], fill=cross_color, width=1)
         
         logger.info(f"✅ Added cross lines: diagonal from corners")
     
@@ -863,6 +2606,183 @@ def draw_vector_letter(draw, letter, x, y, size, color):
         # For other letters, draw a simple rectangle as placeholder
         draw.rectangle([x, y, x + size//2, y + size], outline=color, width=line_width)
 
+class SVGRecorder:
+    """Stand-in for ImageDraw that records line/ellipse/rectangle calls as SVG elements
+    
+    Lets the vector digit routines describe their glyphs once for the SVG backend.
+    Coordinates follow PIL: bounding boxes are inclusive pixel boxes and outlines grow inwards.
+    """
+    
+    def __init__(self):
+        self.elements = []
+    
+    def line(self, xy, fill=None, width=1):
+        points = ' '.join(f"{svg_number(x + 0.5)},{svg_number(y + 0.5)}" for x, y in xy)
+        self.elements.append(f'<polyline points="{points}" fill="none" stroke="currentColor" '
+                             f'stroke-width="{svg_number(width)}" stroke-linecap="round"/>')
+    
+    def ellipse(self, xy, fill=None, outline=None, width=1):
+        x0, y0, x1, y1 = xy
+        cx, cy = (x0 + x1 + 1) / 2, (y0 + y1 + 1) / 2
+        rx, ry = (x1 - x0 + 1) / 2, (y1 - y0 + 1) / 2
+        if fill is not None:
+            self.elements.append(f'<ellipse cx="{svg_number(cx)}" cy="{svg_number(cy)}" '
+                                 f'rx="{svg_number(rx)}" ry="{svg_number(ry)}" fill="currentColor"/>')
+        if outline is not None:
+            self.elements.append(f'<ellipse cx="{svg_number(cx)}" cy="{svg_number(cy)}" '
+                                 f'rx="{svg_number(max(0, rx - width / 2))}" ry="{svg_number(max(0, ry - width / 2))}" '
+                                 f'fill="none" stroke="currentColor" stroke-width="{svg_number(width)}"/>')
+    
+    def rectangle(self, xy, fill=None, outline=None, width=1):
+        x0, y0, x1, y1 = xy
+        if fill is not None:
+            self.elements.append(f'<rect x="{svg_number(x0)}" y="{svg_number(y0)}" width="{svg_number(x1 - x0 + 1)}" '
+                                 f'height="{svg_number(y1 - y0 + 1)}" fill="currentColor"/>')
+        if outline is not None:
+            self.elements.append(f'<rect x="{svg_number(x0 + width / 2)}" y="{svg_number(y0 + width / 2)}" '
+                                 f'width="{svg_number(max(0, x1 - x0 + 1 - width))}" height="{svg_number(max(0, y1 - y0 + 1 - width))}" '
+                                 f'fill="none" stroke="currentColor" stroke-width="{svg_number(width)}"/>')
+
+def svg_number(value):
+    """Compact SVG number: integers without a decimal point, others to 2 places"""
+    if value == int(value):
+        return str(int(value))
+    return f"{value:.2f}".rstrip('0')
+
+def svg_color(color):
+    """(r, g, b) -> #rrggbb"""
+    return '#%02x%02x%02x' % color
+
+@lru_cache(maxsize=32)
+def get_svg_glyph_symbols(size):
+    """<symbol> definitions for digits 0-9 and the dot, recorded from the vector digit routines"""
+    symbols = []
+    for char in '0123456789.':
+        recorder = SVGRecorder()
+        if char == '.':
+            draw_vector_dot(recorder, 0, 0, size, color=(255, 255, 255))
+        else:
+            draw_vector_digit(recorder, char, 0, 0, size, color=(255, 255, 255))
+        glyph_id = 'gd' if char == '.' else f'g{char}'
+        symbols.append(f'<symbol id="{glyph_id}" overflow="visible">{"".join(recorder.elements)}</symbol>')
+    return '\n'.join(symbols)
+
+def svg_panel_tile(x, y, led_panel_width, led_panel_height, fill_color, border_color, show_grid=True):
+    """One panel of the checkerboard pattern, with the 1px border inside the panel"""
+    if show_grid and (led_panel_width <= 2 or led_panel_height <= 2):
+        # The border covers the whole panel
+        return f'<rect x="{x}" y="{y}" width="{led_panel_width}" height="{led_panel_height}" fill="{svg_color(border_color)}"/>'
+    tile = f'<rect x="{x}" y="{y}" width="{led_panel_width}" height="{led_panel_height}" fill="{svg_color(fill_color)}"/>'
+    if show_grid:
+        tile += (f'<rect x="{x + 0.5}" y="{y + 0.5}" width="{led_panel_width - 1}" height="{led_panel_height - 1}" '
+                 f'fill="none" stroke="{svg_color(border_color)}" stroke-width="1"/>')
+    return tile
+
+def generate_pixel_map_svg(width, height, led_panel_width, led_panel_height, show_grid=True, show_panel_numbers=True, led_name='Absen', show_name=False, show_cross=False, show_circle=False, show_logo=False, surface_name='Screen One', region=None):
+    """Vector pixel map: same layout as generate_full_quality_pixel_map, as an SVG document
+    
+    The checkerboard is one 2×2-panel <pattern>, panel numbers are <use> references to one
+    <symbol> per digit glyph (grouped into row and column symbols), and overlays are single
+    elements, so the document grows only with the number of panels, not with the pixel count.
+    region (x, y, width, height) crops the document to that rectangle through its viewBox.
+    """
+    panels_width = int(width / led_panel_width)
+    panels_height = int(height / led_panel_height)
+    display_width = panels_width * led_panel_width
+    display_height = panels_height * led_panel_height
+    
+    logger.info(f"🖋️ SVG: {panels_width}×{panels_height} panels, {display_width}×{display_height}px")
+    
+    tiles = []
+    for row in range(2):
+        for col in range(2):
+            panel_color = generate_color(col, row, led_name)
+            tiles.append(svg_panel_tile(col * led_panel_width, row * led_panel_height, led_panel_width, led_panel_height,
+                                        panel_color, brighten_color(panel_color, 0.4), show_grid))
+    
+    view_x, view_y, view_width, view_height = region or (0, 0, display_width, display_height)
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{view_width}" height="{view_height}" '
+        f'viewBox="{view_x} {view_y} {view_width} {view_height}" shape-rendering="crispEdges">',
+        '<defs>',
+        f'<pattern id="panels" width="{led_panel_width * 2}" height="{led_panel_height * 2}" patternUnits="userSpaceOnUse">',
+        ''.join(tiles),
+        '</pattern>',
+    ]
+    
+    # Same sizing as the raster labels: 15% of the panel, 3% margins
+    number_size = max(12, int(min(led_panel_width, led_panel_height) * 0.15))
+    if show_panel_numbers:
+        parts.append(get_svg_glyph_symbols(number_size))
+    parts.append('</defs>')
+    parts.append(f'<rect width="{display_width}" height="{display_height}" fill="url(#panels)"/>')
+    
+    if show_panel_numbers:
+        margin_x = max(3, int(led_panel_width * 0.03))
+        margin_y = max(3, int(led_panel_height * 0.03))
+        
+        def glyph_uses(text):
+            return ''.join(f'<use href="#{"gd" if char == "." else "g" + char}" x="{glyph_x}" y="{glyph_y}"/>'
+                           for char, glyph_x, glyph_y in iter_panel_number_glyphs(text, 0, 0, number_size))
+        
+        # Each label is two references: the row prefix ("12.") and the column number ("34"),
+        # each a <symbol> built from the digit glyphs
+        parts.append('<defs>')
+        parts.extend(f'<symbol id="r{row + 1}" overflow="visible">{glyph_uses(f"{row + 1}.")}</symbol>'
+                     for row in range(panels_height))
+        parts.extend(f'<symbol id="c{col + 1}" overflow="visible">{glyph_uses(str(col + 1))}</symbol>'
+                     for col in range(panels_width))
+        parts.append('</defs>')
+        
+        parts.append('<g color="#ffffff" shape-rendering="auto">')
+        for row in range(panels_height):
+            # Column digits start where the row prefix layout leaves off
+            column_dx = list(iter_panel_number_glyphs(f"{row + 1}.0", 0, 0, number_size))[-1][1]
+            y = row * led_panel_height + margin_y
+            parts.append(''.join(
+                f'<use href="#r{row + 1}" x="{col * led_panel_width + margin_x}" y="{y}"/>'
+                f'<use href="#c{col + 1}" x="{col * led_panel_width + margin_x + column_dx}" y="{y}"/>'
+                for col in range(panels_width)
+            ))
+        parts.append('</g>')
+    
+    parts.extend(svg_visual_overlays(display_width, display_height, surface_name, show_name, show_cross, show_circle, show_logo))
+    parts.append('</svg>')
+    return '\n'.join(parts)
+
+def svg_visual_overlays(width, height, surface_name, show_name=False, show_cross=False, show_circle=False, show_logo=False):
+    """SVG elements for the name, circle and cross overlays - placed like add_visual_overlays"""
+    elements = []
+    center_x = width // 2
+    center_y = height // 2
+    
+    if show_name and surface_name:
+        font, font_size, text_x, text_y, text_width, text_height, target_text_width = fit_surface_name_font(width, height, surface_name)
+        # PIL places text by its ascender line, SVG by the baseline
+        try:
+            ascent = font.getmetrics()[0]
+        except AttributeError:
+            ascent = int(font_size * 0.8)
+        elements.append(
+            f'<text x="{text_x}" y="{text_y + ascent}" font-family="DejaVu Sans, Arial, Helvetica, sans-serif" '
+            f'font-weight="bold" font-size="{font_size}" fill="{svg_color((255, 191, 0))}">{xml_escape(surface_name)}</text>'
+        )
+    
+    if show_circle:
+        radius = height // 2
+        elements.append(f'<circle cx="{center_x + 0.5}" cy="{center_y + 0.5}" r="{radius}" fill="none" '
+                        f'stroke="#ffffff" stroke-width="1" shape-rendering="auto"/>')
+    
+    if show_cross:
+        elements.append(f'<path d="M0.5 0.5L{width - 0.5} {height - 0.5}M{width - 0.5} 0.5L0.5 {height - 0.5}" '
+                        f'stroke="#ffffff" stroke-width="1" shape-rendering="auto"/>')
+    
+    if show_logo:
+        # Logo is not implemented in the raster path either
+        logger.info(f"✅ Logo requested (not yet implemented)")
+    
+    return elements
+
 def generate_color(panel_x, panel_y, led_name='Absen'):
     """Generate colors based on LED type and panel position"""
     
@@ -926,16 +2846,306 @@ def health_check():
             'standard_processing': '<50M pixels',
             'memory_optimization': 'Adaptive chunk sizes based on image size'
         },
-        'timestamp': '2025-08-05-200M-ENHANCED'
+        'timestamp': '2025-08-05-200M-ENHANCED',
+        'caches': {
+            'results_memory': result_cache.stats(),
+            'results_disk': render_cache.stats(),
+            'tiles': tile_cache.stats()
+        },
+        'scheduler': render_scheduler.stats()
     })
 
+@app.after_request
+def count_http_request(response):
+    if not g.get('internal_render'):
+        render_metrics.inc('pixelmap_http_requests_total', {
+            'endpoint': request.endpoint or 'unmatched',
+            'status': str(response.status_code)
+        })
+    return response
+
+@app.route('/metrics')
+def metrics():
+    """Runtime metrics in the Prometheus text exposition format (this server process only)"""
+    lines = render_metrics.lines()
+    
+    def sample(name, metric_type, help_text, samples):
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {metric_type}')
+        for labels, value in samples:
+            lines.append(f'{name}{metric_labels(tuple(labels.items()))} {format_metric_value(value)}')
+    
+    scheduler = render_scheduler.stats()
+    sample('pixelmap_scheduler_queue_depth', 'gauge', 'Renders waiting for a slot or memory', [({}, scheduler['waiting'])])
+    sample('pixelmap_scheduler_oldest_wait_seconds', 'gauge', 'How long the oldest queued render has waited', [({}, scheduler['oldest_wait_seconds'])])
+    sample('pixelmap_scheduler_running', 'gauge', 'Renders running', [({}, scheduler['running'])])
+    sample('pixelmap_scheduler_workers', 'gauge', 'Render slots', [({}, scheduler['workers'])])
+    sample('pixelmap_pixels_in_flight', 'gauge', 'Output pixels of the renders running', [({}, scheduler['pixels_in_flight'])])
+    sample('pixelmap_scheduler_reserved_memory_bytes', 'gauge', 'Predicted memory reserved by running renders',
+           [({}, int(scheduler['reserved_mb'] * 1024 * 1024))])
+    sample('pixelmap_scheduler_memory_budget_bytes', 'gauge', 'Memory budget for renders', [({}, scheduler['capacity_mb'] * 1024 * 1024)])
+    sample('pixelmap_scheduler_admitted_total', 'counter', 'Renders admitted by the scheduler', [({}, scheduler['admitted'])])
+    sample('pixelmap_scheduler_rejected_total', 'counter', 'Renders rejected with 503 after waiting', [({}, scheduler['rejected'])])
+    
+    caches = {'results_memory': result_cache.stats(), 'results_disk': render_cache.stats(), 'tiles': tile_cache.stats()}
+    for stat, name, metric_type, help_text in [
+        ('hits', 'pixelmap_cache_hits_total', 'counter', 'Cache lookups that found an entry'),
+        ('misses', 'pixelmap_cache_misses_total', 'counter', 'Cache lookups that found nothing'),
+        ('evictions', 'pixelmap_cache_evictions_total', 'counter', 'Entries evicted to stay within the size limit'),
+        ('hit_rate', 'pixelmap_cache_hit_ratio', 'gauge', 'Hits / lookups since start'),
+        ('entries', 'pixelmap_cache_entries', 'gauge', 'Entries stored'),
+        ('bytes', 'pixelmap_cache_bytes', 'gauge', 'Bytes stored'),
+    ]:
+        sample(name, metric_type, help_text, [({'cache': cache}, stats[stat]) for cache, stats in caches.items()])
+    
+    sample('process_resident_memory_bytes', 'gauge', 'Resident memory of this server process',
+           [({}, int(get_memory_info()['rss_mb'] * 1024 * 1024))])
+    return Response('\n'.join(lines) + '\n', mimetype='text/plain; version=0.0.4', headers={'Cache-Control': 'no-store'})
+
 @app.route('/test')
 def test():
     return jsonify({'message': 'Test endpoint working!'})
 
+def wants_binary_response():
+    """True when the client asked for the raw image body (?format=binary or Accept: image/png)"""
+    if request.args.get('format') == 'binary':
+        return True
+    best = request.accept_mimetypes.best_match(['application/json', 'image/png', 'image/svg+xml'])
+    return best in ('image/png', 'image/svg+xml')
+
+def pixel_map_headers(payload, mimetype='image/png'):
+    """Response headers carrying the JSON metadata for binary image bodies"""
+    headers = {
+        'X-Image-Width': str(payload['dimensions']['width']),
+        'X-Image-Height': str(payload['dimensions']['height']),
+        'X-LED-Info': json.dumps(payload['led_info']),
+        'Content-Disposition': f'inline; filename="pixel-map.{"svg" if mimetype == "image/svg+xml" else "png"}"'
+    }
+    if 'total_pixels' in payload:
+        headers['X-Total-Pixels'] = str(payload['total_pixels'])
+    if 'color_mode' in payload:
+        headers['X-Color-Mode'] = payload['color_mode']
+    return headers
+
+def pixel_map_response(image_bytes, payload, mimetype='image/png', data_url=False, cache_key=None, cache_status=None):
+    """Raw image body with metadata headers for binary clients, the base64 JSON shape otherwise
+    
+    data_url: also send the legacy 'imageData' data URL in JSON responses
+    cache_key: store the finished render in the render cache under this key (and hand it to
+               identical requests waiting on the render lease)
+    """
+    timings = g.get('render_timings')
+    if cache_key:
+        if timings:
+            timings.mark('cache_store')
+        meta = {'payload': payload, 'data_url': data_url}
+        result_cache.put(cache_key, (image_bytes, mimetype, meta), size=len(image_bytes))
+        render_cache.put(cache_key, image_bytes, mimetype, meta)
+        lease = g.get('render_lease')
+        if lease:
+            lease.publish(image_bytes, mimetype, meta)
+        cache_status = 'miss'
+    
+    if timings:
+        timings.mark('serialize')
+    if wants_binary_response():
+        headers = pixel_map_headers(payload, mimetype)
+        if timings:
+            headers['X-Render-Timings'] = json.dumps(finish_render_timings(timings, g.get('render_engine', 'cache')))
+        response = Response(image_bytes, mimetype=mimetype, headers=headers)
+    else:
+        image_base64 = base64.b64encode(image_bytes).decode('utf-8')
+        body = {'success': True, 'image_base64': image_base64, **payload}
+        if data_url:
+            body['imageData'] = f'data:{mimetype};base64,{image_base64}'
+        if timings:
+            body['timings'] = finish_render_timings(timings, g.get('render_engine', 'cache'))
+        response = jsonify(body)
+    if cache_status:
+        response.headers['X-Render-Cache'] = cache_status
+    return response
+
+def cached_pixel_map_response(cache_key, lease=None):
+    """Response for a cached render (memory first, then disk), or None on a miss
+    
+    Disk hits small enough for the memory cache are promoted into it; bigger files are
+    sent straight from disk to binary clients. With a lease, the render handed over by the
+    identical request it waited for comes first (tier 'flight'), cached or not.
+    """
+    shared = lease.result if lease else None
+    if isinstance(shared, tuple):
+        entry, tier = shared, 'flight'
+    else:
+        entry, tier = result_cache.get(cache_key), 'memory'
+    if entry is None:
+        cached = shared or render_cache.get(cache_key)
+        if cached is None:
+            return None
+        tier = 'flight' if shared else 'disk'
+        meta = cached['meta']
+        try:
+            if cached['size'] > result_cache.max_item_bytes and wants_binary_response():
+                timings = g.get('render_timings')
+                if timings:
+                    timings.mark('serialize')
+                response = send_file(cached['path'], mimetype=cached['mime_type'], conditional=False)
+                response.headers.update(pixel_map_headers(meta['payload'], cached['mime_type']))
+                if timings:
+                    response.headers['X-Render-Timings'] = json.dumps(finish_render_timings(timings, 'cache'))
+                response.headers['X-Render-Cache'] = 'hit'
+                response.headers['X-Render-Cache-Tier'] = tier
+                return response
+            with open(cached['path'], 'rb') as f:
+                image_bytes = f.read()
+        except FileNotFoundError:
+            return None  # Evicted by another process in between
+        entry = (image_bytes, cached['mime_type'], meta)
+        if tier == 'disk':
+            result_cache.put(cache_key, entry, size=len(image_bytes))
+    
+    image_bytes, mime_type, meta = entry
+    response = pixel_map_response(image_bytes, meta['payload'], mime_type, data_url=meta['data_url'], cache_status='hit')
+    response.headers['X-Render-Cache-Tier'] = tier
+    return response
+
+RENDER_TIMING_STAGES = ('queue', 'layout', 'fill', 'borders', 'labels', 'overlays', 'encode', 'cache_store', 'serialize')
+
+class RenderTimings:
+    """Monotonic wall time per render stage - a stage runs until the next one is marked
+    
+    Stages are marked through the request's progress callback, so renderers report them the same
+    way they report job progress. Streamed bands are rendered and deflated in one pipeline, so
+    their time is all 'encode'.
+    """
+    
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.finished = None
+        self.seconds = {}
+        self.stage = None
+        self._stage_started = self.started
+        self.recorded = False
+    
+    def mark(self, stage):
+        if stage == self.stage:
+            return
+        now = time.perf_counter()
+        if self.stage is not None:
+            self.seconds[self.stage] = self.seconds.get(self.stage, 0.0) + now - self._stage_started
+        self.stage = stage
+        self._stage_started = now
+    
+    def stop(self):
+        self.mark(None)
+        self.finished = time.perf_counter()
+    
+    def as_dict(self):
+        """{stage: seconds} in pipeline order plus 'total' (up to now if still running)"""
+        timings = {stage: round(self.seconds[stage], 4) for stage in RENDER_TIMING_STAGES if stage in self.seconds}
+        timings['total'] = round((self.finished or time.perf_counter()) - self.started, 4)
+        return timings
+
+def start_render_timings():
+    """Time this request's stages, starting with 'layout', on top of any job progress callback"""
+    timings = RenderTimings()
+    timings.mark('layout')
+    job_progress = g.get('render_progress')
+    
+    def progress(stage, done, total, bytes_written):
+        timings.mark(stage)
+        if job_progress:
+            job_progress(stage, done, total, bytes_written)
+    
+    g.render_progress = progress
+    g.render_timings = timings
+    return timings
+
+def finish_render_timings(timings, engine):
+    """Stop the clock, record every stage to /metrics once and return the timings dict"""
+    timings.stop()
+    result = timings.as_dict()
+    if not timings.recorded:
+        timings.recorded = True
+        for stage, seconds in result.items():
+            render_metrics.observe('pixelmap_render_stage_seconds', {'engine': engine, 'stage': stage}, seconds)
+    return result
+
+def report_render_progress(stage, done=1, total=1, bytes_written=None):
+    """Forward a render stage to the request's progress callback (set by render jobs), if any
+    
+    Also samples the render's timings and memory for the /estimate cost model.
+    """
+    stats = g.get('render_stats')
+    if stats:
+        note_render_stats(stats)
+        if stage == 'encode' and stats['encode_started'] is None:
+            stats['encode_started'] = time.time()
+        if stage == 'encode' and bytes_written is not None and done >= total:
+            finish_render_stats(stats, bytes_written)
+    progress = g.get('render_progress')
+    if progress:
+        progress(stage, done, total, bytes_written)
+
+def streaming_pixel_map_response(png_chunks, payload, cache_key=None):
+    """Send PNG bytes as the encoder yields them (chunked transfer, no Content-Length)
+    
+    The first bytes leave before the render finishes and the server never holds the whole file.
+    With a cache_key the stream is also teed to disk and stored once it completes.
+    """
+    lease = g.pop('render_lease', None)  # Identical requests keep waiting until the stream is cached
+    reservation = g.pop('render_reservation', None)  # Memory stays reserved until the stream ends
+    stats = g.pop('render_stats', None)  # Recorded once the last chunk is sent
+    timings = g.pop('render_timings', None)
+    engine = g.get('render_engine', 'streaming')
+    
+    def generate():
+        bytes_sent = 0
+        cache_file = render_cache.open_temp() if cache_key else None
+        try:
+            for png_data in png_chunks:
+                bytes_sent += len(png_data)
+                if cache_file:
+                    cache_file.write(png_data)
+                yield png_data
+            if stats:
+                finish_render_stats(stats, bytes_sent)
+            if timings:
+                finish_render_timings(timings, engine)
+            if cache_file:
+                cache_file.close()
+                meta = {'payload': dict(payload, file_size_mb=round(bytes_sent / (1024 * 1024), 4)), 'data_url': False}
+                if lease:
+                    lease.publish_file(cache_file.name, 'image/png', meta)
+                render_cache.put_file(cache_key, cache_file.name, 'image/png', meta)
+        finally:
+            if cache_file and not cache_file.closed:
+                # Stream was abandoned - the partial file is never cached
+                cache_file.close()
+                os.remove(cache_file.name)
+            if reservation:
+                reservation.release()
+            if lease:
+                lease.release()
+        logger.info(f"📤 Streamed response: {bytes_sent / (1024 * 1024):.2f}MB")
+    
+    headers = pixel_map_headers(payload)
+    headers['X-Accel-Buffering'] = 'no'  # Ask proxies not to buffer the stream
+    if timings:
+        # Sent before the bands render: the full breakdown goes to /metrics when the stream ends
+        headers['X-Render-Timings'] = json.dumps(timings.as_dict())
+    if cache_key:
+        headers['X-Render-Cache'] = 'miss'
+    response = Response(generate(), mimetype='image/png', headers=headers, direct_passthrough=True)
+    if reservation:
+        response.call_on_close(reservation.release)
+    if lease:
+        response.call_on_close(lease.release)  # Also covers streams closed before their first chunk
+    return response
+
 @app.route('/generate-pixel-map', methods=['POST'])
 def generate_pixel_map():
     try:
+        timings = start_render_timings()
         data = request.get_json()
         
         if not data:
@@ -964,6 +3174,22 @@ def generate_pixel_map():
         # Get surface name for center text overlay (default to "Screen One")
         surface_name = config.get('surfaceName', 'Screen One')
         
+        # 'indexed' writes a palette PNG (4-bit for the fixed panel palette) instead of 24-bit RGB
+        color_mode = config.get('colorMode', 'rgb')
+        if color_mode not in ('rgb', 'indexed'):
+            return jsonify({
+                'success': False,
+                'error': "colorMode must be 'rgb' or 'indexed'"
+            }), 400
+        
+        # 'svg' returns a vector document instead of a PNG
+        output_format = config.get('format', 'png')
+        if output_format not in ('png', 'svg'):
+            return jsonify({
+                'success': False,
+                'error': "format must be 'png' or 'svg'"
+            }), 400
+        
         # Add debug logging for visual overlays and grid controls
         logger.info(f"🎨 Visual Overlays: Name={show_name}, Cross={show_cross}, Circle={show_circle}, Logo={show_logo}")
         logger.info(f"🎯 Surface Name: '{surface_name}'")
@@ -978,8 +3204,235 @@ def generate_pixel_map():
         logger.info(f"🎯 PIXEL-PERFECT GENERATION: {total_width}×{total_height} pixels ({total_pixels:,} total)")
         logger.info(f"📦 Panel config: {panels_width}×{panels_height} panels of {panel_pixel_width}×{panel_pixel_height}px each")
         
-        # ENHANCED FOR 200M PIXELS: Use optimized generation for large images
-        if total_pixels > 5_000_000:
+        # Optional region {x, y, width, height} in map coordinates: render only that rectangle
+        region = data.get('region')
+        if region is not None:
+            try:
+                region = parse_map_region(region, total_width, total_height)
+            except (ValueError, TypeError, KeyError) as e:
+                return jsonify({
+                    'success': False,
+                    'error': f'Invalid region: {e}'
+                }), 400
+        
+        # Optional preview {maxWidth, maxHeight}: scaled-down thumbnail of the whole map
+        preview = data.get('preview')
+        preview_scale = 1.0
+        if preview is not None:
+            try:
+                preview_scale = parse_preview_scale(preview, total_width, total_height)
+            except (ValueError, TypeError, KeyError) as e:
+                return jsonify({
+                    'success': False,
+                    'error': f'Invalid preview: {e}'
+                }), 400
+            if region is not None:
+                return jsonify({
+                    'success': False,
+                    'error': 'region and preview cannot be combined'
+                }), 400
+        
+        report_render_progress('layout')
+        render_path = select_render_path(total_pixels, color_mode, output_format, region, preview_scale)
+        
+        # The standard (≤5M pixel) path draws borders only when showGrid is set, unlike the other
+        # paths: pin the flag so the cache key and payload describe what is actually drawn
+        if render_path == 'legacy':
+            show_grid = bool(config.get('showGrid', False))
+            config = dict(config, showGrid=show_grid)
+        
+        # Identical requests are served from the render cache without rendering
+        cache_key = None
+        try:
+            cache_key = render_cache_key(pixel_map_spec(surface, config), {
+                'format': output_format,
+                'color_mode': color_mode,
+                'region': list(region) if region else None,
+                'preview_scale': preview_scale if output_format == 'png' else 1.0
+            })
+        except (ValueError, TypeError, AttributeError):
+            pass  # Left to the render path to report
+        if cache_key:
+            cached_response = cached_pixel_map_response(cache_key)
+            if cached_response is None:
+                # Single-flight: hold the render lease until the response is built (streams take it along)
+                timings.mark('queue')
+                lease = acquire_render_lease(cache_key)
+                g.render_lease = lease
+                
+                @after_this_request
+                def release_render_lease(response):
+                    unclaimed_lease = g.pop('render_lease', None)
+                    if unclaimed_lease:
+                        unclaimed_lease.release()
+                    return response
+                
+                timings.mark('layout')
+                if lease.waited or lease.result:
+                    cached_response = cached_pixel_map_response(cache_key, lease)
+            if cached_response is not None:
+                render_metrics.inc('pixelmap_render_cache_responses_total', {'tier': cached_response.headers['X-Render-Cache-Tier']})
+                logger.info(f"💾 Render cache hit {cache_key[:12]} ({cached_response.headers['X-Render-Cache-Tier']})")
+                return cached_response
+        
+        # Scheduling: wait for a render slot and the predicted peak memory (shortest job first)
+        estimate = estimate_render_cost(render_path, color_mode, total_width, total_height,
+                                        panel_pixel_width, panel_pixel_height, region, preview_scale)
+        reserve_mb = estimate['memory_mb'] if wants_binary_response() else estimate['memory_mb_json']
+        timings.mark('queue')
+        reservation = render_scheduler.acquire(reserve_mb, estimate['total_seconds'], g.get('admission_timeout'),
+                                               pixels=estimate['output_width'] * estimate['output_height'])
+        if reservation is None:
+            retry_after = render_scheduler.retry_after(reserve_mb)
+            logger.warning(f"🚦 Rejected {render_path} render needing {reserve_mb:.0f}MB - queue full, retry in {retry_after}s")
+            response = jsonify({
+                'success': False,
+                'error': f'Server is busy: this render needs ~{reserve_mb:.0f}MB of the {render_scheduler.capacity_mb}MB render budget',
+                'retry_after': retry_after
+            })
+            response.headers['Retry-After'] = str(retry_after)
+            return response, 503
+        g.render_reservation = reservation
+        g.render_engine = render_path
+        timings.mark('layout')
+        
+        @after_this_request
+        def release_render_reservation(response):
+            unclaimed_reservation = g.pop('render_reservation', None)
+            if unclaimed_reservation:
+                unclaimed_reservation.release()
+            response.headers['X-Render-Queue-Wait'] = f'{reservation.waited_seconds:.3f}'
+            return response
+        
+        render_metrics.observe('pixelmap_queue_wait_seconds', {'engine': render_path}, reservation.waited_seconds)
+        if reservation.waited_seconds > 0.01:
+            logger.info(f"🚦 Started {render_path} render ({reservation.mb:.0f}MB, ~{estimate['total_seconds']:.1f}s) after {reservation.waited_seconds:.2f}s in the queue")
+        
+        # Measure this render to calibrate /estimate
+        g.render_stats = start_render_stats(render_path, color_mode, estimate['units'])
+        
+        if output_format == 'svg':
+            # VECTOR: size of the document depends on the panel count, not the pixel count
+            report_render_progress('fill', 0)
+            svg_content = generate_pixel_map_svg(
+                total_width, total_height, panel_pixel_width, panel_pixel_height,
+                show_grid, show_panel_numbers, led_name,
+                show_name, show_cross, show_circle, show_logo, surface_name,
+                region=region
+            )
+            report_render_progress('encode', 0)
+            svg_bytes = svg_content.encode('utf-8')
+            del svg_content
+            report_render_progress('encode', bytes_written=len(svg_bytes))
+            
+            # A region crops the document through its viewBox: report the region's size, like PNG regions
+            svg_width, svg_height = (region[2], region[3]) if region else (total_width, total_height)
+            return pixel_map_response(svg_bytes, {
+                'format': 'svg',
+                'mime_type': 'image/svg+xml',
+                'dimensions': {
+                    'width': svg_width,
+                    'height': svg_height
+                },
+                'file_size_mb': round(len(svg_bytes) / (1024 * 1024), 4),
+                'led_info': {
+                    'name': led_name,
+                    'panels': f'{panels_width}×{panels_height}',
+                    'resolution': f'{total_width}×{total_height}px'
+                },
+                'total_pixels': svg_width * svg_height,
+                'region': dict(zip(('x', 'y', 'width', 'height'), region)) if region else None
+            }, mimetype='image/svg+xml', cache_key=cache_key)
+        
+        if preview_scale < 1 and output_format == 'png':
+            # PREVIEW: analytic render at the target scale (labels drop out when too small to read)
+            config_dict = dict(config, ledName=led_name)
+            report_render_progress('fill', 0)
+            image = generate_pixel_map_optimized(
+                total_width, total_height, 1, panel_pixel_width, panel_pixel_height,
+                preview_scale, config_dict
+            )
+            report_render_progress('encode', 0)
+            buffer = io.BytesIO()
+            image.save(buffer, format='PNG', optimize=True)
+            png_bytes = buffer.getvalue()
+            del buffer
+            report_render_progress('encode', bytes_written=len(png_bytes))
+            
+            return pixel_map_response(png_bytes, {
+                'dimensions': {
+                    'width': image.width,
+                    'height': image.height
+                },
+                'file_size_mb': round(len(png_bytes) / (1024 * 1024), 4),
+                'led_info': {
+                    'name': led_name,
+                    'panels': f'{panels_width}×{panels_height}',
+                    'resolution': f'{total_width}×{total_height}px'
+                },
+                'preview': {
+                    'scale': round(preview_scale, 6),
+                    'width': image.width,
+                    'height': image.height
+                },
+                'total_pixels': total_pixels,
+                'color_mode': color_mode
+            }, cache_key=cache_key)
+        
+        if region is not None:
+            # REGION: cost follows the region area, not the surface size
+            region_x, region_y, region_width, region_height = region
+            region_pixels = region_width * region_height
+            logger.info(f"✂️ REGION: {region_width}×{region_height}px at ({region_x},{region_y}) of {total_width}×{total_height}px")
+            spec = pixel_map_spec(surface, config)
+            
+            region_payload = {
+                'dimensions': {
+                    'width': region_width,
+                    'height': region_height
+                },
+                'led_info': {
+                    'name': led_name,
+                    'panels': f'{panels_width}×{panels_height}',
+                    'resolution': f'{total_width}×{total_height}px'
+                },
+                'region': {
+                    'x': region_x,
+                    'y': region_y,
+                    'width': region_width,
+                    'height': region_height
+                },
+                'total_pixels': region_pixels,
+                'color_mode': color_mode
+            }
+            
+            if region_pixels > 50_000_000:
+                png_chunks = iter_map_region_png(spec, region_x, region_y, region_width, region_height, color_mode,
+                                                 progress=g.get('render_progress'))
+                if wants_binary_response():
+                    return streaming_pixel_map_response(png_chunks, region_payload, cache_key=cache_key)
+                buffer = io.BytesIO()
+                for png_data in png_chunks:
+                    buffer.write(png_data)
+            else:
+                buffer = io.BytesIO()
+                report_render_progress('fill', 0)
+                image = render_map_region(spec, region_x, region_y, region_width, region_height)
+                if color_mode == 'indexed':
+                    image = quantize_to_map_palette(image, spec['led_name'], map_border_factor(total_width, total_height))
+                report_render_progress('encode', 0)
+                image.save(buffer, format='PNG', optimize=True)
+                del image
+            png_bytes = buffer.getvalue()
+            del buffer
+            report_render_progress('encode', bytes_written=len(png_bytes))
+            
+            return pixel_map_response(png_bytes, dict(
+                region_payload, file_size_mb=round(len(png_bytes) / (1024 * 1024), 4)
+            ), cache_key=cache_key)
+        
+        # ENHANCED FOR 200M PIXELS: Use optimized generation for large images (and all indexed maps)
+        if total_pixels > 5_000_000 or color_mode == 'indexed':
             logger.info(f"🎯 ENHANCED 200M: Using optimized generation for {total_pixels:,} pixels - NO SCALING")
             
             # NO SCALING - Generate at exact requested dimensions for ANY size up to 200M
@@ -1003,53 +3456,15 @@ def generate_pixel_map():
                 'showCircle': show_circle,
                 'showLogo': show_logo,
                 'ledName': led_name,
-                'surfaceName': surface_name
+                'surfaceName': surface_name,
+                'colorMode': color_mode
             }
             
-            image = generate_pixel_map_optimized(
-                total_width, total_height, 
-                1,  # pixel_pitch set to 1 for precise grid
-                panel_pixel_width, panel_pixel_height, 
-                canvas_scale,  # Always 1.0
-                config_dict  # Pass the config for numbering control
-            )
-            
-            # Verify image is exactly the requested size
-            if image.width != total_width or image.height != total_height:
-                logger.error(f"Size mismatch! Requested: {total_width}×{total_height}, Got: {image.width}×{image.height}")
-                # Force resize to exact requested dimensions if needed
-                image = image.resize((total_width, total_height), Image.NEAREST)
-                logger.info(f"Resized to exact requested dimensions: {total_width}×{total_height}")
-            
-            # Enhanced PNG compression for large files
-            buffer = io.BytesIO()
-            if image.mode == 'L':
-                # Convert grayscale back to RGB for compatibility
-                image = image.convert('RGB')
-            
-            # Adaptive compression based on image size
-            if total_pixels > 100_000_000:
-                # High compression for massive images to reduce file size
-                image.save(buffer, format='PNG', optimize=True, compress_level=6)
-                logger.info("Using high compression for massive image")
-            else:
-                # Standard compression
-                image.save(buffer, format='PNG', optimize=True)
-            
-            buffer.seek(0)
-            image_base64 = base64.b64encode(buffer.getvalue()).decode('utf-8')
-            
-            # Get actual file size
-            file_size_mb = len(buffer.getvalue()) / (1024 * 1024)
-            
-            return jsonify({
-                'success': True,
-                'image_base64': image_base64,  # Use consistent field name
+            payload = {
                 'dimensions': {
                     'width': total_width,  # Return REQUESTED dimensions, not scaled
                     'height': total_height
                 },
-                'file_size_mb': round(file_size_mb, 4),
                 'led_info': {
                     'name': led_name,
                     'panels': f'{panels_width}×{panels_height}',
@@ -1057,17 +3472,71 @@ def generate_pixel_map():
                 },
                 'optimized': True,
                 'total_pixels': total_pixels,
+                'color_mode': color_mode,
                 'note': f'ENHANCED 200M: {total_width}×{total_height}px (no scaling, adaptive compression)',
                 'actual_image_size': {
-                    'width': image.width,
-                    'height': image.height
+                    'width': total_width,
+                    'height': total_height
                 },
                 'processing_info': {
                     'pixel_limit': '200M pixels maximum',
-                    'memory_optimization': 'Enhanced chunked processing',
+                    'memory_optimization': 'Streaming band-by-band PNG encoding' if total_pixels > 50_000_000 else 'Enhanced chunked processing',
                     'compression': 'Adaptive based on size'
                 }
-            })
+            }
+            
+            if total_pixels > 50_000_000:
+                # STREAMING: render bands straight into the PNG encoder - the raw canvas is never held
+                png_chunks = iter_streaming_pixel_map_png(
+                    total_width, total_height, panel_pixel_width, panel_pixel_height,
+                    show_grid, show_panel_numbers, led_name,
+                    show_name, show_cross, show_circle, show_logo, surface_name,
+                    compress_level=6, color_mode=color_mode, progress=g.get('render_progress')
+                )
+                if wants_binary_response():
+                    # Binary clients download while the bands are still rendering
+                    return streaming_pixel_map_response(png_chunks, payload, cache_key=cache_key)
+                
+                buffer = io.BytesIO()
+                for png_data in png_chunks:
+                    buffer.write(png_data)
+            else:
+                image = generate_pixel_map_optimized(
+                    total_width, total_height, 
+                    1,  # pixel_pitch set to 1 for precise grid
+                    panel_pixel_width, panel_pixel_height, 
+                    canvas_scale,  # Always 1.0
+                    config_dict,  # Pass the config for numbering control
+                    progress=g.get('render_progress')
+                )
+                
+                # Verify image is exactly the requested size
+                if image.width != total_width or image.height != total_height:
+                    logger.error(f"Size mismatch! Requested: {total_width}×{total_height}, Got: {image.width}×{image.height}")
+                    # Force resize to exact requested dimensions if needed
+                    image = image.resize((total_width, total_height), Image.NEAREST)
+                    logger.info(f"Resized to exact requested dimensions: {total_width}×{total_height}")
+                
+                # Enhanced PNG compression for large files
+                buffer = io.BytesIO()
+                if image.mode == 'L':
+                    # Convert grayscale back to RGB for compatibility
+                    image = image.convert('RGB')
+                
+                # Standard compression (massive images are streamed above)
+                report_render_progress('encode', 0)
+                image.save(buffer, format='PNG', optimize=True)
+                del image
+            
+            # One copy of the PNG bytes; the buffer is released before encoding the response
+            png_bytes = buffer.getvalue()
+            del buffer
+            report_render_progress('encode', bytes_written=len(png_bytes))
+            
+            # Get actual file size
+            file_size_mb = len(png_bytes) / (1024 * 1024)
+            
+            return pixel_map_response(png_bytes, dict(payload, file_size_mb=round(file_size_mb, 4)), cache_key=cache_key)
         
         # Standard generation for smaller images (≤5M pixels)
         # For very large images, create a manageable size for display
@@ -1096,6 +3565,7 @@ def generate_pixel_map():
         
         # Create high-fidelity RGB image for LED pixel mapping
         # Use RGB mode for consistent color representation across platforms
+        report_render_progress('fill', 0)
         image = Image.new('RGB', (display_width, display_height), 'white')
         
         # Use high-quality drawing context for precise rendering
@@ -1113,9 +3583,17 @@ def generate_pixel_map():
                 # Draw panel rectangle filled with color (no outline)
                 draw.rectangle([x, y, x + panel_display_width - 1, y + panel_display_height - 1], 
                              fill=panel_color, outline=None)
-                
-                # Add brighter borders if grid is enabled - WITHIN panel boundaries
-                if config and config.get('showGrid', False):
+        
+        # Add brighter borders if grid is enabled - WITHIN panel boundaries
+        # (a separate pass: panels never overlap, so the pixels are the same as drawing them per panel)
+        if show_grid:
+            report_render_progress('borders', 0)
+            for row in range(panels_height):
+                for col in range(panels_width):
+                    x = col * panel_display_width
+                    y = row * panel_display_height
+                    panel_color = generate_color(col, row)
+                    
                     # Create brighter border color (40% brighter for better visibility)
                     border_color = brighten_color(panel_color, 0.4)
                     
@@ -1143,6 +3621,8 @@ def generate_pixel_map():
         # No need for separate grid lines - borders are part of each panel
         
         # Draw panel numbers with VECTOR-BASED numbering (pixel-perfect quality)
+        if show_panel_numbers:
+            report_render_progress('labels', 0)
         for row in range(panels_height):
             for col in range(panels_width):
                 if show_panel_numbers:
@@ -1162,14 +3642,15 @@ def generate_pixel_map():
                     text_x = x + margin_x
                     text_y = y + margin_y
                     
-                    # Draw vector-based panel numbers (no font dependencies)
-                    draw_vector_panel_number(
+                    # Draw vector-based panel numbers from the cached glyph atlas
+                    draw_glyph_panel_number(
                         draw, panel_number, text_x, text_y, 
                         number_size, color=(255, 255, 255)  # WHITE numbers for better visibility
                     )
         
         # Generate NATIVE PNG with maximum quality and precision
         # No SVG conversion - direct PNG generation for Flutter
+        report_render_progress('encode', 0)
         img_buffer = io.BytesIO()
         
         # PNG-specific optimization for pixel-perfect accuracy
@@ -1184,11 +3665,10 @@ def generate_pixel_map():
                   pnginfo=pnginfo,         # No metadata interference
                   bits=8)                  # 8-bit per channel for standard compatibility
         
-        img_buffer.seek(0)
-        
         # Get pure PNG bytes - ready for Flutter without any conversion
         png_bytes = img_buffer.getvalue()
-        png_base64 = base64.b64encode(png_bytes).decode()
+        del img_buffer, image, draw
+        report_render_progress('encode', bytes_written=len(png_bytes))
         file_size_mb = len(png_bytes) / (1024 * 1024)
         
         # Verify PNG integrity (basic header check)
@@ -1196,13 +3676,8 @@ def generate_pixel_map():
         expected_signature = b'\x89PNG\r\n\x1a\n'
         is_valid_png = png_signature == expected_signature
         
-        # Create data URL for PNG
-        image_data = f'data:image/png;base64,{png_base64}'
-        
-        return jsonify({
-            'success': True,
-            'image_base64': png_base64,
-            'imageData': image_data,
+        # Binary clients get the PNG body itself - the base64 and data URL copies are JSON-only
+        return pixel_map_response(png_bytes, {
             'dimensions': {
                 'width': total_width,
                 'height': total_height
@@ -1219,6 +3694,7 @@ def generate_pixel_map():
                 'resolution': f'{total_width}×{total_height}px',
                 'display_resolution': f'{display_width}×{display_height}px'
             },
+            'total_pixels': total_pixels,
             'format': 'PNG',
             'png_quality': {
                 'native_generation': True,
@@ -1240,7 +3716,7 @@ def generate_pixel_map():
                 'rendering_engine': 'PIL/Pillow direct rasterization'
             },
             'note': f'PIXEL-PERFECT PNG generated on Render.com - Full Resolution: {total_width}×{total_height}px (NO SCALING) - Maximum quality for professional use'
-        })
+        }, data_url=True, cache_key=cache_key)
         
     except Exception as e:
         logger.error(f"Error in generate_pixel_map: {str(e)}")
@@ -1251,6 +3727,629 @@ def generate_pixel_map():
             'error_type': type(e).__name__
         }), 500
 
+@app.route('/estimate', methods=['POST'])
+def estimate_pixel_map():
+    """Predict the cost of a /generate-pixel-map request without drawing any pixels
+    
+    Takes the same body and returns the render path that would run, its predicted render/encode
+    seconds, output size and peak memory. Predictions are calibrated from recorded renders.
+    """
+    data = request.get_json(silent=True)
+    if not data:
+        return jsonify({
+            'success': False,
+            'error': 'No data provided'
+        }), 400
+    
+    surface = data.get('surface', {})
+    config = data.get('config', {})
+    try:
+        spec = pixel_map_spec(surface, config)
+        color_mode = config.get('colorMode', 'rgb')
+        if color_mode not in ('rgb', 'indexed'):
+            raise ValueError("colorMode must be 'rgb' or 'indexed'")
+        output_format = config.get('format', 'png')
+        if output_format not in ('png', 'svg'):
+            raise ValueError("format must be 'png' or 'svg'")
+        region = data.get('region')
+        if region is not None:
+            region = parse_map_region(region, spec['width'], spec['height'])
+        preview_scale = 1.0
+        if data.get('preview') is not None:
+            if region is not None:
+                raise ValueError('region and preview cannot be combined')
+            preview_scale = parse_preview_scale(data['preview'], spec['width'], spec['height'])
+    except (ValueError, TypeError, KeyError, AttributeError) as e:
+        return jsonify({
+            'success': False,
+            'error': f'Invalid request: {e}'
+        }), 400
+    
+    total_pixels = spec['width'] * spec['height']
+    path = select_render_path(total_pixels, color_mode, output_format, region, preview_scale)
+    estimate = estimate_render_cost(path, color_mode, spec['width'], spec['height'], spec['panel_width'],
+                                    spec['panel_height'], region, preview_scale)
+    rss_mb = get_memory_info()['rss_mb']
+    peak_rss_mb = rss_mb + estimate['memory_mb']
+    peak_rss_mb_json = rss_mb + estimate['memory_mb_json']
+    
+    warnings = []
+    if estimate['total_seconds'] > REQUEST_TIMEOUT_SECONDS:
+        warnings.append(f"Predicted {estimate['total_seconds']:.0f}s exceeds the {REQUEST_TIMEOUT_SECONDS}s request timeout - submit it to POST /jobs")
+    if peak_rss_mb_json > RENDER_MEMORY_LIMIT_MB:
+        if peak_rss_mb <= RENDER_MEMORY_LIMIT_MB:
+            warnings.append('JSON response may exceed the memory limit - request ?format=binary')
+        else:
+            warnings.append(f'Predicted peak {peak_rss_mb:.0f}MB exceeds the {RENDER_MEMORY_LIMIT_MB}MB memory limit')
+    
+    logger.info(f"🔮 Estimate {path} ({estimate['model']}, {estimate['samples']} samples): "
+                f"{estimate['total_seconds']:.2f}s, {estimate['output_bytes'] / (1024 * 1024):.2f}MB out, "
+                f"+{estimate['memory_mb']:.0f}MB")
+    
+    return jsonify({
+        'success': True,
+        'engine': path,
+        'streamed': path in ('streaming', 'region_streaming'),
+        'dimensions': {
+            'width': estimate['output_width'],
+            'height': estimate['output_height']
+        },
+        'total_pixels': total_pixels,
+        'cost_units': {
+            'unit': estimate['unit'],
+            'count': estimate['units']
+        },
+        'predicted': {
+            'render_seconds': round(estimate['render_seconds'], 4),
+            'encode_seconds': round(estimate['encode_seconds'], 4),
+            'total_seconds': round(estimate['total_seconds'], 4),
+            'output_bytes': estimate['output_bytes'],
+            'output_mb': round(estimate['output_bytes'] / (1024 * 1024), 4),
+            'memory_delta_mb': round(estimate['memory_mb'], 1),
+            'peak_rss_mb': round(peak_rss_mb, 1),
+            'peak_rss_mb_json': round(peak_rss_mb_json, 1)
+        },
+        'calibration': {
+            'model': estimate['model'],
+            'samples': estimate['samples'],
+            'source': 'recorded renders' if estimate['samples'] else 'built-in defaults'
+        },
+        'memory_limit_mb': RENDER_MEMORY_LIMIT_MB,
+        'fits_in_memory': peak_rss_mb <= RENDER_MEMORY_LIMIT_MB,
+        'warnings': warnings
+    })
+
+def tile_request_spec():
+    """(spec, tile_size) from the tile route's query string; raises ValueError on bad parameters"""
+    spec = pixel_map_spec_from_args(request.args)
+    tile_size = int(request.args.get('tileSize', 256))
+    if tile_size not in TILE_SIZES:
+        raise ValueError(f"tileSize must be one of {TILE_SIZES}")
+    return spec, tile_size
+
+def tile_response(png_bytes, cache_hit):
+    if png_bytes is None:
+        return jsonify({'success': False, 'error': 'Tile outside the map'}), 404
+    return Response(png_bytes, mimetype='image/png', headers={
+        'Cache-Control': 'public, max-age=86400',
+        'X-Tile-Cache': 'hit' if cache_hit else 'miss'
+    })
+
+@app.route('/tiles/manifest.json')
+def get_tile_manifest():
+    """XYZ tile pyramid description (plus the matching Deep Zoom descriptor URL)"""
+    try:
+        spec, tile_size = tile_request_spec()
+    except (ValueError, TypeError) as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    
+    max_zoom = tile_max_zoom(spec['width'], spec['height'], tile_size)
+    query = request.query_string.decode('utf-8')
+    levels = []
+    for zoom in range(max_zoom + 1):
+        scale = 2.0 ** (zoom - max_zoom)
+        level_width = math.ceil(spec['width'] * scale)
+        level_height = math.ceil(spec['height'] * scale)
+        levels.append({
+            'zoom': zoom,
+            'scale': scale,
+            'width': level_width,
+            'height': level_height,
+            'columns': math.ceil(level_width / tile_size),
+            'rows': math.ceil(level_height / tile_size)
+        })
+    
+    return jsonify({
+        'success': True,
+        'width': spec['width'],
+        'height': spec['height'],
+        'tile_size': tile_size,
+        'min_zoom': 0,
+        'max_zoom': max_zoom,
+        'levels': levels,
+        'tiles': f"/tiles/{{z}}/{{x}}/{{y}}.png?{query}",
+        'dzi': f"/tiles/map.dzi?{query}",
+        'map_key': pixel_map_spec_key(spec)
+    })
+
+@app.route('/tiles/<int:z>/<int:x>/<int:y>.png')
+def get_xyz_tile(z, x, y):
+    """One XYZ tile, rendered on demand (full tiles, black beyond the map edge)"""
+    try:
+        spec, tile_size = tile_request_spec()
+    except (ValueError, TypeError) as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    
+    max_zoom = tile_max_zoom(spec['width'], spec['height'], tile_size)
+    if z > max_zoom:
+        return jsonify({'success': False, 'error': f'Zoom {z} above max zoom {max_zoom}'}), 404
+    return tile_response(*get_map_tile_png(spec, 2.0 ** (z - max_zoom), x, y, tile_size, pad=True))
+
+@app.route('/tiles/map.dzi')
+def get_dzi_manifest():
+    """Deep Zoom descriptor; tiles are served from /tiles/map_files/ with the same query string"""
+    try:
+        spec, tile_size = tile_request_spec()
+    except (ValueError, TypeError) as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    
+    dzi = ('<?xml version="1.0" encoding="UTF-8"?>\n'
+           f'<Image xmlns="http://schemas.microsoft.com/deepzoom/2008" TileSize="{tile_size}" Overlap="0" Format="png">'
+           f'<Size Width="{spec["width"]}" Height="{spec["height"]}"/></Image>')
+    return Response(dzi, mimetype='application/xml')
+
+@app.route('/tiles/map_files/<int:level>/<int:col>_<int:row>.png')
+def get_dzi_tile(level, col, row):
+    """One Deep Zoom tile (edge tiles cropped to the level size)"""
+    try:
+        spec, tile_size = tile_request_spec()
+    except (ValueError, TypeError) as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    
+    max_level = dzi_max_level(spec['width'], spec['height'])
+    if level > max_level:
+        return jsonify({'success': False, 'error': f'Level {level} above max level {max_level}'}), 404
+    return tile_response(*get_map_tile_png(spec, 2.0 ** (level - max_level), col, row, tile_size))
+
+@contextmanager
+def pixel_map_render(body, progress=None, admission_timeout=None):
+    """Run /generate-pixel-map on a request body outside of an HTTP request (jobs, batches)
+    
+    Yields the binary response; streamed bodies are still rendering, so read them inside the block.
+    admission_timeout overrides how long the render may wait in the scheduler before failing with 503.
+    """
+    with app.test_request_context('/generate-pixel-map', method='POST', json=body,
+                                  headers={'Accept': 'image/png'}):
+        g.render_progress = progress
+        g.admission_timeout = admission_timeout
+        g.internal_render = True  # Not an HTTP request of its own in /metrics
+        response = app.full_dispatch_request()
+        try:
+            yield response
+        finally:
+            response.close()
+
+def pixel_map_render_error(response):
+    """Error message of a failed pixel_map_render response (None if it succeeded)"""
+    if response.status_code == 200:
+        return None
+    return (response.get_json(silent=True) or {}).get('error', f'Render failed ({response.status_code})')
+
+def pixel_map_result_headers(response):
+    """Metadata headers of a binary render, kept to describe the stored result"""
+    return {name: value for name, value in response.headers.items()
+            if name.startswith('X-') and name != 'X-Accel-Buffering'}
+
+# Render jobs: long maps run on a background executor; state and results live on local disk
+JOB_DIR = os.environ.get('JOB_DIR', os.path.join(tempfile.gettempdir(), 'led-pixel-map-jobs'))
+JOB_TTL_SECONDS = int(os.environ.get('JOB_TTL_SECONDS', 3600))  # Finished jobs (and their files) are kept this long
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 2))  # Jobs rendering at once per server process
+JOB_PROGRESS_INTERVAL = 0.2  # Seconds between progress writes within one stage
+JOB_EVENT_POLL_SECONDS = 0.25  # How often the event stream checks the job state
+JOB_EVENT_KEEPALIVE_SECONDS = 15  # Comment line sent when nothing changed, so proxies keep the stream open
+JOB_ADMISSION_WAIT_SECONDS = float(os.environ.get('JOB_ADMISSION_WAIT_SECONDS', 900))  # Jobs stay queued for a render slot instead of failing fast
+JOB_SWEEP_INTERVAL_SECONDS = 60  # Expired jobs are removed this often, whether or not /jobs is being called
+JOB_ID_PATTERN = re.compile(r'[0-9a-f]{32}')
+
+_job_pool = None
+_job_pool_lock = threading.Lock()
+_job_state_lock = threading.Lock()
+_job_sweeper_pid = None
+_job_sweeper_lock = threading.Lock()
+
+def get_job_pool():
+    """Shared thread pool that runs render jobs outside the HTTP workers"""
+    global _job_pool
+    with _job_pool_lock:
+        if _job_pool is None:
+            _job_pool = ThreadPoolExecutor(max_workers=max(1, JOB_WORKERS), thread_name_prefix='render-job')
+        return _job_pool
+
+def job_path(job_id, suffix):
+    return os.path.join(JOB_DIR, f'{job_id}{suffix}')
+
+def read_job(job_id):
+    """Job state dict, or None for unknown (or malformed) ids"""
+    if not JOB_ID_PATTERN.fullmatch(job_id):
+        return None
+    try:
+        with open(job_path(job_id, '.json')) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+def write_job(job):
+    """Persist job state atomically, so every server process sees a consistent view"""
+    temp_path = job_path(job['id'], f'.json.{os.getpid()}.{threading.get_ident()}.tmp')
+    with open(temp_path, 'w') as f:
+        json.dump(job, f)
+    os.replace(temp_path, job_path(job['id'], '.json'))
+
+def update_job(job_id, **changes):
+    with _job_state_lock:
+        job = read_job(job_id)
+        if job is None:
+            return None
+        job.update(changes)
+        write_job(job)
+        return job
+
+def remove_job_files(job_id):
+    for suffix in ('.json', '.png', '.svg'):
+        try:
+            os.remove(job_path(job_id, suffix))
+        except FileNotFoundError:
+            pass
+
+def cleanup_expired_jobs():
+    """Delete finished jobs past their TTL; fail jobs whose server process has exited"""
+    if not os.path.isdir(JOB_DIR):
+        return
+    now = time.time()
+    for name in os.listdir(JOB_DIR):
+        job_id, suffix = os.path.splitext(name)
+        if suffix != '.json':
+            continue
+        job = read_job(job_id)
+        if job is None:
+            continue
+        if job['state'] in ('done', 'failed'):
+            if now >= job['finished_at'] + JOB_TTL_SECONDS:
+                remove_job_files(job_id)
+                logger.info(f"🧹 Removed expired job {job_id}")
+        elif not psutil.pid_exists(job['pid']):
+            update_job(job_id, state='failed', error='Server process exited before the job finished', finished_at=now)
+
+def sweep_expired_jobs():
+    """Background loop: expired job files are removed even when no job routes are called"""
+    while True:
+        time.sleep(JOB_SWEEP_INTERVAL_SECONDS)
+        try:
+            cleanup_expired_jobs()
+        except Exception as e:
+            logger.error(f"❌ Job sweep failed: {str(e)}")
+
+@app.before_request
+def ensure_job_sweeper():
+    """Start the expired-job sweep once per server process (on its first request, health checks included)"""
+    global _job_sweeper_pid
+    if _job_sweeper_pid == os.getpid():
+        return
+    with _job_sweeper_lock:
+        if _job_sweeper_pid != os.getpid():
+            threading.Thread(target=sweep_expired_jobs, name='job-sweeper', daemon=True).start()
+            _job_sweeper_pid = os.getpid()
+
+def job_status(job):
+    """Public view of a job: state, stage progress, ETA and the result link once done
+    
+    Renders go through stages (fill, borders, labels, encode...) whose length is not known up
+    front, so progress and the ETA are for the current stage only (eta_scope 'stage').
+    """
+    now = time.time()
+    chunks_done, chunks_total = job['chunks_done'], job['chunks_total']
+    elapsed = (job['finished_at'] or now) - job['started_at'] if job['started_at'] else 0
+    eta = None
+    stage_started_at = job.get('stage_started_at')
+    if job['state'] == 'running' and chunks_done and stage_started_at:
+        eta = round((now - stage_started_at) / chunks_done * (chunks_total - chunks_done), 1)
+    status = {
+        'success': True,
+        'job_id': job['id'],
+        'state': job['state'],
+        'progress': {
+            'stage': job['stage'],
+            'chunks_done': chunks_done,
+            'chunks_total': chunks_total,
+            'stage_percent': round(chunks_done / chunks_total * 100, 1) if chunks_total else 0.0,
+            'bytes_written': job['bytes_written']
+        },
+        'elapsed_seconds': round(elapsed, 1),
+        'eta_seconds': eta,
+        'eta_scope': 'stage',
+        'created_at': job['created_at'],
+        'expires_at': job['finished_at'] + JOB_TTL_SECONDS if job['finished_at'] else None
+    }
+    if job['state'] == 'done':
+        status['result_url'] = f"/jobs/{job['id']}/result"
+        status['result'] = job['result']
+    if job['error']:
+        status['error'] = job['error']
+    return status
+
+def run_pixel_map_job(job_id, body):
+    """Render a job's request body through /generate-pixel-map and store the binary result on disk"""
+    update_job(job_id, state='running', started_at=time.time())
+    
+    last_update = {'stage': None, 'time': 0.0}
+    
+    def progress(stage, done, total, bytes_written):
+        # Stage changes and stage completions are always written; in-stage updates are throttled
+        now = time.time()
+        if stage == last_update['stage'] and done < total and now - last_update['time'] < JOB_PROGRESS_INTERVAL:
+            return
+        changes = {'stage': stage, 'chunks_done': done, 'chunks_total': total}
+        if stage != last_update['stage']:
+            changes['stage_started_at'] = now  # The ETA restarts with each stage
+        last_update.update(stage=stage, time=now)
+        if bytes_written is not None:
+            changes['bytes_written'] = bytes_written
+        update_job(job_id, **changes)
+    
+    try:
+        # The same endpoint code renders the job, so results match the synchronous API exactly
+        with pixel_map_render(body, progress, admission_timeout=JOB_ADMISSION_WAIT_SECONDS) as response:
+            error = pixel_map_render_error(response)
+            if error:
+                update_job(job_id, state='failed', error=error, finished_at=time.time())
+                return
+            
+            suffix = '.svg' if response.mimetype == 'image/svg+xml' else '.png'
+            temp_path = job_path(job_id, suffix + '.tmp')
+            with open(temp_path, 'wb') as f:
+                for data in response.iter_encoded():
+                    f.write(data)
+            os.replace(temp_path, job_path(job_id, suffix))
+        
+        file_size = os.path.getsize(job_path(job_id, suffix))
+        job = read_job(job_id)
+        update_job(job_id, state='done', finished_at=time.time(),
+                   chunks_done=job['chunks_total'], bytes_written=file_size, result={
+                       'mime_type': response.mimetype,
+                       'file_size_bytes': file_size,
+                       'headers': pixel_map_result_headers(response)
+                   })
+        logger.info(f"✅ Job {job_id} finished")
+    except Exception as e:
+        logger.error(f"❌ Job {job_id} failed: {str(e)}")
+        logger.error(traceback.format_exc())
+        update_job(job_id, state='failed', error=f'Server error: {str(e)}', finished_at=time.time())
+
+@app.route('/jobs', methods=['POST'])
+def create_job():
+    """Queue a render; takes the same body as /generate-pixel-map and returns a job id at once"""
+    data = request.get_json(silent=True)
+    if not data:
+        return jsonify({'success': False, 'error': 'No data provided'}), 400
+    try:
+        pixel_map_spec(data.get('surface', {}), data.get('config', {}))
+    except (ValueError, TypeError, AttributeError) as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    
+    os.makedirs(JOB_DIR, exist_ok=True)
+    cleanup_expired_jobs()
+    job = {
+        'id': uuid.uuid4().hex,
+        'state': 'queued',
+        'pid': os.getpid(),
+        'created_at': time.time(),
+        'started_at': None,
+        'finished_at': None,
+        'stage': None,
+        'stage_started_at': None,
+        'chunks_done': 0,
+        'chunks_total': 1,
+        'bytes_written': 0,
+        'result': None,
+        'error': None
+    }
+    write_job(job)
+    get_job_pool().submit(run_pixel_map_job, job['id'], data)
+    logger.info(f"📥 Queued job {job['id']}")
+    
+    status = job_status(job)
+    status['status_url'] = f"/jobs/{job['id']}"
+    return jsonify(status), 202, {'Location': status['status_url']}
+
+@app.route('/jobs/<job_id>')
+def get_job(job_id):
+    cleanup_expired_jobs()
+    job = read_job(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Unknown or expired job'}), 404
+    return jsonify(job_status(job))
+
+@app.route('/jobs/<job_id>/events')
+def get_job_events(job_id):
+    """Server-Sent Events: a 'progress' event whenever the job's stage or progress changes,
+    then one 'done' or 'failed' event before the stream closes"""
+    cleanup_expired_jobs()
+    job = read_job(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Unknown or expired job'}), 404
+    
+    def generate():
+        last_status = None
+        last_sent = time.time()
+        yield f'retry: {int(JOB_EVENT_POLL_SECONDS * 4000)}\n\n'
+        while True:
+            job = read_job(job_id)
+            if job is None:
+                yield f"event: failed\ndata: {json.dumps({'job_id': job_id, 'error': 'Unknown or expired job'})}\n\n"
+                return
+            status = (job['state'], job['stage'], job['chunks_done'], job['chunks_total'], job['bytes_written'])
+            if status != last_status:
+                event = job['state'] if job['state'] in ('done', 'failed') else 'progress'
+                yield f"event: {event}\ndata: {json.dumps(job_status(job))}\n\n"
+                if event != 'progress':
+                    return
+                last_status, last_sent = status, time.time()
+            elif time.time() - last_sent >= JOB_EVENT_KEEPALIVE_SECONDS:
+                yield ': keep-alive\n\n'
+                last_sent = time.time()
+            time.sleep(JOB_EVENT_POLL_SECONDS)
+    
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+@app.route('/jobs/<job_id>/result')
+def get_job_result(job_id):
+    """The rendered file, with the same metadata headers as a binary /generate-pixel-map response"""
+    cleanup_expired_jobs()
+    job = read_job(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Unknown or expired job'}), 404
+    if job['state'] != 'done':
+        return jsonify({'success': False, 'error': f"Job is {job['state']}", 'state': job['state']}), 409
+    
+    result = job['result']
+    suffix = '.svg' if result['mime_type'] == 'image/svg+xml' else '.png'
+    try:
+        response = send_file(job_path(job_id, suffix), mimetype=result['mime_type'])
+    except FileNotFoundError:
+        return jsonify({'success': False, 'error': 'Unknown or expired job'}), 404
+    response.headers.update(result['headers'])
+    return response
+
+# Batches: many surfaces in one request, streamed back as a ZIP entry by entry
+BATCH_MAX_SURFACES = int(os.environ.get('BATCH_MAX_SURFACES', 32))
+BATCH_WORKERS = int(os.environ.get('BATCH_WORKERS', 2))  # Surfaces rendering at once per batch
+BATCH_SPOOL_BYTES = 32 * 1024 * 1024  # Rendered files larger than this wait for their ZIP entry on disk
+BATCH_COPY_CHUNK = 1024 * 1024
+
+class ZipStreamBuffer:
+    """Write-only sink for zipfile that hands back what was written since the last drain
+    
+    It has no seek/tell, so zipfile writes data descriptors and never goes back - every
+    byte can be sent as soon as it is produced.
+    """
+    
+    def __init__(self):
+        self.pieces = []
+    
+    def write(self, data):
+        self.pieces.append(bytes(data))
+        return len(data)
+    
+    def flush(self):
+        pass
+    
+    def drain(self):
+        data = b''.join(self.pieces)
+        self.pieces = []
+        return data
+
+def batch_entry_filename(index, body, mimetype):
+    """'03_Main_Stage.png' - numbered so names stay unique and ordered"""
+    surface_name = str((body.get('config') or {}).get('surfaceName', f'surface_{index + 1}'))
+    safe_name = re.sub(r'[^A-Za-z0-9._-]+', '_', surface_name).strip('._') or f'surface_{index + 1}'
+    extension = 'svg' if mimetype == 'image/svg+xml' else 'png'
+    return f'{index + 1:02d}_{safe_name[:64]}.{extension}'
+
+def render_batch_entry(body):
+    """Render one batch surface into a spooled temp file: (file, mimetype, headers, error)"""
+    try:
+        with pixel_map_render(body) as response:
+            error = pixel_map_render_error(response)
+            if error:
+                return None, None, None, error
+            spool = tempfile.SpooledTemporaryFile(max_size=BATCH_SPOOL_BYTES)
+            for data in response.iter_encoded():
+                spool.write(data)
+            spool.seek(0)
+            return spool, response.mimetype, pixel_map_result_headers(response), None
+    except Exception as e:
+        logger.error(f"❌ Batch surface failed: {str(e)}")
+        logger.error(traceback.format_exc())
+        return None, None, None, f'Server error: {str(e)}'
+
+def iter_batch_zip(entries):
+    """Render the surfaces on a small thread pool and yield the ZIP as each entry is written
+    
+    At most BATCH_WORKERS renders are finished or in flight ahead of the entry being written,
+    so only a few images are ever held at once. Renders share the process-wide glyph, tile
+    and palette caches. manifest.json is written last, after every surface is known.
+    """
+    sink = ZipStreamBuffer()
+    manifest = []
+    workers = max(1, min(BATCH_WORKERS, len(entries)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='batch') as pool, \
+         zipfile.ZipFile(sink, 'w', zipfile.ZIP_STORED, allowZip64=True) as archive:
+        pending = deque()
+        next_index = 0
+        for index in range(len(entries)):
+            while next_index < len(entries) and len(pending) < workers:
+                pending.append(pool.submit(render_batch_entry, entries[next_index]))
+                next_index += 1
+            spool, mimetype, headers, error = pending.popleft().result()
+            
+            item = {'index': index, 'surface_name': (entries[index].get('config') or {}).get('surfaceName')}
+            if error:
+                manifest.append(dict(item, success=False, error=error))
+                continue
+            
+            filename = batch_entry_filename(index, entries[index], mimetype)
+            size = 0
+            with spool, archive.open(filename, 'w', force_zip64=True) as entry:
+                while True:
+                    data = spool.read(BATCH_COPY_CHUNK)
+                    if not data:
+                        break
+                    entry.write(data)
+                    size += len(data)
+                    yield sink.drain()
+            yield sink.drain()
+            manifest.append(dict(
+                item,
+                success=True,
+                file=filename,
+                mime_type=mimetype,
+                file_size_bytes=size,
+                dimensions={'width': int(headers['X-Image-Width']), 'height': int(headers['X-Image-Height'])},
+                led_info=json.loads(headers['X-LED-Info']),
+                total_pixels=int(headers['X-Total-Pixels']) if 'X-Total-Pixels' in headers else None,
+                color_mode=headers.get('X-Color-Mode', 'rgb')
+            ))
+            logger.info(f"📦 Batch entry {index + 1}/{len(entries)}: {filename} ({size / (1024 * 1024):.2f}MB)")
+        
+        archive.writestr(zipfile.ZipInfo('manifest.json', time.localtime()[:6]),
+                         json.dumps({'surfaces': manifest}, indent=2), compress_type=zipfile.ZIP_DEFLATED)
+    yield sink.drain()
+
+@app.route('/generate-batch', methods=['POST'])
+def generate_batch():
+    """Render several surfaces (each a /generate-pixel-map body) into one streamed ZIP"""
+    data = request.get_json(silent=True)
+    entries = data.get('surfaces') if isinstance(data, dict) else data
+    if not isinstance(entries, list) or not entries:
+        return jsonify({'success': False, 'error': 'surfaces must be a non-empty list of {surface, config} entries'}), 400
+    if len(entries) > BATCH_MAX_SURFACES:
+        return jsonify({'success': False, 'error': f'At most {BATCH_MAX_SURFACES} surfaces per batch'}), 400
+    for index, entry in enumerate(entries):
+        try:
+            pixel_map_spec(entry.get('surface', {}), entry.get('config') or {})
+        except (ValueError, TypeError, AttributeError) as e:
+            return jsonify({'success': False, 'error': f'surfaces[{index}]: {e}'}), 400
+    
+    logger.info(f"📦 BATCH: {len(entries)} surfaces")
+    chunks = (data for data in iter_batch_zip(entries) if data)  # Empty writes would end a chunked body
+    return Response(chunks, mimetype='application/zip', headers={
+        'Content-Disposition': 'attachment; filename="pixel-maps.zip"',
+        'X-Accel-Buffering': 'no'
+    }, direct_passthrough=True)
+
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
     app.run(host='0.0.0.0', port=port, debug=False)
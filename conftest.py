@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""
+Shared pytest fixtures: every test renders against its own caches, jobs and scheduler
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import app as app_module
+from app import BytesLRUCache, RenderDiskCache, RenderScheduler, RenderStatsLog
+import pytest
+
+@pytest.fixture(autouse=True)
+def isolated_render_state(monkeypatch, tmp_path):
+    """Fresh render caches, job directory, render stats and scheduler, restored after the test
+
+    Renders left in shared caches by earlier tests would turn later misses into hits.
+    """
+    monkeypatch.setattr(app_module, 'render_cache', RenderDiskCache(str(tmp_path / 'render-cache'), app_module.RENDER_CACHE_BYTES))
+    monkeypatch.setattr(app_module, 'result_cache', BytesLRUCache(app_module.RESULT_CACHE_BYTES, app_module.RESULT_CACHE_MAX_ITEM_BYTES))
+    monkeypatch.setattr(app_module, 'tile_cache', BytesLRUCache(app_module.TILE_CACHE_BYTES))
+    monkeypatch.setattr(app_module, 'render_stats', RenderStatsLog(str(tmp_path / 'render_stats.sqlite3')))
+    monkeypatch.setattr(app_module, 'render_scheduler', RenderScheduler(app_module.RENDER_MEMORY_BUDGET_MB))
+    monkeypatch.setattr(app_module, 'JOB_DIR', str(tmp_path / 'jobs'))
+
+@pytest.fixture
+def render_caches(monkeypatch, tmp_path):
+    """Swap in result (memory) and render (disk) caches of the given sizes; 0 turns a tier off"""
+    def use(memory_bytes=app_module.RESULT_CACHE_BYTES, max_item_bytes=app_module.RESULT_CACHE_MAX_ITEM_BYTES,
+            disk_bytes=app_module.RENDER_CACHE_BYTES, directory=None):
+        result_cache = BytesLRUCache(memory_bytes, max_item_bytes)
+        render_cache = RenderDiskCache(directory or str(tmp_path / 'render-cache'), disk_bytes)
+        monkeypatch.setattr(app_module, 'result_cache', result_cache)
+        monkeypatch.setattr(app_module, 'render_cache', render_cache)
+        return result_cache, render_cache
+    return use
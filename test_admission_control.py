@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Test memory-budget admission control for concurrent renders
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import app as app_module
+from app import app, RenderScheduler
+import pytest
+import threading
+import time
+
+SURFACE = {'panelsWidth': 10, 'fullPanelsHeight': 5, 'panelPixelWidth': 200, 'panelPixelHeight': 200, 'ledName': 'Admission'}
+
+def test_memory_budget():
+    """Reservations fit the budget, wait in arrival order and time out"""
+
+    print("🧪 TESTING MEMORY BUDGET")
+    print("=" * 50)
+
+    budget = RenderScheduler(100)
+    first = budget.acquire(60, expected_seconds=2.0)
+    assert first is not None and budget.stats()['reserved_mb'] == 60
+    start = time.time()
+    assert budget.acquire(60, timeout=0.2) is None, "Over-budget request must not be admitted"
+    assert 0.15 < time.time() - start < 1.0 and budget.stats()['rejected'] == 1
+    assert 1 <= budget.retry_after(60) <= 2
+    print("✅ Over-budget request rejected after the wait, Retry-After from the running render")
+
+    # A large waiter at the head of the line is not overtaken by a small one that would fit
+    admitted = []
+    big = threading.Thread(target=lambda: admitted.append(('big', budget.acquire(60, timeout=5))))
+    big.start()
+    time.sleep(0.1)
+    small = threading.Thread(target=lambda: admitted.append(('small', budget.acquire(30, timeout=5))))
+    small.start()
+    time.sleep(0.1)
+    assert admitted == [] and budget.stats()['waiting'] == 2
+    first.release()
+    first.release()  # Idempotent
+    big.join(2)
+    small.join(2)
+    assert [name for name, _ in admitted] == ['big', 'small'], admitted
+    for _, reservation in admitted:
+        reservation.release()
+    assert budget.stats()['reserved_mb'] == 0 and budget.stats()['running'] == 0
+
+    # Oversized requests run alone rather than never
+    huge = budget.acquire(500, timeout=0.1)
+    assert huge is not None and budget.acquire(1, timeout=0.1) is None
+    huge.release()
+    print("✅ Arrival order kept; oversized renders are admitted only when alone")
+
+def test_default_budget(monkeypatch):
+    """The default render budget leaves room for the interpreter, the memory caches and band processes"""
+
+    print("\n🧪 TESTING DEFAULT MEMORY BUDGET")
+    print("=" * 50)
+
+    monkeypatch.setattr(app_module, 'RENDER_WORKERS', 1)
+    limit_mb = app_module.RENDER_MEMORY_LIMIT_MB
+    cache_mb = (app_module.RESULT_CACHE_BYTES + app_module.TILE_CACHE_BYTES) // (1024 * 1024)
+    budget_mb = app_module.default_render_memory_budget_mb()
+    assert budget_mb + cache_mb + app_module.RENDER_BASE_MEMORY_MB == limit_mb
+
+    monkeypatch.setattr(app_module, 'RENDER_WORKERS', 3)
+    pool_mb = app_module.RENDER_POOL_SERVER_MB + 3 * app_module.RENDER_POOL_WORKER_MB
+    assert app_module.default_render_memory_budget_mb() == budget_mb - pool_mb
+    monkeypatch.setattr(app_module, 'RENDER_MEMORY_LIMIT_MB', 256)
+    assert app_module.default_render_memory_budget_mb() == app_module.RENDER_MIN_BUDGET_MB
+    print(f"✅ {budget_mb}MB of {limit_mb}MB for renders next to {cache_mb}MB of caches")
+
+def test_endpoint_admission(monkeypatch):
+    """Renders that don't fit get 503 + Retry-After; reservations are returned after every response"""
+
+    print("\n🧪 TESTING ENDPOINT ADMISSION")
+    print("=" * 50)
+
+    budget = RenderScheduler(200)
+    monkeypatch.setattr(app_module, 'render_scheduler', budget)
+    monkeypatch.setattr(app_module, 'ADMISSION_WAIT_SECONDS', 0.2)
+    client = app.test_client()
+
+    blocker = budget.acquire(200, expected_seconds=5.0)
+    response = client.post('/generate-pixel-map?format=binary', json={'surface': SURFACE})
+    assert response.status_code == 503, response.status_code
+    assert 1 <= int(response.headers['Retry-After']) <= 5
+    assert response.get_json()['success'] is False and 'busy' in response.get_json()['error']
+    blocker.release()
+    print(f"✅ 503 while the budget is full (Retry-After: {response.headers['Retry-After']})")
+
+    response = client.post('/generate-pixel-map?format=binary', json={'surface': SURFACE})
+    assert response.status_code == 200 and budget.stats()['reserved_mb'] == 0
+
+    # Streamed bodies hold their reservation until the last chunk
+    surface = dict(SURFACE, panelsWidth=36, fullPanelsHeight=36)
+    response = client.post('/generate-pixel-map?format=binary', json={'surface': surface}, buffered=False)
+    assert response.is_streamed and budget.stats()['running'] == 1
+    response.get_data()
+    response.close()
+    assert budget.stats()['running'] == 0 and budget.stats()['admitted'] == 3  # Blocker + two renders
+
+    # Cache hits never reserve memory
+    response = client.post('/generate-pixel-map?format=binary', json={'surface': SURFACE})
+    assert response.headers['X-Render-Cache'] == 'hit' and budget.stats()['admitted'] == 3
+    print("✅ Reservations released after buffered and streamed responses; cache hits skip admission")
+
+def test_jobs_wait_for_memory(monkeypatch):
+    """Background jobs queue for memory instead of failing fast"""
+
+    print("\n🧪 TESTING JOB ADMISSION")
+    print("=" * 50)
+
+    budget = RenderScheduler(200)
+    monkeypatch.setattr(app_module, 'render_scheduler', budget)
+    monkeypatch.setattr(app_module, 'ADMISSION_WAIT_SECONDS', 0.2)
+    client = app.test_client()
+
+    blocker = budget.acquire(200)
+    job_id = client.post('/jobs', json={'surface': SURFACE, 'config': {'showCross': True}}).get_json()['job_id']
+    time.sleep(0.6)
+    assert client.get(f'/jobs/{job_id}').get_json()['state'] == 'running' and budget.stats()['waiting'] == 1
+    blocker.release()
+    deadline = time.time() + 30
+    while client.get(f'/jobs/{job_id}').get_json()['state'] == 'running' and time.time() < deadline:
+        time.sleep(0.05)
+    assert client.get(f'/jobs/{job_id}').get_json()['state'] == 'done'
+    print("✅ Job waited past the request admission timeout and finished")
+
+if __name__ == "__main__":
+    # Run through pytest so the conftest fixtures isolate the module-level caches
+    if pytest.main([__file__, '-q', '-s']) == 0:
+        print("\n🎉 ADMISSION CONTROL TEST PASSED!")
+    else:
+        print("\n❌ ADMISSION CONTROL TEST FAILED")
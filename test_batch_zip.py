@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Test the multi-surface /generate-batch ZIP endpoint
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import app
+import io
+import json
+import zipfile
+
+SURFACE = {'panelsWidth': 4, 'fullPanelsHeight': 3, 'panelPixelWidth': 100, 'panelPixelHeight': 100, 'ledName': 'Absen'}
+
+def test_batch_zip():
+    """Each surface becomes one ZIP entry identical to its binary render, plus a manifest"""
+
+    print("🧪 TESTING BATCH ZIP")
+    print("=" * 50)
+
+    client = app.test_client()
+    entries = [
+        {'surface': SURFACE, 'config': {'surfaceName': 'Main Stage'}},
+        {'surface': dict(SURFACE, panelsWidth=6), 'config': {'surfaceName': 'Side/Left', 'colorMode': 'indexed', 'showCross': True}},
+        {'surface': dict(SURFACE, panelsWidth=36, fullPanelsHeight=36, panelPixelWidth=200, panelPixelHeight=200),
+         'config': {'surfaceName': 'Big Wall'}},
+        {'surface': SURFACE, 'config': {'surfaceName': 'Vector', 'format': 'svg'}}
+    ]
+    response = client.post('/generate-batch', json={'surfaces': entries})
+    assert response.status_code == 200 and response.mimetype == 'application/zip'
+    assert response.is_streamed and 'Content-Length' not in response.headers
+
+    archive = zipfile.ZipFile(io.BytesIO(response.data))
+    assert archive.testzip() is None
+    names = archive.namelist()
+    assert names == ['01_Main_Stage.png', '02_Side_Left.png', '03_Big_Wall.png', '04_Vector.svg', 'manifest.json']
+
+    manifest = json.loads(archive.read('manifest.json'))['surfaces']
+    for entry, item in zip(entries, manifest):
+        expected = client.post('/generate-pixel-map?format=binary', json=entry)
+        assert archive.read(item['file']) == expected.data, f"{item['file']} differs from its single render"
+        assert item['success'] and item['file_size_bytes'] == len(expected.data)
+        assert item['dimensions']['width'] == int(expected.headers['X-Image-Width'])
+        expected.close()
+    assert manifest[1]['color_mode'] == 'indexed' and manifest[3]['mime_type'] == 'image/svg+xml'
+    print(f"✅ {len(names)} entries, {len(response.data):,} bytes")
+
+def test_batch_errors():
+    """Bad batches are rejected up front; a surface failing at render time is reported in the manifest"""
+
+    print("\n🧪 TESTING BATCH ERRORS")
+    print("=" * 50)
+
+    client = app.test_client()
+    assert client.post('/generate-batch', json={'surfaces': []}).status_code == 400
+    response = client.post('/generate-batch', json={'surfaces': [{'surface': SURFACE}, {'surface': dict(SURFACE, panelsWidth=-1)}]})
+    assert response.status_code == 400 and 'surfaces[1]' in response.get_json()['error']
+
+    response = client.post('/generate-batch', json=[{'surface': SURFACE}, {'surface': SURFACE, 'config': {'colorMode': 'cmyk'}}])
+    archive = zipfile.ZipFile(io.BytesIO(response.data))
+    manifest = json.loads(archive.read('manifest.json'))['surfaces']
+    assert archive.namelist() == ['01_surface_1.png', 'manifest.json']
+    assert manifest[0]['success'] and not manifest[1]['success'] and 'colorMode' in manifest[1]['error']
+    print("✅ Invalid batches rejected; render failures listed in manifest.json")
+
+if __name__ == "__main__":
+    try:
+        test_batch_zip()
+        test_batch_errors()
+        print("\n🎉 BATCH ZIP TEST PASSED!")
+    except AssertionError as e:
+        print(f"\n❌ BATCH ZIP TEST FAILED: {e}")
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Test binary image responses from /generate-pixel-map (Accept: image/png or ?format=binary)
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import app
+from PIL import Image
+import base64
+import io
+import json
+
+SURFACE = {'panelsWidth': 4, 'fullPanelsHeight': 3, 'panelPixelWidth': 100, 'panelPixelHeight': 100, 'ledName': 'Absen'}
+
+def test_binary_png_response():
+    """Both opt-ins return the same PNG bytes as the JSON image_base64, with metadata in headers"""
+
+    print("🧪 TESTING BINARY PNG RESPONSE")
+    print("=" * 50)
+
+    client = app.test_client()
+    for config in [{}, {'colorMode': 'indexed'}]:
+        body = {'surface': SURFACE, 'config': config}
+        data = client.post('/generate-pixel-map', json=body).get_json()
+        json_png = base64.b64decode(data['image_base64'])
+
+        for response in [
+            client.post('/generate-pixel-map', json=body, headers={'Accept': 'image/png'}),
+            client.post('/generate-pixel-map?format=binary', json=body)
+        ]:
+            assert response.status_code == 200
+            assert response.mimetype == 'image/png', f"Expected image/png, got {response.mimetype}"
+            assert response.data == json_png, "Binary body differs from the JSON image"
+            assert int(response.headers['X-Image-Width']) == data['dimensions']['width']
+            assert int(response.headers['X-Image-Height']) == data['dimensions']['height']
+            assert json.loads(response.headers['X-LED-Info']) == data['led_info']
+            assert int(response.headers['Content-Length']) == len(json_png)
+            assert Image.open(io.BytesIO(response.data)).size == (400, 300)
+        print(f"✅ {config or 'default'}: {len(json_png):,} byte PNG body")
+
+def test_json_response_unchanged():
+    """Without an opt-in the legacy JSON shape is returned (including the data URL)"""
+
+    print("\n🧪 TESTING DEFAULT JSON RESPONSE")
+    print("=" * 50)
+
+    client = app.test_client()
+    for headers in [{}, {'Accept': '*/*'}, {'Accept': 'application/json, image/png;q=0.5'}]:
+        response = client.post('/generate-pixel-map', json={'surface': SURFACE}, headers=headers)
+        data = response.get_json()
+        assert data['success'] and data['imageData'].startswith('data:image/png;base64,')
+        assert data['imageData'].endswith(data['image_base64'])
+    print("✅ JSON clients still get image_base64 and imageData")
+
+def test_binary_svg_and_errors():
+    """SVG output is sent as image/svg+xml; errors stay JSON"""
+
+    print("\n🧪 TESTING BINARY SVG AND ERRORS")
+    print("=" * 50)
+
+    client = app.test_client()
+    response = client.post('/generate-pixel-map?format=binary', json={'surface': SURFACE, 'config': {'format': 'svg'}})
+    assert response.mimetype == 'image/svg+xml'
+    assert response.data.startswith(b'<svg') or b'<svg' in response.data[:200]
+    assert response.headers['X-Image-Width'] == '400'
+
+    response = client.post('/generate-pixel-map?format=binary', json={'surface': SURFACE, 'config': {'colorMode': 'cmyk'}})
+    assert response.status_code == 400 and response.get_json()['success'] is False
+    print("✅ SVG body returned directly; validation errors remain JSON")
+
+if __name__ == "__main__":
+    try:
+        test_binary_png_response()
+        test_json_response_unchanged()
+        test_binary_svg_and_errors()
+        print("\n🎉 BINARY RESPONSE TEST PASSED!")
+    except AssertionError as e:
+        print(f"\n❌ BINARY RESPONSE TEST FAILED: {e}")
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Test chunked streaming of massive binary PNG responses
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import app
+from PIL import Image
+import base64
+import io
+import pytest
+import time
+
+# 36×36 panels of 200px = 51.8M pixels, over the streaming threshold
+SURFACE = {'panelsWidth': 36, 'fullPanelsHeight': 36, 'panelPixelWidth': 200, 'panelPixelHeight': 200, 'ledName': 'Absen'}
+
+def test_streamed_map_response():
+    """Binary requests for streamed maps send PNG chunks as they are encoded"""
+
+    print("🧪 TESTING CHUNKED MAP RESPONSE")
+    print("=" * 50)
+
+    client = app.test_client()
+    body = {'surface': SURFACE, 'config': {'showCross': True}}
+    start = time.time()
+    response = client.post('/generate-pixel-map', json=body, headers={'Accept': 'image/png'}, buffered=False)
+    chunks = iter(response.response)
+    first_chunk = next(chunks)
+    first_byte_seconds = time.time() - start
+
+    assert response.is_streamed and 'Content-Length' not in response.headers
+    assert response.mimetype == 'image/png'
+    assert first_chunk.startswith(b'\x89PNG\r\n\x1a\n'), "First chunk must carry the PNG header"
+    streamed = first_chunk + b''.join(chunks)
+    response.close()
+    total_seconds = time.time() - start
+    assert response.headers['X-Image-Width'] == '7200' and response.headers['X-Image-Height'] == '7200'
+
+    data = client.post('/generate-pixel-map', json=body).get_json()
+    assert streamed == base64.b64decode(data['image_base64']), "Streamed body differs from the JSON image"
+    assert Image.open(io.BytesIO(streamed)).size == (7200, 7200)
+    print(f"✅ First byte after {first_byte_seconds * 1000:.1f}ms, {len(streamed):,} bytes after {total_seconds:.2f}s")
+
+def test_streamed_region_response():
+    """Region renders over the streaming threshold are streamed too"""
+
+    print("\n🧪 TESTING CHUNKED REGION RESPONSE")
+    print("=" * 50)
+
+    client = app.test_client()
+    body = {'surface': SURFACE, 'region': {'x': 50, 'y': 20, 'width': 7150, 'height': 7180}}
+    response = client.post('/generate-pixel-map?format=binary', json=body)
+    assert response.is_streamed and response.mimetype == 'image/png'
+    assert Image.open(io.BytesIO(response.data)).size == (7150, 7180)
+    assert response.headers['X-Image-Width'] == '7150'
+    print(f"✅ Region streamed: {len(response.data):,} bytes")
+
+if __name__ == "__main__":
+    # Run through pytest so the conftest fixtures isolate the module-level caches
+    if pytest.main([__file__, '-q', '-s']) == 0:
+        print("\n🎉 CHUNKED RESPONSE TEST PASSED!")
+    else:
+        print("\n❌ CHUNKED RESPONSE TEST FAILED")
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Test POST /estimate cost predictions and their calibration from recorded renders
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import app as app_module
+from app import app
+import pytest
+import time
+
+def surface(panels_width, panels_height, panel_size=200):
+    return {'panelsWidth': panels_width, 'fullPanelsHeight': panels_height,
+            'panelPixelWidth': panel_size, 'panelPixelHeight': panel_size, 'ledName': 'Absen'}
+
+def test_estimate_engines():
+    """Each request shape predicts the path /generate-pixel-map would take, without rendering"""
+
+    print("🧪 TESTING ESTIMATE ENGINE SELECTION")
+    print("=" * 50)
+
+    stats = app_module.render_stats
+    client = app.test_client()
+    cases = [
+        ({'surface': surface(10, 5)}, 'legacy'),
+        ({'surface': surface(10, 5), 'config': {'colorMode': 'indexed'}}, 'optimized'),
+        ({'surface': surface(20, 20)}, 'optimized'),
+        ({'surface': surface(40, 40)}, 'streaming'),
+        ({'surface': surface(50, 50), 'config': {'format': 'svg'}}, 'svg'),
+        ({'surface': surface(50, 50), 'preview': {'maxWidth': 1000}}, 'preview'),
+        ({'surface': surface(20, 20), 'region': {'x': 0, 'y': 0, 'width': 1000, 'height': 800}}, 'region'),
+        ({'surface': surface(80, 80), 'region': {'x': 0, 'y': 0, 'width': 8000, 'height': 8000}}, 'region_streaming'),
+    ]
+    for body, engine in cases:
+        start = time.time()
+        data = client.post('/estimate', json=body).get_json()
+        elapsed = time.time() - start
+        assert data['success'] and data['engine'] == engine, f"Expected {engine}, got {data.get('engine')}"
+        predicted = data['predicted']
+        assert predicted['total_seconds'] > 0 and predicted['output_bytes'] > 0
+        assert predicted['peak_rss_mb_json'] >= predicted['peak_rss_mb']
+        assert data['calibration']['samples'] == 0 and data['calibration']['source'] == 'built-in defaults'
+        assert elapsed < 1.0, f"Estimate took {elapsed:.2f}s - nothing should be drawn"
+        print(f"✅ {engine}: {predicted['total_seconds']:.3f}s, {predicted['output_mb']:.2f}MB, "
+              f"+{predicted['memory_delta_mb']}MB ({elapsed * 1000:.1f}ms)")
+
+    assert data['streamed'] and data['dimensions'] == {'width': 8000, 'height': 8000}
+    assert stats.recent('region_streaming:rgb') == [], "Estimating must not record renders"
+    assert app_module.render_cache.stats()['entries'] == 0, "Estimating must not render"
+
+    assert data['predicted']['peak_rss_mb'] >= data['predicted']['memory_delta_mb']
+    print("✅ Estimates are instant and leave the caches and stats untouched")
+
+def test_estimate_calibration():
+    """Recorded renders pull the predictions toward measured costs"""
+
+    print("\n🧪 TESTING ESTIMATE CALIBRATION")
+    print("=" * 50)
+
+    stats = app_module.render_stats
+    client = app.test_client()
+    body = {'surface': surface(10, 5)}
+    before = client.post('/estimate', json=body).get_json()['predicted']
+
+    # A real render records a sample under the estimate's model
+    response = client.post('/generate-pixel-map?format=binary', json=body)
+    assert response.status_code == 200
+    samples = stats.recent('legacy:rgb')
+    assert len(samples) == 1, f"Expected one recorded render, got {len(samples)}"
+    assert samples[0]['units'] == 2000 * 1000 and samples[0]['output_bytes'] == len(response.data)
+    assert samples[0]['render_seconds'] > 0 and samples[0]['encode_seconds'] > 0
+    data = client.post('/estimate', json=body).get_json()
+    assert data['calibration'] == {'model': 'legacy:rgb', 'samples': 1, 'source': 'recorded renders'}
+    print(f"✅ Render recorded: {samples[0]['render_seconds']:.3f}s render, {samples[0]['encode_seconds']:.3f}s encode")
+
+    # Slow, large measurements move the prediction most of the way once they outnumber the prior
+    measured_seconds = before['render_seconds'] * 10
+    for _ in range(20):
+        stats.record('legacy:rgb', 2000 * 1000, measured_seconds, 0.5, 40_000_000, 300 * 1024 * 1024)
+    after = client.post('/estimate', json=body).get_json()['predicted']
+    assert before['render_seconds'] < after['render_seconds'] < measured_seconds
+    assert after['render_seconds'] > measured_seconds * 0.8, "Prediction should follow the recorded renders"
+    assert after['output_bytes'] > before['output_bytes'] and after['memory_delta_mb'] > 250
+    print(f"✅ Render seconds {before['render_seconds']:.3f} → {after['render_seconds']:.3f} (measured {measured_seconds:.3f})")
+
+    # Only the newest renders are kept per model
+    for _ in range(app_module.RENDER_STATS_SAMPLES):
+        stats.record('legacy:rgb', 2000 * 1000, 0.01, 0.01, 1000, 0)
+    assert len(stats.recent('legacy:rgb')) == app_module.RENDER_STATS_SAMPLES
+    assert client.post('/estimate', json=body).get_json()['predicted']['render_seconds'] < before['render_seconds']
+    print(f"✅ Stats capped at {app_module.RENDER_STATS_SAMPLES} renders per model")
+
+def test_estimate_warnings_and_errors():
+    """Slow requests are pointed at /jobs; bad requests get 400 like /generate-pixel-map"""
+
+    print("\n🧪 TESTING ESTIMATE WARNINGS AND ERRORS")
+    print("=" * 50)
+
+    stats = app_module.render_stats
+    client = app.test_client()
+    body = {'surface': surface(70, 70)}
+    for _ in range(10):
+        stats.record('streaming:rgb', 14000 * 14000, 600.0, 0.0, 2_000_000, 40 * 1024 * 1024)
+    data = client.post('/estimate', json=body).get_json()
+    assert data['predicted']['total_seconds'] > app_module.REQUEST_TIMEOUT_SECONDS
+    assert any('/jobs' in warning for warning in data['warnings']), data['warnings']
+    print(f"✅ Warning: {data['warnings'][0]}")
+
+    for bad in [
+        None,
+        {'surface': {'panelsWidth': 0}},
+        {'surface': surface(4, 4), 'config': {'colorMode': 'cmyk'}},
+        {'surface': surface(4, 4), 'config': {'format': 'gif'}},
+        {'surface': surface(4, 4), 'region': {'x': 5000, 'y': 0, 'width': 100, 'height': 10}},
+        {'surface': surface(4, 4), 'region': {'x': 0, 'y': 0, 'width': 10, 'height': 10}, 'preview': {'maxWidth': 100}},
+    ]:
+        response = client.post('/estimate', json=bad) if bad else client.post('/estimate', data='nope')
+        assert response.status_code == 400 and response.get_json()['success'] is False, bad
+    print("✅ Invalid requests rejected with 400")
+
+if __name__ == "__main__":
+    # Run through pytest so the conftest fixtures isolate the module-level caches
+    if pytest.main([__file__, '-q', '-s']) == 0:
+        print("\n🎉 ESTIMATE TEST PASSED!")
+    else:
+        print("\n❌ ESTIMATE TEST FAILED")
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Test the pre-rasterized glyph atlas against direct vector digit drawing
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import draw_vector_panel_number, draw_glyph_panel_number, get_glyph_atlas
+from PIL import Image, ImageDraw
+import time
+
+def test_glyph_atlas():
+    """Atlas labels must look exactly like the vector-drawn labels"""
+    
+    print("🧪 TESTING GLYPH ATLAS NUMBERING")
+    print("=" * 50)
+    
+    labels = ["1.1", "12.34", "7.890", "56,7", "100.200"]
+    
+    for size in [12, 15, 22, 30, 45, 75, 150]:
+        for label in labels:
+            images = []
+            for draw_number in [draw_vector_panel_number, draw_glyph_panel_number]:
+                image = Image.new('RGB', (size * 8, size * 2), (128, 128, 128))
+                draw = ImageDraw.Draw(image)
+                draw_number(draw, label, size // 4, size // 4, size, color=(255, 255, 255))
+                images.append(image.tobytes())
+            
+            assert images[0] == images[1], f"Label '{label}' differs at size {size}px"
+        
+        print(f"✅ {size}px labels identical")
+    
+    # Speed comparison for a 10k panel wall worth of labels
+    image = Image.new('RGB', (2000, 2000), (255, 0, 0))
+    draw = ImageDraw.Draw(image)
+    get_glyph_atlas(30)
+    for draw_number in [draw_vector_panel_number, draw_glyph_panel_number]:
+        start_time = time.time()
+        for i in range(10_000):
+            draw_number(draw, f"{i // 100 + 1}.{i % 100 + 1}", (i % 100) * 20, (i // 100) * 20, 30, color=(255, 255, 255))
+        print(f"⏱️ {draw_number.__name__}: {time.time() - start_time:.2f}s for 10,000 labels")
+
+if __name__ == "__main__":
+    try:
+        test_glyph_atlas()
+        print("\n🎉 GLYPH ATLAS TEST PASSED!")
+    except AssertionError as e:
+        print(f"\n❌ GLYPH ATLAS TEST FAILED: {e}")
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Test indexed (palette) color mode against the RGB renders
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import app as app_module
+from app import app, generate_full_quality_pixel_map, iter_streaming_pixel_map_png, build_pixel_map_palette, render_pixel_map_band
+from PIL import Image
+import base64
+import io
+import struct
+
+def read_ihdr(png_bytes):
+    """(bit depth, color type) from the IHDR chunk"""
+    width, height, bit_depth, color_type = struct.unpack('>IIBB', png_bytes[16:26])
+    return bit_depth, color_type
+
+def test_indexed_full_quality():
+    """Indexed full-quality maps must show exactly the RGB pixels, for every fill engine
+    
+    The surface name is left off: its anti-aliased edges are drawn unsmoothed in palette mode.
+    """
+    
+    print("🧪 TESTING INDEXED FULL-QUALITY RENDER")
+    print("=" * 50)
+    
+    for engine in ['numpy', 'tiles', 'pil']:
+        args = (2000, 1200, 200, 200, True, True, 'Absen', False, True, True, False, 'Main Stage')
+        rgb = generate_full_quality_pixel_map(*args, engine=engine)
+        indexed = generate_full_quality_pixel_map(*args, engine=engine, color_mode='indexed')
+    
+        assert indexed.mode == 'P', f"Expected 'P' image, got {indexed.mode}"
+        assert len(indexed.getpalette()) // 3 <= 16, "Palette grew past 16 colors"
+        assert indexed.convert('RGB').tobytes() == rgb.tobytes(), f"Indexed pixels differ ({engine})"
+    
+        buffer = io.BytesIO()
+        indexed.save(buffer, format='PNG', optimize=True)
+        rgb_buffer = io.BytesIO()
+        rgb.save(rgb_buffer, format='PNG', optimize=True)
+        assert read_ihdr(buffer.getvalue()) == (4, 3), "Expected 4-bit palette PNG"
+        print(f"✅ {engine}: {len(buffer.getvalue()):,} bytes indexed vs {len(rgb_buffer.getvalue()):,} bytes RGB")
+
+def test_indexed_streaming():
+    """Streamed indexed PNG must decode to the same pixels as the streamed RGB PNG"""
+    
+    print("\n🧪 TESTING INDEXED STREAMING PNG")
+    print("=" * 50)
+    
+    for width, height, band_height in [(3000, 2000, 400), (1235, 987, None)]:
+        outputs = {}
+        for color_mode in ['rgb', 'indexed']:
+            outputs[color_mode] = b''.join(iter_streaming_pixel_map_png(
+                width, height, 200, 100, show_circle=True, show_cross=True, surface_name='Indexed',
+                band_height=band_height, color_mode=color_mode
+            ))
+    
+        assert read_ihdr(outputs['indexed']) == (4, 3), "Expected 4-bit palette PNG"
+        rgb = Image.open(io.BytesIO(outputs['rgb']))
+        indexed = Image.open(io.BytesIO(outputs['indexed']))
+        assert indexed.convert('RGB').tobytes() == rgb.convert('RGB').tobytes(), f"Pixel mismatch for {width}×{height}"
+        print(f"✅ {width}×{height}px: {len(outputs['indexed']):,} bytes indexed vs {len(outputs['rgb']):,} bytes RGB")
+    
+    # The surface name still renders within the fixed palette
+    indexed = Image.open(io.BytesIO(b''.join(iter_streaming_pixel_map_png(
+        2000, 1000, 200, 100, show_name=True, surface_name='Indexed', color_mode='indexed'
+    ))))
+    assert len(indexed.getpalette()) // 3 <= 16 and indexed.getcolors(16) is not None
+    print("✅ Surface name stays within the 16-color palette")
+
+def test_indexed_fallback_fill():
+    """The gray fill drawn when chunk rendering fails must resolve to the fixed palette, not a new entry"""
+    
+    print("\n🧪 TESTING INDEXED FALLBACK FILL")
+    print("=" * 50)
+    
+    def broken_stamp(*args, **kwargs):
+        raise RuntimeError("tile stamping failed")
+    
+    original_stamp = app_module.stamp_panel_tiles
+    app_module.stamp_panel_tiles = broken_stamp
+    try:
+        for led_name in ['Absen', 'Novastar', 'Colorlight']:
+            palette = build_pixel_map_palette(led_name, border_factor=0.3)
+            band = render_pixel_map_band(1000, 400, 0, 400, 200, 100, led_name=led_name, color_mode='indexed')
+            assert len(band.getpalette()) // 3 == len(palette), f"Palette grew for {led_name}"
+            assert band.getcolors() == [(1000 * 400, palette.index((128, 128, 128)))]
+    finally:
+        app_module.stamp_panel_tiles = original_stamp
+    print("✅ Fallback gray is a fixed palette entry for every LED type")
+
+def test_indexed_endpoint():
+    """colorMode 'indexed' is honored by /generate-pixel-map and bad values are rejected"""
+    
+    print("\n🧪 TESTING colorMode REQUEST FIELD")
+    print("=" * 50)
+    
+    client = app.test_client()
+    surface = {'panelsWidth': 4, 'fullPanelsHeight': 3, 'panelPixelWidth': 100, 'panelPixelHeight': 100, 'ledName': 'Absen'}
+    response = client.post('/generate-pixel-map', json={'surface': surface, 'config': {'colorMode': 'indexed'}})
+    data = response.get_json()
+    assert data['success'] and data['color_mode'] == 'indexed'
+    png_bytes = base64.b64decode(data['image_base64'])
+    assert read_ihdr(png_bytes)[1] == 3, "Expected palette PNG from endpoint"
+    
+    response = client.post('/generate-pixel-map', json={'surface': surface, 'config': {'colorMode': 'cmyk'}})
+    assert response.status_code == 400
+    print("✅ Endpoint returns palette PNG and rejects unknown modes")
+
+if __name__ == "__main__":
+    try:
+        test_indexed_full_quality()
+        test_indexed_streaming()
+        test_indexed_fallback_fill()
+        test_indexed_endpoint()
+        print("\n🎉 INDEXED COLOR MODE TEST PASSED!")
+    except AssertionError as e:
+        print(f"\n❌ INDEXED COLOR MODE TEST FAILED: {e}")
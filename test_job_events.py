@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Test render progress hooks and the Server-Sent Events job stream
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import app, generate_full_quality_pixel_map, generate_chunked_pixel_map, iter_streaming_pixel_map_png
+import json
+import pytest
+
+def read_events(response):
+    """[(event, data)] from a text/event-stream body"""
+    events = []
+    for block in response.get_data(as_text=True).split('\n\n'):
+        fields = dict(line.split(': ', 1) for line in block.splitlines() if line and not line.startswith(':'))
+        if 'event' in fields:
+            events.append((fields['event'], json.loads(fields['data'])))
+    return events
+
+def test_progress_hooks():
+    """Every renderer reports its stages through the progress callback"""
+
+    print("🧪 TESTING RENDER PROGRESS HOOKS")
+    print("=" * 50)
+
+    calls = []
+    record = lambda stage, done, total, bytes_written: calls.append((stage, done, total, bytes_written))
+
+    generate_full_quality_pixel_map(1000, 600, 200, 200, show_cross=True, progress=record)
+    assert [call[0] for call in calls] == ['fill', 'borders', 'fill'] + ['labels'] * 3 + ['overlays']
+    assert calls[3][1:3] == (0, 3) and calls[5][1:3] == (2, 3)
+
+    calls.clear()
+    generate_chunked_pixel_map(9000, 5000, 1, 200, 200, 'RGB', progress=record)
+    fill_calls = [call for call in calls if call[0] == 'fill']
+    assert [call[1] for call in fill_calls] == list(range(0, 7)) and fill_calls[-1][2] == 6
+    assert calls[-1][0] == 'overlays'
+
+    calls.clear()
+    png_bytes = b''.join(iter_streaming_pixel_map_png(3000, 2000, 200, 100, band_height=400, workers=1, progress=record))
+    assert [call[:3] for call in calls] == [('encode', band, 5) for band in range(0, 6)]
+    assert [call[3] for call in calls] == sorted(call[3] for call in calls) and calls[-1][3] < len(png_bytes)
+    
+    # Long streams (the log line every 10 bands must not clobber the callback)
+    calls.clear()
+    for progress in [record, None]:
+        b''.join(iter_streaming_pixel_map_png(2000, 2500, 200, 100, band_height=100, workers=1, progress=progress))
+    assert len(calls) == 26 and calls[-1][1:3] == (25, 25)
+    print(f"✅ Stages reported: fill, borders, labels, overlays, chunked fill and {len(calls)} encode bands")
+
+def test_job_event_stream():
+    """GET /jobs/{id}/events sends progress events and ends with done (or failed)"""
+
+    print("\n🧪 TESTING JOB EVENT STREAM")
+    print("=" * 50)
+
+    client = app.test_client()
+    surface = {'panelsWidth': 36, 'fullPanelsHeight': 36, 'panelPixelWidth': 200, 'panelPixelHeight': 200, 'ledName': 'Absen'}
+    job_id = client.post('/jobs', json={'surface': surface}).get_json()['job_id']
+    response = client.get(f'/jobs/{job_id}/events')
+    assert response.mimetype == 'text/event-stream'
+    events = read_events(response)
+
+    assert events[-1][0] == 'done' and events[-1][1]['result_url'] == f'/jobs/{job_id}/result'
+    assert all(event == 'progress' for event, data in events[:-1])
+    bytes_written = [data['progress']['bytes_written'] for event, data in events]
+    assert bytes_written == sorted(bytes_written) and bytes_written[-1] == events[-1][1]['result']['file_size_bytes']
+    print(f"✅ {len(events)} events: {[data['progress']['stage'] for event, data in events]}")
+
+    job_id = client.post('/jobs', json={'surface': surface, 'config': {'format': 'tiff'}}).get_json()['job_id']
+    events = read_events(client.get(f'/jobs/{job_id}/events'))
+    assert events[-1][0] == 'failed' and 'format' in events[-1][1]['error']
+    assert client.get('/jobs/0123456789abcdef0123456789abcdef/events').status_code == 404
+    print("✅ Failed jobs end the stream with a failed event")
+
+if __name__ == "__main__":
+    # Run through pytest so the conftest fixtures isolate the module-level caches
+    if pytest.main([__file__, '-q', '-s']) == 0:
+        print("\n🎉 JOB EVENTS TEST PASSED!")
+    else:
+        print("\n❌ JOB EVENTS TEST FAILED")
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Test the Prometheus-format /metrics endpoint
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import app as app_module
+from app import app
+import pytest
+import re
+
+SAMPLE_LINE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(\{(?:[a-zA-Z_][a-zA-Z0-9_]*="(?:[^"\\]|\\.)*",?)*\})? (-?[0-9.e+-]+|\+Inf|NaN)$')
+SURFACE = {'panelsWidth': 5, 'fullPanelsHeight': 4, 'panelPixelWidth': 200, 'panelPixelHeight': 200, 'ledName': 'Metrics'}
+
+def scrape(client):
+    """{(name, frozenset of label pairs): value} from /metrics, checking the exposition format on the way"""
+    response = client.get('/metrics')
+    assert response.status_code == 200 and response.mimetype == 'text/plain'
+    samples, types = {}, {}
+    for line in response.get_data(as_text=True).splitlines():
+        if line.startswith('# TYPE '):
+            name, metric_type = line.split()[2:4]
+            assert name not in types, f"Duplicate TYPE for {name}"
+            types[name] = metric_type
+            continue
+        if line.startswith('#'):
+            continue
+        match = SAMPLE_LINE.match(line)
+        assert match, f"Malformed sample line: {line!r}"
+        labels = frozenset(re.findall(r'([a-zA-Z_][a-zA-Z0-9_]*)="((?:[^"\\]|\\.)*)"', match.group(2) or ''))
+        samples[(match.group(1), labels)] = float(match.group(3))
+    return samples, types
+
+def value(samples, name, **labels):
+    return samples.get((name, frozenset(labels.items())), 0.0)
+
+def test_metrics_format():
+    """Every series is well formed and histograms are cumulative"""
+
+    print("🧪 TESTING /metrics FORMAT")
+    print("=" * 50)
+
+    client = app.test_client()
+    client.post('/generate-pixel-map?format=binary', json={'surface': SURFACE, 'config': {'showCross': True}})
+    samples, types = scrape(client)
+    assert types['pixelmap_render_stage_seconds'] == 'histogram' and types['pixelmap_scheduler_queue_depth'] == 'gauge'
+    for (name, labels), count in samples.items():
+        if name.endswith('_count') and types.get(name[:-6]) == 'histogram':
+            base, series = name[:-6], dict(labels)
+            buckets = sorted(
+                (float('inf') if dict(bucket_labels)['le'] == '+Inf' else float(dict(bucket_labels)['le']), bucket_value)
+                for (bucket_name, bucket_labels), bucket_value in samples.items()
+                if bucket_name == base + '_bucket' and {k: v for k, v in bucket_labels if k != 'le'} == series
+            )
+            counts = [bucket_value for _, bucket_value in buckets]
+            assert counts == sorted(counts), f"{base} buckets are not cumulative"
+            assert counts[-1] == count, f"{base} +Inf bucket differs from _count"
+    print(f"✅ {len(samples)} samples across {len(types)} metrics parse cleanly")
+
+def test_render_metrics():
+    """Renders, cache hits, queue state and in-flight pixels are counted"""
+
+    print("\n🧪 TESTING RENDER METRICS")
+    print("=" * 50)
+
+    client = app.test_client()
+    before, _ = scrape(client)
+    response = client.post('/generate-pixel-map?format=binary', json={'surface': SURFACE})
+    assert response.status_code == 200
+    after, _ = scrape(client)
+
+    assert value(after, 'pixelmap_renders_total', engine='legacy', color_mode='rgb') == \
+        value(before, 'pixelmap_renders_total', engine='legacy', color_mode='rgb') + 1
+    for stage in ['layout', 'fill', 'encode', 'serialize', 'total']:
+        assert value(after, 'pixelmap_render_stage_seconds_count', engine='legacy', stage=stage) == \
+            value(before, 'pixelmap_render_stage_seconds_count', engine='legacy', stage=stage) + 1
+    assert value(after, 'pixelmap_render_output_bytes_sum', engine='legacy') - \
+        value(before, 'pixelmap_render_output_bytes_sum', engine='legacy') == len(response.data)
+    assert value(after, 'pixelmap_render_peak_rss_bytes_count', engine='legacy') >= 1
+    assert value(after, 'pixelmap_http_requests_total', endpoint='generate_pixel_map', status='200') == \
+        value(before, 'pixelmap_http_requests_total', endpoint='generate_pixel_map', status='200') + 1
+    assert value(after, 'process_resident_memory_bytes') > 0
+    print(f"✅ Render counted: {len(response.data):,} output bytes")
+
+    client.post('/generate-pixel-map?format=binary', json={'surface': SURFACE})
+    cached, _ = scrape(client)
+    assert value(cached, 'pixelmap_render_cache_responses_total', tier='memory') == \
+        value(after, 'pixelmap_render_cache_responses_total', tier='memory') + 1
+    assert value(cached, 'pixelmap_renders_total', engine='legacy', color_mode='rgb') == \
+        value(after, 'pixelmap_renders_total', engine='legacy', color_mode='rgb')
+    assert value(cached, 'pixelmap_cache_hits_total', cache='results_memory') >= 1
+    assert 0 < value(cached, 'pixelmap_cache_hit_ratio', cache='results_memory') <= 1
+    print("✅ Cache hits counted without a render")
+
+    scheduler = app_module.render_scheduler
+    reservation = scheduler.acquire(64, pixels=7200 * 7200)
+    busy, _ = scrape(client)
+    assert value(busy, 'pixelmap_scheduler_running') == 1
+    assert value(busy, 'pixelmap_pixels_in_flight') == 7200 * 7200
+    assert value(busy, 'pixelmap_scheduler_reserved_memory_bytes') == 64 * 1024 * 1024
+    reservation.release()
+    idle, _ = scrape(client)
+    assert value(idle, 'pixelmap_pixels_in_flight') == 0 and value(idle, 'pixelmap_scheduler_queue_depth') == 0
+    print("✅ Scheduler gauges follow running renders")
+
+if __name__ == "__main__":
+    # Run through pytest so the conftest fixtures isolate the module-level caches
+    if pytest.main([__file__, '-q', '-s']) == 0:
+        print("\n🎉 METRICS TEST PASSED!")
+    else:
+        print("\n❌ METRICS TEST FAILED")
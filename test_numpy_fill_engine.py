@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Test the NumPy and tile-template fill engines against the PIL drawing engine (must be byte-identical)
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import generate_full_quality_pixel_map, NUMPY_AVAILABLE
+import time
+
+def test_numpy_fill_engine():
+    """Compare NumPy and PIL engines pixel for pixel"""
+    
+    print("🧪 TESTING NUMPY FILL ENGINE")
+    print("=" * 50)
+    
+    if not NUMPY_AVAILABLE:
+        print("⚠️ NumPy not installed - nothing to compare")
+        return
+    
+    # (width, height, panel width, panel height) - includes odd and tiny panels
+    cases = [
+        (2000, 1000, 200, 200),
+        (601, 403, 50, 40),
+        (12, 9, 2, 3),
+        (10, 10, 1, 1),
+    ]
+    
+    for width, height, panel_width, panel_height in cases:
+        for led_name in ['Absen', 'Novastar', 'Colorlight', 'Linsn', 'Unknown LED']:
+            for show_grid in [True, False]:
+                images = {}
+                for engine in ['pil', 'tiles', 'numpy']:
+                    images[engine] = generate_full_quality_pixel_map(
+                        width, height, panel_width, panel_height,
+                        show_grid=show_grid, show_panel_numbers=True, led_name=led_name,
+                        show_name=True, show_cross=True, show_circle=True,
+                        surface_name='Main Stage', engine=engine
+                    )
+                
+                for engine in ['tiles', 'numpy']:
+                    assert images['pil'].tobytes() == images[engine].tobytes(), \
+                        f"{engine} mismatch for {width}×{height} panels {panel_width}×{panel_height} {led_name} grid={show_grid}"
+        
+        print(f"✅ {width}×{height}px with {panel_width}×{panel_height}px panels: byte-identical")
+    
+    # Quick speed comparison on a wall with many small panels
+    for engine in ['pil', 'tiles', 'numpy']:
+        start_time = time.time()
+        generate_full_quality_pixel_map(8000, 2400, 16, 16, show_panel_numbers=False, engine=engine)
+        print(f"⏱️ {engine}: {time.time() - start_time:.2f}s for 75,000 panels")
+
+if __name__ == "__main__":
+    try:
+        test_numpy_fill_engine()
+        print("\n🎉 NUMPY FILL ENGINE TEST PASSED!")
+    except AssertionError as e:
+        print(f"\n❌ NUMPY FILL ENGINE TEST FAILED: {e}")
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Test the analytic scaled preview renderer
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import app, generate_pixel_map_optimized, generate_color, brighten_color
+from PIL import Image
+import base64
+import io
+import time
+
+def test_preview_layout():
+    """Previews keep the checkerboard, collapse borders to 1px and drop them for tiny panels"""
+    
+    print("🧪 TESTING PREVIEW LAYOUT")
+    print("=" * 50)
+    
+    red, grey = generate_color(0, 0, 'Absen'), generate_color(1, 0, 'Absen')
+    
+    # 200px panels at 1/10 scale: 20px panels with 1px borders
+    image = generate_pixel_map_optimized(4000, 2000, 1, 200, 200, 0.1, {'ledName': 'Absen', 'showPanelNumbers': False})
+    assert image.size == (400, 200)
+    assert image.getpixel((10, 10)) == red and image.getpixel((30, 10)) == grey
+    assert image.getpixel((0, 10)) == brighten_color(red, 0.4) and image.getpixel((19, 10)) == brighten_color(red, 0.4)
+    assert image.getpixel((1, 10)) == red, "Borders must collapse to a single preview pixel"
+    print("✅ 1/10 scale: checkerboard with 1px borders")
+    
+    # 3px panels: borders dropped, checkerboard kept
+    image = generate_pixel_map_optimized(4000, 2000, 1, 200, 200, 0.015, {'ledName': 'Absen'})
+    colors = {color for _, color in image.getcolors()}
+    assert colors == {red, grey}, f"Expected plain checkerboard, got {colors}"
+    print("✅ 3px panels: borders and labels dropped")
+    
+    # Sub-pixel panels blend into one color
+    image = generate_pixel_map_optimized(40000, 20000, 1, 20, 20, 0.02, {'ledName': 'Absen'})
+    assert len(image.getcolors()) == 1
+    print("✅ Sub-pixel panels blend into their average color")
+
+def test_preview_request():
+    """preview {maxWidth, maxHeight} returns a thumbnail of a 200M-pixel wall in well under a second"""
+    
+    print("\n🧪 TESTING preview REQUEST FIELD")
+    print("=" * 50)
+    
+    client = app.test_client()
+    surface = {'panelsWidth': 100, 'fullPanelsHeight': 50, 'panelPixelWidth': 200, 'panelPixelHeight': 200, 'ledName': 'Absen'}
+    config = {'showName': True, 'showCircle': True, 'showCross': True}
+    
+    start_time = time.time()
+    response = client.post('/generate-pixel-map', json={'surface': surface, 'config': config,
+                                                         'preview': {'maxWidth': 1600, 'maxHeight': 1600}})
+    duration = time.time() - start_time
+    data = response.get_json()
+    assert data['success'] and data['dimensions'] == {'width': 1600, 'height': 800}
+    assert data['preview']['scale'] == 0.08
+    image = Image.open(io.BytesIO(base64.b64decode(data['image_base64'])))
+    assert image.size == (1600, 800)
+    assert duration < 1.0, f"Preview took {duration:.2f}s"
+    print(f"✅ 20000×10000px wall previewed at 1600×800px in {duration:.3f}s")
+    
+    response = client.post('/generate-pixel-map', json={'surface': surface, 'config': dict(config, colorMode='indexed'),
+                                                         'preview': {'maxWidth': 800}})
+    image = Image.open(io.BytesIO(base64.b64decode(response.get_json()['image_base64'])))
+    assert image.mode == 'P' and image.size == (800, 400)
+    
+    for bad_preview in [{'maxWidth': 0}, {'maxWidth': 'wide'}, 'small']:
+        response = client.post('/generate-pixel-map', json={'surface': surface, 'config': config, 'preview': bad_preview})
+        assert response.status_code == 400, f"Expected 400 for {bad_preview}"
+    response = client.post('/generate-pixel-map', json={'surface': surface, 'config': config, 'preview': {'maxWidth': 800},
+                                                         'region': {'x': 0, 'y': 0, 'width': 100, 'height': 100}})
+    assert response.status_code == 400
+    print("✅ Indexed previews and validation")
+
+if __name__ == "__main__":
+    try:
+        test_preview_layout()
+        test_preview_request()
+        print("\n🎉 PREVIEW RENDER TEST PASSED!")
+    except AssertionError as e:
+        print(f"\n❌ PREVIEW RENDER TEST FAILED: {e}")
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Test region (viewport) rendering against crops of the full map
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import app as app_module
+from app import app, pixel_map_spec, render_map_region, iter_map_region_png, parse_map_region, generate_full_quality_pixel_map
+from PIL import Image
+import base64
+import io
+import time
+
+SURFACE = {'panelsWidth': 20, 'fullPanelsHeight': 12, 'panelPixelWidth': 160, 'panelPixelHeight': 120, 'ledName': 'Absen'}
+CONFIG = {'showName': True, 'showCross': True, 'showCircle': True, 'surfaceName': 'Region Test'}
+
+def test_region_matches_full_map():
+    """Any rectangle must equal the same crop of the full render, overlays and labels included"""
+    
+    print("🧪 TESTING REGION RENDER")
+    print("=" * 50)
+    
+    spec = pixel_map_spec(SURFACE, CONFIG)
+    full = generate_full_quality_pixel_map(spec['width'], spec['height'], 160, 120, True, True, 'Absen',
+                                           True, True, True, False, 'Region Test')
+    regions = [(0, 0, 3200, 1440), (1, 1, 333, 277), (1500, 600, 900, 500), (3100, 1400, 100, 40)]
+    for x, y, width, height in regions:
+        start_time = time.time()
+        region = render_map_region(spec, x, y, width, height)
+        duration = time.time() - start_time
+        assert region.tobytes() == full.crop((x, y, x + width, y + height)).tobytes(), f"Region {x},{y} {width}×{height} differs"
+        print(f"✅ {width}×{height}px at ({x},{y}) in {duration * 1000:.1f}ms")
+
+def test_streamed_region():
+    """Large regions are rendered band by band; the bands must join into the same image"""
+    
+    print("\n🧪 TESTING STREAMED REGION")
+    print("=" * 50)
+    
+    spec = pixel_map_spec(SURFACE, CONFIG)
+    original_band_bytes = app_module.STREAMING_BAND_BYTES
+    app_module.STREAMING_BAND_BYTES = 1000 * 3 * 97  # 97-row bands, not aligned to panels
+    try:
+        png_bytes = b''.join(iter_map_region_png(spec, 250, 130, 1000, 900))
+    finally:
+        app_module.STREAMING_BAND_BYTES = original_band_bytes
+    streamed = Image.open(io.BytesIO(png_bytes))
+    assert streamed.tobytes() == render_map_region(spec, 250, 130, 1000, 900).tobytes(), "Banded region differs"
+    print(f"✅ 1000×900px region streamed in 97-row bands ({len(png_bytes):,} bytes)")
+
+def test_region_request():
+    """/generate-pixel-map accepts region, clips it to the map and rejects bad input"""
+    
+    print("\n🧪 TESTING region REQUEST FIELD")
+    print("=" * 50)
+    
+    assert parse_map_region({'x': -50, 'y': 100, 'width': 200, 'height': 5000}, 3200, 1440) == (0, 100, 150, 1340)
+    
+    client = app.test_client()
+    response = client.post('/generate-pixel-map', json={
+        'surface': SURFACE, 'config': CONFIG, 'region': {'x': 640, 'y': 360, 'width': 800, 'height': 600}
+    })
+    data = response.get_json()
+    assert data['success'] and data['dimensions'] == {'width': 800, 'height': 600}
+    image = Image.open(io.BytesIO(base64.b64decode(data['image_base64'])))
+    assert image.size == (800, 600)
+    
+    response = client.post('/generate-pixel-map', json={
+        'surface': SURFACE, 'config': dict(CONFIG, colorMode='indexed'), 'region': {'x': 0, 'y': 0, 'width': 400, 'height': 300}
+    })
+    image = Image.open(io.BytesIO(base64.b64decode(response.get_json()['image_base64'])))
+    assert image.mode == 'P', "Indexed region should be a palette PNG"
+    
+    for bad_region in [{'x': 5000, 'y': 0, 'width': 10, 'height': 10}, {'x': 0, 'y': 0, 'width': 0, 'height': 10}, {'x': 0}, 'all']:
+        response = client.post('/generate-pixel-map', json={'surface': SURFACE, 'config': CONFIG, 'region': bad_region})
+        assert response.status_code == 400, f"Expected 400 for {bad_region}"
+    
+    body = {'surface': SURFACE, 'config': dict(CONFIG, format='svg'), 'region': {'x': 10, 'y': 20, 'width': 300, 'height': 200}}
+    data = client.post('/generate-pixel-map', json=body).get_json()
+    assert b'viewBox="10 20 300 200"' in base64.b64decode(data['image_base64'])
+    assert data['dimensions'] == {'width': 300, 'height': 200}, data['dimensions']
+    response = client.post('/generate-pixel-map?format=binary', json=body)
+    assert (response.headers['X-Image-Width'], response.headers['X-Image-Height']) == ('300', '200')
+    print("✅ Region requests render, clip and validate")
+
+if __name__ == "__main__":
+    try:
+        test_region_matches_full_map()
+        test_streamed_region()
+        test_region_request()
+        print("\n🎉 REGION RENDER TEST PASSED!")
+    except AssertionError as e:
+        print(f"\n❌ REGION RENDER TEST FAILED: {e}")
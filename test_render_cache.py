@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Test the content-addressed render cache behind /generate-pixel-map
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import app as app_module
+from app import app, RenderDiskCache, pixel_map_spec, render_cache_key
+import pytest
+
+SURFACE = {'panelsWidth': 4, 'fullPanelsHeight': 3, 'panelPixelWidth': 100, 'panelPixelHeight': 100, 'ledName': 'Absen'}
+
+def test_cache_key():
+    """The key depends on what is rendered, not on how the request was written"""
+
+    print("🧪 TESTING RENDER CACHE KEY")
+    print("=" * 50)
+
+    options = {'format': 'png', 'color_mode': 'rgb', 'region': None, 'preview_scale': 1.0}
+    key = render_cache_key(pixel_map_spec(SURFACE, {'showGrid': True, 'showCross': False}), options)
+    reordered = dict(reversed(list(SURFACE.items())))
+    assert render_cache_key(pixel_map_spec(reordered, {}), dict(reversed(list(options.items())))) == key
+    assert render_cache_key(pixel_map_spec(SURFACE, {'showCross': True}), options) != key
+    assert render_cache_key(pixel_map_spec(dict(SURFACE, ledName='Novastar'), {}), options) != key
+    assert render_cache_key(pixel_map_spec(SURFACE, {}), dict(options, color_mode='indexed')) != key
+    print("✅ Canonical keys: field order ignored, every render option counted")
+
+def test_endpoint_cache_hits(render_caches):
+    """Repeat requests are served from disk with the same bytes and JSON shape"""
+
+    print("\n🧪 TESTING RENDER CACHE HITS")
+    print("=" * 50)
+
+    render_caches(memory_bytes=0, disk_bytes=64 * 1024 * 1024)  # Memory tier off: hits must come from disk
+    client = app.test_client()
+    big_surface = dict(SURFACE, panelsWidth=36, fullPanelsHeight=36, panelPixelWidth=200, panelPixelHeight=200)
+    for body in [{'surface': SURFACE}, {'surface': SURFACE, 'config': {'colorMode': 'indexed', 'showCircle': True}},
+                 {'surface': SURFACE, 'config': {'format': 'svg'}}, {'surface': big_surface}]:
+        first = client.post('/generate-pixel-map?format=binary', json=body)
+        first_data = first.data
+        second = client.post('/generate-pixel-map?format=binary', json=body)
+        assert first.headers['X-Render-Cache'] == 'miss' and second.headers['X-Render-Cache'] == 'hit'
+        assert second.data == first_data and second.mimetype == first.mimetype
+        assert int(second.headers['Content-Length']) == len(first_data)
+        assert second.headers['X-LED-Info'] == first.headers['X-LED-Info']
+        second.close()
+
+        json_hit = client.post('/generate-pixel-map', json=body)
+        assert json_hit.headers['X-Render-Cache'] == 'hit'
+        print(f"✅ {body.get('config', {}) or body['surface']['panelsWidth']}: {len(first_data):,} bytes served from cache")
+
+    # JSON misses store the legacy shape (data URL included) and hits return it unchanged
+    body = {'surface': dict(SURFACE, panelsWidth=5), 'config': {'surfaceName': 'Cached'}}
+    miss = client.post('/generate-pixel-map', json=body).get_json()
+    hit = client.post('/generate-pixel-map', json=body).get_json()
+    assert hit.pop('timings') and miss.pop('timings')  # Per-request stage timings differ
+    assert hit == miss and hit['imageData'].startswith('data:image/png;base64,')
+    stats = app_module.render_cache.stats()
+    assert stats['entries'] == 5 and stats['hits'] == 9
+    print(f"✅ Legacy JSON shape preserved; stats: {stats}")
+
+def test_cache_key_follows_render_path_defaults():
+    """A missing showGrid means no grid on the standard path: it must not share a key with showGrid true"""
+
+    print("\n🧪 TESTING CACHE KEY FOR PATH DEFAULTS")
+    print("=" * 50)
+
+    client = app.test_client()
+    missing = client.post('/generate-pixel-map?format=binary', json={'surface': SURFACE})
+    gridded = client.post('/generate-pixel-map?format=binary', json={'surface': SURFACE, 'config': {'showGrid': True}})
+    assert gridded.headers['X-Render-Cache'] == 'miss' and gridded.data != missing.data
+    explicit = client.post('/generate-pixel-map?format=binary', json={'surface': SURFACE, 'config': {'showGrid': False}})
+    assert explicit.headers['X-Render-Cache'] == 'hit' and explicit.data == missing.data
+    print("✅ showGrid missing and false share a key; showGrid true renders its grid")
+
+def test_lru_eviction(tmp_path):
+    """Least recently used files are evicted once the size bound is passed; the index persists"""
+
+    print("\n🧪 TESTING RENDER CACHE EVICTION")
+    print("=" * 50)
+
+    directory = str(tmp_path)
+    cache = RenderDiskCache(directory, 3000)
+    for key in ['a' * 64, 'b' * 64, 'c' * 64]:
+        assert cache.put(key, b'x' * 1000, 'image/png', {'payload': {}, 'data_url': False})
+    assert cache.get('a' * 64) is not None  # 'b' is now least recently used
+    assert cache.put('d' * 64, b'y' * 1000, 'image/png', {'payload': {}, 'data_url': False})
+    assert cache.get('b' * 64) is None and cache.evictions == 1
+    assert not os.path.exists(cache.entry_path('b' * 64, 'image/png'))
+    assert not cache.put('e' * 64, b'z' * 4000, 'image/png', {})  # Bigger than the whole cache
+
+    reopened = RenderDiskCache(directory, 3000)
+    assert reopened.stats()['entries'] == 3 and reopened.stats()['bytes'] == 3000
+    assert open(reopened.get('d' * 64)['path'], 'rb').read() == b'y' * 1000
+    assert RenderDiskCache(directory, 0).get('d' * 64) is None  # Disabled cache
+    print("✅ LRU eviction by size, persistent SQLite index")
+
+if __name__ == "__main__":
+    # Run through pytest so the conftest fixtures isolate the module-level caches
+    if pytest.main([__file__, '-q', '-s']) == 0:
+        print("\n🎉 RENDER CACHE TEST PASSED!")
+    else:
+        print("\n❌ RENDER CACHE TEST FAILED")
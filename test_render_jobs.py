@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Test the asynchronous render job API (/jobs)
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import app as app_module
+from app import app
+from PIL import Image
+import io
+import pytest
+import time
+
+SURFACE = {'panelsWidth': 4, 'fullPanelsHeight': 3, 'panelPixelWidth': 100, 'panelPixelHeight': 100, 'ledName': 'Absen'}
+
+def wait_for_job(client, job_id, timeout=120):
+    """Poll the status route until the job leaves the queue/running states"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        status = client.get(f'/jobs/{job_id}').get_json()
+        if status['state'] in ('done', 'failed'):
+            return status
+        time.sleep(0.05)
+    raise AssertionError(f"Job {job_id} did not finish in {timeout}s")
+
+def test_job_result_matches_sync_render():
+    """A job returns the same bytes and headers as a binary /generate-pixel-map call"""
+
+    print("🧪 TESTING RENDER JOB RESULT")
+    print("=" * 50)
+
+    client = app.test_client()
+    for body in [{'surface': SURFACE}, {'surface': SURFACE, 'config': {'colorMode': 'indexed', 'showCross': True}},
+                 {'surface': SURFACE, 'config': {'format': 'svg'}}]:
+        response = client.post('/jobs', json=body)
+        assert response.status_code == 202
+        created = response.get_json()
+        assert created['state'] == 'queued' and response.headers['Location'] == f"/jobs/{created['job_id']}"
+
+        status = wait_for_job(client, created['job_id'])
+        assert status['state'] == 'done', status
+        assert status['progress']['stage_percent'] == 100.0 and status['expires_at'] is not None
+
+        result = client.get(status['result_url'])
+        expected = client.post('/generate-pixel-map?format=binary', json=body)
+        assert result.status_code == 200 and result.mimetype == expected.mimetype
+        assert result.data == expected.data, "Job result differs from the synchronous render"
+        assert result.headers['X-LED-Info'] == expected.headers['X-LED-Info']
+        result.close()
+        print(f"✅ {body.get('config', {}) or 'default'}: {len(result.data):,} bytes ({result.mimetype})")
+
+def test_job_progress_and_errors():
+    """Streamed renders report band progress; bad jobs fail or are rejected"""
+
+    print("\n🧪 TESTING RENDER JOB PROGRESS AND ERRORS")
+    print("=" * 50)
+
+    client = app.test_client()
+    surface = dict(SURFACE, panelsWidth=36, fullPanelsHeight=36, panelPixelWidth=200, panelPixelHeight=200)
+    job_id = client.post('/jobs', json={'surface': surface}).get_json()['job_id']
+    status = wait_for_job(client, job_id)
+    assert status['state'] == 'done' and status['progress']['chunks_total'] > 1
+    result = client.get(f'/jobs/{job_id}/result')
+    assert Image.open(io.BytesIO(result.data)).size == (7200, 7200)
+    result.close()
+    print(f"✅ 7200×7200px job: {status['progress']['chunks_total']} bands in {status['elapsed_seconds']}s")
+
+    job_id = client.post('/jobs', json={'surface': SURFACE, 'config': {'colorMode': 'cmyk'}}).get_json()['job_id']
+    status = wait_for_job(client, job_id)
+    assert status['state'] == 'failed' and 'colorMode' in status['error']
+    assert client.get(f'/jobs/{job_id}/result').status_code == 409
+
+    assert client.post('/jobs', json={'surface': dict(SURFACE, panelsWidth=0)}).status_code == 400
+    assert client.get('/jobs/../../etc/passwd').status_code == 404
+    assert client.get('/jobs/0123456789abcdef0123456789abcdef').status_code == 404
+    print("✅ Failed jobs report errors; bad bodies and ids are rejected")
+
+def test_job_ttl_cleanup(monkeypatch):
+    """Finished jobs and their files are removed once the TTL passes"""
+
+    print("\n🧪 TESTING RENDER JOB TTL")
+    print("=" * 50)
+
+    client = app.test_client()
+    job_id = client.post('/jobs', json={'surface': SURFACE}).get_json()['job_id']
+    wait_for_job(client, job_id)
+    assert sorted(os.listdir(app_module.JOB_DIR)) == [f'{job_id}.json', f'{job_id}.png']
+
+    monkeypatch.setattr(app_module, 'JOB_TTL_SECONDS', 0)
+    assert client.get(f'/jobs/{job_id}').status_code == 404
+    assert os.listdir(app_module.JOB_DIR) == []
+    print("✅ Expired job files removed")
+
+    # Without any job requests, the background sweep started by the first request removes them
+    job_id = client.post('/jobs', json={'surface': SURFACE}).get_json()['job_id']
+    monkeypatch.setattr(app_module, 'JOB_TTL_SECONDS', 3600)
+    wait_for_job(client, job_id)
+    monkeypatch.setattr(app_module, 'JOB_TTL_SECONDS', 0)
+    monkeypatch.setattr(app_module, 'JOB_SWEEP_INTERVAL_SECONDS', 0.05)
+    monkeypatch.setattr(app_module, '_job_sweeper_pid', None)  # Start a sweeper with the short interval
+    assert client.get('/').status_code == 200
+    deadline = time.time() + 5
+    while os.listdir(app_module.JOB_DIR) and time.time() < deadline:
+        time.sleep(0.05)
+    assert os.listdir(app_module.JOB_DIR) == [], "The sweep should remove expired jobs on its own"
+    print("✅ Expired job files swept without job requests")
+
+def test_stage_eta():
+    """The ETA covers the current stage only, so earlier stages don't inflate it"""
+
+    print("\n🧪 TESTING RENDER JOB ETA")
+    print("=" * 50)
+
+    now = time.time()
+    job = {'id': 'a' * 32, 'state': 'running', 'created_at': now - 100, 'started_at': now - 100, 'finished_at': None,
+           'stage': 'encode', 'stage_started_at': now - 2, 'chunks_done': 1, 'chunks_total': 4,
+           'bytes_written': 0, 'result': None, 'error': None}
+    status = app_module.job_status(job)
+    assert status['eta_scope'] == 'stage' and status['progress']['stage_percent'] == 25.0
+    assert 5.5 <= status['eta_seconds'] <= 7, status['eta_seconds']
+    assert status['elapsed_seconds'] >= 100
+    print(f"✅ 1/4 bands after 2s in 'encode': ETA {status['eta_seconds']}s (not 300s from the job start)")
+
+if __name__ == "__main__":
+    # Run through pytest so the conftest fixtures isolate the module-level caches
+    if pytest.main([__file__, '-q', '-s']) == 0:
+        print("\n🎉 RENDER JOB TEST PASSED!")
+    else:
+        print("\n❌ RENDER JOB TEST FAILED")
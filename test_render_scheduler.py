@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Test the shortest-job-first render scheduler (priority queue with aging over a bounded slot pool)
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import app as app_module
+from app import app, RenderScheduler
+import pytest
+import threading
+import time
+
+def queue_in_order(scheduler, jobs, gap=0.05):
+    """Queue (name, expected seconds) jobs one after another; returns the order they started in"""
+    started = []
+
+    def run(name, expected_seconds):
+        reservation = scheduler.acquire(1, expected_seconds, timeout=10)
+        started.append(name)
+        reservation.release()
+
+    threads = []
+    for name, expected_seconds in jobs:
+        thread = threading.Thread(target=run, args=(name, expected_seconds))
+        thread.start()
+        threads.append(thread)
+        time.sleep(gap)
+    return started, threads
+
+def test_shortest_job_first():
+    """Queued renders start in order of predicted seconds, not arrival"""
+
+    print("🧪 TESTING SHORTEST JOB FIRST")
+    print("=" * 50)
+
+    scheduler = RenderScheduler(1000, workers=1)
+    blocker = scheduler.acquire(1)
+    started, threads = queue_in_order(scheduler, [('bulk', 240.0), ('preview', 5.0), ('medium', 30.0)])
+    assert scheduler.stats()['waiting'] == 3 and started == []
+    blocker.release()
+    for thread in threads:
+        thread.join(5)
+    assert started == ['preview', 'medium', 'bulk'], started
+    print(f"✅ Start order: {started}")
+
+def test_aging():
+    """A render that has waited long enough goes before newer, shorter ones"""
+
+    print("\n🧪 TESTING AGING")
+    print("=" * 50)
+
+    for aging_rate, expected in [(10.0, ['bulk', 'small']), (0.0, ['small', 'bulk'])]:
+        scheduler = RenderScheduler(1000, workers=1, aging_rate=aging_rate)
+        blocker = scheduler.acquire(1)
+        # bulk waits 0.6s: with aging 10 that is worth 6 predicted seconds, more than the 4s gap
+        started, threads = queue_in_order(scheduler, [('bulk', 5.0), ('small', 1.0)], gap=0.6)
+        blocker.release()
+        for thread in threads:
+            thread.join(5)
+        assert started == expected, f"aging {aging_rate}: {started}"
+        print(f"✅ Aging rate {aging_rate}: {started}")
+
+def test_worker_slots_and_stats():
+    """No more than `workers` renders run at once, and queue waits are reported"""
+
+    print("\n🧪 TESTING WORKER SLOTS AND QUEUE STATS")
+    print("=" * 50)
+
+    scheduler = RenderScheduler(1000, workers=2)
+    first, second = scheduler.acquire(1), scheduler.acquire(1)
+    assert scheduler.acquire(1, timeout=0.1) is None, "A third render must wait for a slot"
+
+    waiter = []
+    thread = threading.Thread(target=lambda: waiter.append(scheduler.acquire(1, timeout=5)))
+    thread.start()
+    time.sleep(0.3)
+    stats = scheduler.stats()
+    assert stats['running'] == 2 and stats['waiting'] == 1 and stats['oldest_wait_seconds'] >= 0.25
+    first.release()
+    thread.join(5)
+    assert waiter[0].waited_seconds >= 0.25
+    stats = scheduler.stats()
+    assert stats['running'] == 2 and stats['waiting'] == 0 and stats['rejected'] == 1
+    assert stats['wait_seconds']['max'] >= 0.25 and stats['admitted'] == 3
+    second.release()
+    waiter[0].release()
+
+    # Slots are their own setting: the band render process pool keeps its CPU- and memory-based default
+    assert RenderScheduler(1000).workers == app_module.RENDER_SLOTS
+    assert app_module.RENDER_WORKERS == (int(os.environ.get('RENDER_WORKERS', 0)) or app_module.default_render_workers())
+    print(f"✅ Slots enforced; waits p50={stats['wait_seconds']['p50']}s max={stats['wait_seconds']['max']}s")
+
+def test_endpoint_schedules_small_maps_first(monkeypatch):
+    """A small map queued behind a large one is rendered first, and the wait is reported"""
+
+    print("\n🧪 TESTING ENDPOINT SCHEDULING")
+    print("=" * 50)
+
+    scheduler = RenderScheduler(app_module.RENDER_MEMORY_BUDGET_MB, workers=1)
+    monkeypatch.setattr(app_module, 'render_scheduler', scheduler)
+    finished = []
+
+    def post(name, surface):
+        response = app.test_client().post('/generate-pixel-map?format=binary', json={'surface': surface})
+        assert response.status_code == 200
+        finished.append((name, float(response.headers['X-Render-Queue-Wait'])))
+
+    blocker = scheduler.acquire(1)
+    large = {'panelsWidth': 30, 'fullPanelsHeight': 30, 'panelPixelWidth': 200, 'panelPixelHeight': 200, 'ledName': 'Scheduled'}
+    small = dict(large, panelsWidth=4, fullPanelsHeight=3)
+    threads = [threading.Thread(target=post, args=('large', large))]
+    threads[0].start()
+    time.sleep(0.05)  # Less aging than the gap between the two predictions
+    threads.append(threading.Thread(target=post, args=('small', small)))
+    threads[1].start()
+    time.sleep(0.2)
+    assert scheduler.stats()['waiting'] == 2
+    blocker.release()
+    for thread in threads:
+        thread.join(60)
+    assert [name for name, _ in finished] == ['small', 'large'], finished
+    assert all(wait > 0.1 for _, wait in finished)
+
+    health = app.test_client().get('/').get_json()
+    assert health['scheduler']['workers'] == 1 and health['scheduler']['admitted'] == 3
+    print(f"✅ Finish order {finished}; queue stats in the health check")
+
+if __name__ == "__main__":
+    # Run through pytest so the conftest fixtures isolate the module-level caches
+    if pytest.main([__file__, '-q', '-s']) == 0:
+        print("\n🎉 RENDER SCHEDULER TEST PASSED!")
+    else:
+        print("\n❌ RENDER SCHEDULER TEST FAILED")
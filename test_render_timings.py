@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Test the per-stage timing breakdown in /generate-pixel-map responses
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import app as app_module
+from app import app, RenderTimings
+import json
+import pytest
+import time
+
+SURFACE = {'panelsWidth': 6, 'fullPanelsHeight': 4, 'panelPixelWidth': 200, 'panelPixelHeight': 200, 'ledName': 'Timed'}
+
+def check_timings(timings, stages):
+    assert set(timings) <= set(app_module.RENDER_TIMING_STAGES) | {'total'}  # jsonify may reorder keys
+    for stage in stages:
+        assert stage in timings, f"Missing {stage} in {timings}"
+    assert all(seconds >= 0 for seconds in timings.values())
+    assert sum(seconds for stage, seconds in timings.items() if stage != 'total') <= timings['total'] + 0.001
+
+def test_render_timings_class():
+    """A stage runs until the next one is marked; repeated marks accumulate"""
+
+    print("🧪 TESTING RenderTimings")
+    print("=" * 50)
+
+    timings = RenderTimings()
+    for stage in ['fill', 'encode', 'fill']:
+        timings.mark(stage)
+        time.sleep(0.02)
+    timings.mark('fill')  # Same stage: keeps running
+    time.sleep(0.02)
+    timings.stop()
+    result = timings.as_dict()
+    assert list(result) == ['fill', 'encode', 'total']
+    assert result['fill'] >= 0.055 and 0.015 <= result['encode'] < result['fill']
+    assert result['total'] == timings.as_dict()['total'], "Stopped timings must not keep counting"
+    print(f"✅ {result}")
+
+def test_json_and_binary_timings():
+    """JSON responses carry a timings object, binary ones an X-Render-Timings header"""
+
+    print("\n🧪 TESTING RESPONSE TIMINGS")
+    print("=" * 50)
+
+    client = app.test_client()
+
+    # Legacy path: fill, borders and labels are separate passes
+    data = client.post('/generate-pixel-map', json={'surface': SURFACE, 'config': {'showGrid': True}}).get_json()
+    check_timings(data['timings'], ['layout', 'fill', 'borders', 'labels', 'encode', 'serialize'])
+    print(f"✅ Legacy JSON: {data['timings']}")
+
+    # Full-quality path (indexed maps): NumPy fill, borders, labels and overlays
+    body = {'surface': SURFACE, 'config': {'colorMode': 'indexed', 'showCross': True, 'showName': True}}
+    response = client.post('/generate-pixel-map?format=binary', json=body)
+    timings = json.loads(response.headers['X-Render-Timings'])
+    check_timings(timings, ['layout', 'fill', 'labels', 'overlays', 'encode', 'serialize'])
+    if app_module.NUMPY_AVAILABLE:
+        assert 'borders' in timings
+    print(f"✅ Indexed binary: {timings}")
+
+    # Cache hits only spend time looking up and sending the stored render
+    response = client.post('/generate-pixel-map?format=binary', json=body)
+    hit_timings = json.loads(response.headers['X-Render-Timings'])
+    assert response.headers['X-Render-Cache'] == 'hit' and response.headers['X-Render-Cache-Tier'] == 'memory'
+    assert 'fill' not in hit_timings and 'encode' not in hit_timings and 'serialize' in hit_timings
+    print(f"✅ Cache hit: {hit_timings}")
+
+    for body in [{'surface': SURFACE, 'config': {'format': 'svg'}},
+                 {'surface': SURFACE, 'preview': {'maxWidth': 300}},
+                 {'surface': SURFACE, 'region': {'x': 100, 'y': 100, 'width': 500, 'height': 300}}]:
+        timings = client.post('/generate-pixel-map', json=body).get_json()['timings']
+        check_timings(timings, ['layout', 'fill', 'encode', 'serialize'])
+    print("✅ SVG, preview and region renders report fill and encode")
+
+def test_disk_hit_timings(render_caches):
+    """Disk hits too big for the memory cache are sent straight from the file, with the same breakdown"""
+
+    print("\n🧪 TESTING DISK HIT TIMINGS")
+    print("=" * 50)
+
+    render_caches(max_item_bytes=1024)  # Every render is too big for memory: hits come from disk
+    client = app.test_client()
+    body = {'surface': SURFACE, 'config': {'showCross': True}}
+    assert client.post('/generate-pixel-map?format=binary', json=body).headers['X-Render-Cache'] == 'miss'
+    response = client.post('/generate-pixel-map?format=binary', json=body)
+    assert response.headers['X-Render-Cache-Tier'] == 'disk'
+    timings = json.loads(response.headers['X-Render-Timings'])
+    response.close()
+    check_timings(timings, ['layout', 'serialize'])
+    assert 'fill' not in timings and 'encode' not in timings
+    print(f"✅ Disk hit: {timings}")
+
+def test_streamed_timings():
+    """Streamed maps send the timings known up front; the full breakdown is recorded when the stream ends"""
+
+    print("\n🧪 TESTING STREAMED TIMINGS")
+    print("=" * 50)
+
+    client = app.test_client()
+    before = app_module.render_metrics.lines()
+    surface = dict(SURFACE, panelsWidth=36, fullPanelsHeight=36)
+    response = client.post('/generate-pixel-map?format=binary', json={'surface': surface}, buffered=False)
+    header = json.loads(response.headers['X-Render-Timings'])
+    assert 'layout' in header and 'encode' not in header
+    response.get_data()
+    response.close()
+
+    def encode_count(lines):
+        prefix = 'pixelmap_render_stage_seconds_count{engine="streaming",stage="encode"} '
+        return next((int(line[len(prefix):]) for line in lines if line.startswith(prefix)), 0)
+
+    assert encode_count(app_module.render_metrics.lines()) == encode_count(before) + 1
+    print(f"✅ Header {header}; encode stage recorded after the last chunk")
+
+if __name__ == "__main__":
+    # Run through pytest so the conftest fixtures isolate the module-level caches
+    if pytest.main([__file__, '-q', '-s']) == 0:
+        print("\n🎉 RENDER TIMINGS TEST PASSED!")
+    else:
+        print("\n❌ RENDER TIMINGS TEST FAILED")
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Test the in-memory result cache in front of the disk render cache
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import app as app_module
+from app import app, BytesLRUCache
+import pytest
+
+SURFACE = {'panelsWidth': 4, 'fullPanelsHeight': 3, 'panelPixelWidth': 100, 'panelPixelHeight': 100, 'ledName': 'Absen'}
+
+def test_memory_hits(render_caches):
+    """Repeat requests are answered from memory, with the same bytes and JSON"""
+
+    print("🧪 TESTING MEMORY RESULT CACHE")
+    print("=" * 50)
+
+    render_caches(64 * 1024 * 1024, 16 * 1024 * 1024, disk_bytes=0)  # Disk cache off: hits can only come from memory
+    client = app.test_client()
+    body = {'surface': SURFACE, 'config': {'surfaceName': 'Memory'}}
+    miss = client.post('/generate-pixel-map', json=body)
+    hit = client.post('/generate-pixel-map', json=body)
+    assert miss.headers['X-Render-Cache'] == 'miss'
+    assert hit.headers['X-Render-Cache'] == 'hit' and hit.headers['X-Render-Cache-Tier'] == 'memory'
+    hit_data, miss_data = hit.get_json(), miss.get_json()
+    assert hit_data.pop('timings') and miss_data.pop('timings')  # Per-request stage timings differ
+    assert hit_data == miss_data
+
+    binary = client.post('/generate-pixel-map?format=binary', json=body)
+    assert binary.headers['X-Render-Cache-Tier'] == 'memory' and binary.mimetype == 'image/png'
+    stats = app_module.result_cache.stats()
+    assert stats['entries'] == 1 and stats['hits'] == 2 and stats['misses'] == 1
+    assert stats['bytes'] == len(binary.data)
+    print(f"✅ Memory hits: {stats}")
+
+def test_budget_and_threshold(render_caches):
+    """Entries above the item threshold bypass memory; the byte budget evicts the oldest"""
+
+    print("\n🧪 TESTING MEMORY BUDGET")
+    print("=" * 50)
+
+    render_caches(1024 * 1024, 200 * 1024, disk_bytes=0)
+    client = app.test_client()
+    big = {'surface': SURFACE}  # ~360KB uncompressed legacy PNG
+    client.post('/generate-pixel-map', json=big)
+    response = client.post('/generate-pixel-map', json=big)
+    assert response.headers['X-Render-Cache'] == 'miss', "Oversized entry must not be cached in memory"
+
+    for panels in range(1, 6):
+        body = {'surface': SURFACE, 'config': {'colorMode': 'indexed', 'surfaceName': f'S{panels}', 'showName': True}}
+        client.post('/generate-pixel-map', json=body)
+    stats = app_module.result_cache.stats()
+    assert stats['entries'] == 5 and stats['bytes'] <= 1024 * 1024
+
+    cache = BytesLRUCache(100)
+    for key in 'abc':
+        cache.put(key, ('value', key), size=40)
+    assert cache.get('a') is None and cache.get('c') == ('value', 'c') and cache.stats()['evictions'] == 1
+    print(f"✅ Threshold bypass and size-based eviction: {stats['entries']} entries, {stats['bytes']:,} bytes")
+
+def test_disk_hits_promoted(render_caches, monkeypatch):
+    """A disk hit is copied into memory so the next one skips the disk"""
+
+    print("\n🧪 TESTING DISK TO MEMORY PROMOTION")
+    print("=" * 50)
+
+    render_caches(64 * 1024 * 1024, 16 * 1024 * 1024, disk_bytes=64 * 1024 * 1024)
+    client = app.test_client()
+    body = {'surface': SURFACE, 'config': {'format': 'svg'}}
+    first = client.post('/generate-pixel-map?format=binary', json=body).data
+    monkeypatch.setattr(app_module, 'result_cache', BytesLRUCache(64 * 1024 * 1024, 16 * 1024 * 1024))  # As after a restart
+    tiers = [client.post('/generate-pixel-map?format=binary', json=body).headers['X-Render-Cache-Tier'] for _ in range(2)]
+    assert tiers == ['disk', 'memory']
+    assert client.post('/generate-pixel-map?format=binary', json=body).data == first
+    print("✅ Disk hit promoted to memory")
+
+if __name__ == "__main__":
+    # Run through pytest so the conftest fixtures isolate the module-level caches
+    if pytest.main([__file__, '-q', '-s']) == 0:
+        print("\n🎉 RESULT CACHE TEST PASSED!")
+    else:
+        print("\n❌ RESULT CACHE TEST FAILED")
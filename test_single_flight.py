@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Test single-flight coalescing of identical concurrent renders
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import app as app_module
+from app import app, acquire_render_lease
+from concurrent.futures import ThreadPoolExecutor
+import json
+import pytest
+import subprocess
+import time
+
+# 36×36 panels of 200px = 51.8M pixels (streamed)
+BIG_SURFACE = {'panelsWidth': 36, 'fullPanelsHeight': 36, 'panelPixelWidth': 200, 'panelPixelHeight': 200, 'ledName': 'Absen'}
+
+def count_streaming_renders(monkeypatch):
+    """Wrap the streaming renderer so the test can count real renders"""
+    calls = []
+    original = app_module.iter_streaming_pixel_map_png
+    
+    def counting(*args, **kwargs):
+        calls.append(args[:2])
+        return original(*args, **kwargs)
+    
+    monkeypatch.setattr(app_module, 'iter_streaming_pixel_map_png', counting)
+    return calls
+
+def test_concurrent_requests_render_once(render_caches, monkeypatch):
+    """Identical concurrent requests (JSON and binary) share one render and get the same bytes"""
+
+    print("🧪 TESTING SINGLE-FLIGHT IN ONE PROCESS")
+    print("=" * 50)
+
+    render_caches(64 * 1024 * 1024, 16 * 1024 * 1024, disk_bytes=256 * 1024 * 1024)
+    calls = count_streaming_renders(monkeypatch)
+    for query in ['', '?format=binary']:
+        calls.clear()
+        body = {'surface': BIG_SURFACE, 'config': {'surfaceName': f'Flight{query}', 'showName': True}}
+        
+        def post(_):
+            response = app.test_client().post(f'/generate-pixel-map{query}', json=body)
+            data = response.data
+            if not query:
+                data = json.dumps(dict(json.loads(data), timings=None))  # Per-request stage timings differ
+            response.close()
+            return data, response.headers['X-Render-Cache']
+        
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            results = list(pool.map(post, range(4)))
+        assert len(calls) == 1, f"Expected one render, got {len(calls)}"
+        assert len({data for data, _ in results}) == 1, "Coalesced responses differ"
+        assert sorted(status for _, status in results) == ['hit', 'hit', 'hit', 'miss']
+        print(f"✅ {query or 'JSON'}: 4 concurrent requests, 1 render")
+
+def test_concurrent_requests_render_once_uncached(render_caches, monkeypatch, tmp_path):
+    """With caching off, waiters in this process get the render handed over instead of rendering again"""
+
+    print("\n🧪 TESTING SINGLE-FLIGHT WITH CACHING DISABLED")
+    print("=" * 50)
+
+    render_caches(memory_bytes=0, disk_bytes=0)
+    calls = count_streaming_renders(monkeypatch)
+    for query in ['', '?format=binary']:
+        calls.clear()
+        body = {'surface': BIG_SURFACE, 'config': {'surfaceName': f'Uncached{query}'}}
+        
+        def post(_):
+            response = app.test_client().post(f'/generate-pixel-map{query}', json=body)
+            data = response.data
+            if not query:
+                data = json.dumps(dict(json.loads(data), timings=None))
+            response.close()
+            return data, response.headers['X-Render-Cache']
+        
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            results = list(pool.map(post, range(4)))
+        assert len(calls) == 1, f"Expected one render, got {len(calls)}"
+        assert len({data for data, _ in results}) == 1, "Handed-over responses differ"
+        assert sorted(status for _, status in results) == ['hit', 'hit', 'hit', 'miss']
+        print(f"✅ {query or 'JSON'}: 4 concurrent requests, 1 render, nothing cached")
+    assert app_module._render_flights == {}, "Finished flights must be dropped"
+    leftovers = [name for name in os.listdir(tmp_path / 'render-cache') if name.endswith('.flight')]
+    assert leftovers == [], f"Hand-off files left behind: {leftovers}"
+
+def test_lease_across_processes(render_caches, tmp_path):
+    """The lock file makes another process wait for the render holding the lease"""
+
+    print("\n🧪 TESTING SINGLE-FLIGHT ACROSS PROCESSES")
+    print("=" * 50)
+
+    directory = str(tmp_path / 'shared-cache')
+    render_caches(disk_bytes=64 * 1024 * 1024, directory=directory)
+    key = 'f' * 64
+    holder = subprocess.Popen([sys.executable, '-c', (
+        "import sys, time, app\n"
+        f"app.render_cache = app.RenderDiskCache({directory!r}, 1)\n"
+        f"lease = app.acquire_render_lease({key!r})\n"
+        "print('locked', flush=True)\n"
+        "time.sleep(1.5)\n"
+        "lease.release()\n"
+    )], cwd=os.path.dirname(os.path.abspath(__file__)), stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    lock_path = os.path.join(directory, 'locks', f'{key}.lock')
+    try:
+        assert holder.stdout.readline().strip() == 'locked'
+        start = time.time()
+        lease = acquire_render_lease(key)
+        waited_seconds = time.time() - start
+        # The holder unlinked the file it locked: the lease must be on a file still at the path
+        assert os.path.exists(lock_path), "Lease taken on an unlinked lock file"
+        lease.release()
+        assert lease.waited and waited_seconds > 0.5, f"Lease granted after {waited_seconds:.2f}s"
+    finally:
+        holder.wait(timeout=30)
+
+    lease = acquire_render_lease(key)
+    assert not lease.waited
+    lease.release()
+    assert os.listdir(os.path.dirname(lock_path)) == [], "Lock files must be removed on release"
+    print(f"✅ Second process waited {waited_seconds:.2f}s for the lock file; lock files cleaned up")
+
+if __name__ == "__main__":
+    # Run through pytest so the conftest fixtures isolate the module-level caches
+    if pytest.main([__file__, '-q', '-s']) == 0:
+        print("\n🎉 SINGLE-FLIGHT TEST PASSED!")
+    else:
+        print("\n❌ SINGLE-FLIGHT TEST FAILED")
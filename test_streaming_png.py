@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Test the streaming band-by-band PNG encoder against the chunked in-memory renderer
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import app as app_module
+from app import iter_streaming_pixel_map_png, generate_chunked_pixel_map, StreamingPNGWriter, render_pixel_map_band
+from PIL import Image
+import io
+import struct
+import time
+import zlib
+
+def test_streaming_png():
+    """Streamed PNG must decode to exactly the chunked image"""
+    
+    print("🧪 TESTING STREAMING PNG ENCODER")
+    print("=" * 50)
+    
+    # (width, height, panel width, panel height, band height)
+    cases = [
+        (4000, 3000, 200, 200, 400),
+        (1234, 987, 100, 50, 100),
+        (2000, 2000, 500, 500, None),
+    ]
+    
+    for width, height, panel_width, panel_height, band_height in cases:
+        start_time = time.time()
+        chunks = list(iter_streaming_pixel_map_png(
+            width, height, panel_width, panel_height,
+            show_grid=True, show_panel_numbers=True, led_name='Absen',
+            show_name=True, show_cross=True, show_circle=True, surface_name='Main Stage',
+            band_height=band_height
+        ))
+        duration = time.time() - start_time
+        png_bytes = b''.join(chunks)
+        
+        assert png_bytes[:8] == b'\x89PNG\r\n\x1a\n', "Invalid PNG signature"
+        
+        streamed = Image.open(io.BytesIO(png_bytes))
+        streamed.load()
+        reference = generate_chunked_pixel_map(
+            width, height, 1, panel_width, panel_height, 'RGB',
+            True, True, 'Absen', True, True, True, False, 'Main Stage'
+        )
+        
+        assert streamed.size == (width, height), f"Size mismatch: {streamed.size}"
+        assert streamed.tobytes() == reference.tobytes(), f"Pixel mismatch for {width}×{height}"
+        print(f"✅ {width}×{height}px streamed in {len(chunks)} pieces ({len(png_bytes):,} bytes, {duration:.2f}s)")
+
+def read_idat_stream(png_bytes):
+    """Concatenate all IDAT chunk payloads of a PNG"""
+    position = 8
+    idat = b''
+    while position < len(png_bytes):
+        length = struct.unpack('>I', png_bytes[position:position + 4])[0]
+        chunk_type = png_bytes[position + 4:position + 8]
+        if chunk_type == b'IDAT':
+            idat += png_bytes[position + 8:position + 8 + length]
+        position += 12 + length
+    return idat
+
+def test_parallel_band_rendering():
+    """Bands rendered in worker processes must give the same PNG as in-process rendering"""
+    
+    print("\n🧪 TESTING PARALLEL BAND RENDERING")
+    print("=" * 50)
+    
+    width, height = 3000, 4000
+    outputs = {}
+    for workers in [1, 2]:
+        start_time = time.time()
+        outputs[workers] = b''.join(iter_streaming_pixel_map_png(
+            width, height, 200, 200, show_name=True, show_circle=True,
+            surface_name='Parallel', band_height=400, workers=workers
+        ))
+        print(f"⏱️ {workers} worker(s): {time.time() - start_time:.2f}s")
+    
+    assert outputs[1] == outputs[2], "Parallel output differs from serial output"
+    
+    # zlib.decompress verifies the combined Adler-32 of the concatenated band segments
+    raw = zlib.decompress(read_idat_stream(outputs[2]))
+    assert len(raw) == height * (width * 3 + 1), "Unexpected decompressed size"
+    print("✅ Parallel bands assemble into one valid zlib stream")
+
+def test_default_render_workers():
+    """The band pool defaults to the CPUs this process may use, capped by the memory limit"""
+    
+    print("\n🧪 TESTING DEFAULT BAND WORKERS")
+    print("=" * 50)
+    
+    assert 1 <= app_module.available_cpu_count() <= (os.cpu_count() or 1)
+    original_cpus, original_limit = app_module.available_cpu_count, app_module.RENDER_MEMORY_LIMIT_MB
+    try:
+        app_module.available_cpu_count = lambda: 16
+        app_module.RENDER_MEMORY_LIMIT_MB = 512
+        assert app_module.default_render_workers() == 2, "A 512MB instance holds two band processes"
+        app_module.RENDER_MEMORY_LIMIT_MB = 8192
+        assert app_module.default_render_workers() == 16
+        app_module.available_cpu_count = lambda: 1
+        assert app_module.default_render_workers() == 1, "One CPU renders in process, without a pool"
+    finally:
+        app_module.available_cpu_count, app_module.RENDER_MEMORY_LIMIT_MB = original_cpus, original_limit
+    print(f"✅ {app_module.available_cpu_count()} usable CPUs here → {app_module.default_render_workers()} band workers")
+
+def test_parallel_deflate():
+    """Row ranges deflated on several threads must still form one valid PNG"""
+    
+    print("\n🧪 TESTING PARALLEL DEFLATE")
+    print("=" * 50)
+    
+    width, height = 4000, 2000
+    raw = render_pixel_map_band(width, height, 0, height, 200, 200).tobytes()
+    
+    for threads in [1, 2, 4, 7]:
+        writer = StreamingPNGWriter(width, height, threads=threads)
+        png_bytes = writer.header() + writer.write_rows(raw) + writer.finish()
+        
+        decoded = Image.open(io.BytesIO(png_bytes))
+        decoded.load()
+        assert decoded.tobytes() == raw, f"Decoded pixels differ with {threads} threads"
+        assert len(zlib.decompress(read_idat_stream(png_bytes))) == height * (width * 3 + 1)
+        print(f"✅ {threads} thread(s): {len(png_bytes):,} bytes, valid zlib stream")
+
+def test_scanline_dedupe():
+    """Repeated scanlines written as Up rows must decode to the same pixels, with far fewer deflated rows"""
+    
+    print("\n🧪 TESTING SCANLINE DEDUPE")
+    print("=" * 50)
+    
+    width, height = 6000, 3000
+    outputs = {}
+    for dedupe_rows in [False, True]:
+        start_time = time.time()
+        outputs[dedupe_rows] = b''.join(iter_streaming_pixel_map_png(
+            width, height, 200, 150, show_name=True, surface_name='Dedupe',
+            band_height=600, workers=1, dedupe_rows=dedupe_rows
+        ))
+        print(f"⏱️ dedupe={dedupe_rows}: {time.time() - start_time:.2f}s, {len(outputs[dedupe_rows]):,} bytes")
+    
+    plain = Image.open(io.BytesIO(outputs[False]))
+    deduped = Image.open(io.BytesIO(outputs[True]))
+    assert deduped.tobytes() == plain.tobytes(), "Deduped PNG decodes to different pixels"
+    assert len(outputs[True]) < len(outputs[False]), "Dedupe should shrink the PNG"
+    
+    raw = zlib.decompress(read_idat_stream(outputs[True]))
+    filters = raw[::width * 3 + 1]
+    assert len(filters) == height and set(filters) == {0, 2}, "Expected None and Up filtered rows"
+    print(f"✅ {filters.count(2):,} of {height:,} rows written as Up repeats")
+    
+    # Rows that never repeat (the diagonal cross touches every row) still encode correctly
+    raw_band = render_pixel_map_band(2000, 1000, 0, 1000, 200, 100, show_cross=True).tobytes()
+    writer = StreamingPNGWriter(2000, 1000, dedupe_rows=True)
+    png_bytes = writer.header() + writer.write_rows(raw_band) + writer.finish()
+    assert Image.open(io.BytesIO(png_bytes)).tobytes() == raw_band, "Dedupe broke rows without repeats"
+    print("✅ Rows without repeats round-trip")
+
+if __name__ == "__main__":
+    try:
+        test_streaming_png()
+        test_parallel_band_rendering()
+        test_default_render_workers()
+        test_parallel_deflate()
+        test_scanline_dedupe()
+        print("\n🎉 STREAMING PNG TEST PASSED!")
+    except AssertionError as e:
+        print(f"\n❌ STREAMING PNG TEST FAILED: {e}")
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Test the native SVG output backend
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import app, generate_pixel_map_svg, generate_color, brighten_color
+import base64
+import time
+import xml.etree.ElementTree as ET
+
+SVG_NS = '{http://www.w3.org/2000/svg}'
+
+def test_svg_document():
+    """SVG must carry the checkerboard palette, borders, one symbol per glyph and the overlays"""
+    
+    print("🧪 TESTING SVG BACKEND")
+    print("=" * 50)
+    
+    svg = generate_pixel_map_svg(1234, 800, 200, 100, True, True, 'Novastar', True, True, True, False, 'Main <Stage>')
+    root = ET.fromstring(svg)
+    
+    # Whole panels only, like the raster path
+    assert root.get('width') == '1200' and root.get('height') == '800', "Unexpected SVG size"
+    
+    pattern = root.find(f'.//{SVG_NS}pattern')
+    fills = {rect.get('fill') for rect in pattern}
+    strokes = {rect.get('stroke') for rect in pattern if rect.get('stroke')}
+    for col in range(2):
+        color = generate_color(col, 0, 'Novastar')
+        assert '#%02x%02x%02x' % color in fills, f"Missing panel color {color}"
+        assert '#%02x%02x%02x' % brighten_color(color, 0.4) in strokes, f"Missing border color for {color}"
+    
+    symbol_ids = {symbol.get('id') for symbol in root.iter(f'{SVG_NS}symbol')}
+    assert {f'g{digit}' for digit in range(10)} | {'gd'} <= symbol_ids, "Missing digit glyph symbols"
+    uses = [use.get('href') for use in root.iter(f'{SVG_NS}use')]
+    assert uses.count('#r8') == 6 and uses.count('#c6') == 8, "Expected one row and one column reference per panel"
+    
+    text = root.find(f'.//{SVG_NS}text')
+    assert text is not None and text.text == 'Main <Stage>', "Surface name missing or not escaped"
+    assert root.find(f'.//{SVG_NS}circle') is not None, "Circle overlay missing"
+    assert root.find(f'.//{SVG_NS}path') is not None, "Cross overlay missing"
+    print(f"✅ 1200×800px map as {len(svg):,} bytes of SVG")
+
+def test_svg_size_scales_with_panels():
+    """A 200M-pixel wall stays a document of a few hundred KB"""
+    
+    print("\n🧪 TESTING SVG SIZE")
+    print("=" * 50)
+    
+    start_time = time.time()
+    svg = generate_pixel_map_svg(20000, 10000, 200, 200, True, True, 'Absen', True, True, True, False, 'Main Stage')
+    duration = time.time() - start_time
+    assert len(svg) < 500_000, f"SVG too large: {len(svg):,} bytes"
+    
+    no_numbers = generate_pixel_map_svg(20000, 10000, 200, 200, True, False, 'Absen')
+    assert len(no_numbers) < 5_000, f"Grid-only SVG too large: {len(no_numbers):,} bytes"
+    print(f"✅ 200M pixels: {len(svg):,} bytes in {duration:.3f}s, grid only {len(no_numbers):,} bytes")
+
+def test_svg_endpoint():
+    """format 'svg' is honored by /generate-pixel-map and unknown formats are rejected"""
+    
+    print("\n🧪 TESTING format REQUEST FIELD")
+    print("=" * 50)
+    
+    client = app.test_client()
+    surface = {'panelsWidth': 4, 'fullPanelsHeight': 3, 'panelPixelWidth': 100, 'panelPixelHeight': 100, 'ledName': 'Absen'}
+    response = client.post('/generate-pixel-map', json={'surface': surface, 'config': {'format': 'svg'}})
+    data = response.get_json()
+    assert data['success'] and data['format'] == 'svg'
+    assert base64.b64decode(data['image_base64']).startswith(b'<svg'), "Expected an SVG document"
+    
+    response = client.post('/generate-pixel-map', json={'surface': surface, 'config': {'format': 'gif'}})
+    assert response.status_code == 400
+    print("✅ Endpoint returns SVG and rejects unknown formats")
+
+if __name__ == "__main__":
+    try:
+        test_svg_document()
+        test_svg_size_scales_with_panels()
+        test_svg_endpoint()
+        print("\n🎉 SVG BACKEND TEST PASSED!")
+    except AssertionError as e:
+        print(f"\n❌ SVG BACKEND TEST FAILED: {e}")
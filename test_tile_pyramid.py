@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Test the deep-zoom tile endpoints against the full-quality renderer
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import (app, pixel_map_spec, render_map_tile, render_scaled_region, generate_full_quality_pixel_map,
+                 tile_max_zoom, BytesLRUCache, tile_cache)
+from PIL import Image
+import io
+import math
+import time
+
+SURFACE = {'panelsWidth': 12, 'fullPanelsHeight': 7, 'panelPixelWidth': 130, 'panelPixelHeight': 90, 'ledName': 'Absen'}
+CONFIG = {'showName': True, 'showCross': True, 'showCircle': True, 'surfaceName': 'Main Stage'}
+QUERY = ('panelsWidth=12&fullPanelsHeight=7&panelPixelWidth=130&panelPixelHeight=90&ledName=Absen'
+         '&showName=true&showCross=true&showCircle=true&surfaceName=Main%20Stage')
+
+def test_full_resolution_tiles():
+    """Full-resolution tiles must be exact crops of the full map, labels and overlays included"""
+    
+    print("🧪 TESTING FULL-RESOLUTION TILES")
+    print("=" * 50)
+    
+    spec = pixel_map_spec(SURFACE, CONFIG)
+    full = generate_full_quality_pixel_map(spec['width'], spec['height'], 130, 90, True, True, 'Absen',
+                                           True, True, True, False, 'Main Stage')
+    for tile_size in [256, 512]:
+        for row in range(math.ceil(spec['height'] / tile_size)):
+            for col in range(math.ceil(spec['width'] / tile_size)):
+                tile = render_map_tile(spec, 1.0, col, row, tile_size)
+                crop = full.crop((col * tile_size, row * tile_size,
+                                  col * tile_size + tile.width, row * tile_size + tile.height))
+                assert tile.tobytes() == crop.tobytes(), f"Tile {col},{row} ({tile_size}px) differs from the full map"
+        print(f"✅ {tile_size}px tiles match the full map")
+    
+    assert render_map_tile(spec, 1.0, 99, 0, 256) is None, "Tile outside the map should be None"
+
+def test_scaled_tiles_are_seamless():
+    """Lower zoom tiles are rendered analytically and must stitch into the same scaled map"""
+    
+    print("\n🧪 TESTING SCALED TILES")
+    print("=" * 50)
+    
+    spec = pixel_map_spec({'panelsWidth': 30, 'fullPanelsHeight': 12, 'panelPixelWidth': 300, 'panelPixelHeight': 250},
+                          {'showName': True, 'showCross': True, 'showCircle': True})
+    for scale in [0.5, 0.25, 0.125, 2 ** -5]:
+        width = math.ceil(spec['width'] * scale)
+        height = math.ceil(spec['height'] * scale)
+        whole = render_scaled_region(spec, scale, 0, 0, width, height)
+        stitched = Image.new('RGB', (width, height))
+        for row in range(math.ceil(height / 256)):
+            for col in range(math.ceil(width / 256)):
+                stitched.paste(render_map_tile(spec, scale, col, row, 256), (col * 256, row * 256))
+        assert stitched.tobytes() == whole.tobytes(), f"Tiles at scale {scale} do not stitch seamlessly"
+        print(f"✅ scale {scale}: {width}×{height}px from {math.ceil(width / 256) * math.ceil(height / 256)} tiles")
+
+def test_tile_routes():
+    """Manifest, XYZ and DZI routes serve PNG tiles and use the tile cache"""
+    
+    print("\n🧪 TESTING TILE ROUTES")
+    print("=" * 50)
+    
+    client = app.test_client()
+    manifest = client.get(f'/tiles/manifest.json?{QUERY}').get_json()
+    assert manifest['success'] and manifest['width'] == 1560 and manifest['height'] == 630
+    assert manifest['max_zoom'] == tile_max_zoom(1560, 630, 256) == 3
+    assert manifest['levels'][0]['columns'] == 1 and manifest['levels'][0]['rows'] == 1
+    
+    for zoom in range(manifest['max_zoom'] + 1):
+        start_time = time.time()
+        response = client.get(f'/tiles/{zoom}/0/0.png?{QUERY}')
+        assert response.status_code == 200 and response.mimetype == 'image/png'
+        tile = Image.open(io.BytesIO(response.data))
+        assert tile.size == (256, 256), "XYZ tiles must be full size"
+        print(f"✅ z={zoom}: {len(response.data):,} bytes in {(time.time() - start_time) * 1000:.1f}ms")
+    
+    assert client.get(f'/tiles/0/0/0.png?{QUERY}').headers['X-Tile-Cache'] == 'hit'
+    assert client.get(f'/tiles/3/99/0.png?{QUERY}').status_code == 404
+    assert client.get(f'/tiles/9/0/0.png?{QUERY}').status_code == 404
+    assert client.get(f'/tiles/0/0/0.png?{QUERY}&tileSize=300').status_code == 400
+    assert client.get('/tiles/0/0/0.png?panelsWidth=abc').status_code == 400
+    
+    dzi = client.get(f'/tiles/map.dzi?{QUERY}')
+    assert b'Width="1560"' in dzi.data and b'TileSize="256"' in dzi.data
+    # DZI level 11 is full resolution for a 1560px wide map; edge tiles are cropped
+    edge = Image.open(io.BytesIO(client.get(f'/tiles/map_files/11/6_2.png?{QUERY}').data))
+    assert edge.size == (1560 - 6 * 256, 630 - 2 * 256), f"Unexpected DZI edge tile size {edge.size}"
+    single = Image.open(io.BytesIO(client.get(f'/tiles/map_files/0/0_0.png?{QUERY}').data))
+    assert single.size == (1, 1)
+    print(f"✅ DZI descriptor and tiles served, cache: {tile_cache.stats()}")
+
+def test_bytes_lru_cache():
+    """Byte-bounded LRU evicts least recently used entries and skips oversized values"""
+    
+    print("\n🧪 TESTING BYTES LRU CACHE")
+    print("=" * 50)
+    
+    cache = BytesLRUCache(max_bytes=100, max_item_bytes=60)
+    cache.put('a', b'x' * 40)
+    cache.put('b', b'x' * 40)
+    assert cache.get('a') is not None  # 'a' is now most recent
+    cache.put('c', b'x' * 40)  # evicts 'b'
+    assert cache.get('b') is None and cache.get('c') is not None
+    assert cache.put('big', b'x' * 61) is False
+    stats = cache.stats()
+    assert stats['bytes'] == 80 and stats['evictions'] == 1 and stats['hits'] == 2 and stats['misses'] == 1
+    print(f"✅ {stats}")
+
+if __name__ == "__main__":
+    try:
+        test_full_resolution_tiles()
+        test_scaled_tiles_are_seamless()
+        test_tile_routes()
+        test_bytes_lru_cache()
+        print("\n🎉 TILE PYRAMID TEST PASSED!")
+    except AssertionError as e:
+        print(f"\n❌ TILE PYRAMID TEST FAILED: {e}")